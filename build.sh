@@ -0,0 +1,16 @@
+#!/usr/bin/env bash
+# build.sh - Build step: compiled stylesheet and hashed static files
+# Run it where the slug or image is built (Render's build command, Heroku's
+# heroku-postbuild), never in a release step whose files are thrown away.
+set -euo pipefail
+
+npm install --no-audit --no-fund
+npm run build:css
+if [ ! -s static/css/app.css ]; then
+    echo "static/css/app.css was not built; pages would fall back to the Tailwind Play CDN" >&2
+    exit 1
+fi
+
+python manage.py collectstatic --noinput
+# Fails on services.E003 if app.css didn't make it into the manifest
+DEBUG=False python manage.py check --deploy --tag staticfiles --fail-level ERROR
@@ -0,0 +1,61 @@
+# gunicorn.conf.py - Production runtime profile
+# Every value can be overridden from the environment without a code change.
+# Usage: gunicorn -c gunicorn.conf.py service.wsgi:application
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)) == 'True'
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# gthread: each worker process serves `threads` requests at once, so a
+# request waiting on the DB or the network doesn't block the whole process.
+# WEB_CONCURRENCY is the Heroku/Render convention for the process count.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = _env_int('WEB_CONCURRENCY', multiprocessing.cpu_count() + 1)
+threads = _env_int('GUNICORN_THREADS', 4)
+
+# Import Django once in the master; workers share those pages copy-on-write
+preload_app = _env_bool('GUNICORN_PRELOAD', True)
+
+# Recycle workers to bound slow memory growth; jitter stops them all
+# restarting at the same moment
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+# Kill a worker stuck for `timeout` seconds; on restart/deploy give in-flight
+# requests `graceful_timeout` seconds to finish
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+# Worker heartbeat files on tmpfs, so a slow disk can't trip the timeout
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Requests are already logged (as JSON, with request ids) by RequestIdMiddleware
+accesslog = None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # With preload_app the master may have opened DB connections while
+    # importing; a socket shared between processes corrupts both sides
+    if server.cfg.preload_app:
+        from django.db import connections
+
+        connections.close_all()
+
+
+def worker_exit(server, worker):
+    from django.db import connections
+
+    connections.close_all()
@@ -15,6 +15,9 @@ echo 📁 Creating directories...
 mkdir media\provider_photos
 mkdir static
 
+echo 🎨 Building the stylesheet (needs Node 18+; without it pages use the Tailwind CDN)...
+where npm >nul 2>nul && (call npm install --no-audit --no-fund && call npm run build:css) || echo ⚠️  npm not found: skipping the stylesheet build
+
 echo 🗄️  Running migrations...
 python manage.py makemigrations
 python manage.py migrate
@@ -22,6 +22,14 @@ echo "📁 Creating directories..."
 mkdir -p media/provider_photos
 mkdir -p static
 
+# Build the stylesheet (needs Node 18+; without it pages use the Tailwind CDN)
+if command -v npm >/dev/null 2>&1; then
+    echo "🎨 Building the stylesheet..."
+    npm install --no-audit --no-fund && npm run build:css
+else
+    echo "⚠️  npm not found: skipping the stylesheet build (see README, Stylesheet Build)"
+fi
+
 # Run migrations
 echo "🗄️  Running migrations..."
 python manage.py makemigrations
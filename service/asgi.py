@@ -14,3 +14,12 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'service.settings')
 
 application = get_asgi_application()
+
+# Same start-up work as service/wsgi.py: have views and templates ready
+# before the server accepts traffic
+from django.urls import get_resolver  # noqa: E402
+
+from services.templating import warm_templates  # noqa: E402
+
+get_resolver().url_patterns
+warm_templates()
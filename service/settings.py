@@ -1,6 +1,7 @@
 # settings.py - Add/Update these settings in your Django project's settings.py
 
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project
@@ -26,9 +27,30 @@ INSTALLED_APPS = [
     'services',  # Your app name
 ]
 
+# Request metrics exposed at /metrics (see services/metrics.py)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "False") == "True"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")  # Bearer token for scrapers; staff users can always view
+
+# OTP delivery (see services/sms.py)
+SMS_BACKEND = os.environ.get("SMS_BACKEND", "services.sms.ConsoleBackend")
+SMS_TIMEOUT = 10  # seconds to wait for the gateway
+SMS_STUB_DELAY = float(os.environ.get("SMS_STUB_DELAY", "1.0"))  # SlowStubBackend only
+FAST2SMS_API_KEY = os.environ.get("FAST2SMS_API_KEY", "")
+
+# Slow-query log and N+1 detector (see services/querywatch.py)
+TESTING = sys.argv[1:2] == ['test']
+QUERYWATCH_ENABLED = os.environ.get("QUERYWATCH_ENABLED", str(DEBUG)) == "True" or TESTING
+QUERYWATCH_STRICT = TESTING  # N+1s fail the test run
+QUERYWATCH_SLOW_MS = int(os.environ.get("QUERYWATCH_SLOW_MS", "100"))
+QUERYWATCH_NPLUSONE_THRESHOLD = 5  # same query shape this many times in one request
+
 MIDDLEWARE = [
+    'services.log.RequestIdMiddleware',
+    'services.middleware.MetricsMiddleware',  # no-op unless METRICS_ENABLED
+    'services.middleware.CompressionMiddleware',
+    'services.querywatch.QueryWatchMiddleware',  # no-op unless QUERYWATCH_ENABLED
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'services.middleware.StaticFilesMiddleware',  # WhiteNoise, async-capable
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -39,23 +61,36 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'service.urls'  # Replace with your project name
 
+# Production keeps compiled templates in memory (cached loader) and
+# service/wsgi.py compiles them all at startup; in development templates
+# are re-read on every render so edits show up immediately.
+# `manage.py check --deploy` fails if caching is off.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': ('services.templating.InstrumentedDjangoTemplates' if METRICS_ENABLED
+                    else 'django.template.backends.django.DjangoTemplates'),
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
+        'APP_DIRS': False,  # loaders are listed explicitly below
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS if DEBUG else [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'services.context_processors.assets',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'service.wsgi.application'  # Replace with your project name
+ASGI_APPLICATION = 'service.asgi.application'  # uvicorn / gunicorn UvicornWorker
 
 # Database
 DATABASES = {
@@ -77,6 +112,9 @@ AUTH_PASSWORD_VALIDATORS = [
         }
     },
 ]
+if TESTING:
+    # Hashing is deliberately slow; tests create users in most setUp()s
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
 
 # Custom User Model
 AUTH_USER_MODEL = 'services.User'
@@ -97,7 +135,16 @@ STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage" # changed during deployment on render
+# STATICFILES_STORAGE was removed in Django 5.1 and is silently ignored, so
+# the storage has to be configured through STORAGES. Hashed file names let
+# WhiteNoise serve them with a far-future, immutable Cache-Control header.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
+}
+if TESTING:
+    # Tests run with DEBUG=False but without collectstatic, so there's no manifest
+    STORAGES["staticfiles"] = {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}
 
 # Media files (Uploaded content)
 MEDIA_URL = '/media/'
@@ -123,3 +170,46 @@ MESSAGE_TAGS = {
     messages.WARNING: 'warning',
     messages.ERROR: 'danger',
 }
+
+# Admin background jobs (services/jobs.py): threads per process; tests run them inline
+BACKGROUND_JOB_THREADS = int(os.environ.get("BACKGROUND_JOB_THREADS", "2"))
+BACKGROUND_JOBS_INLINE = TESTING
+
+# Dynamic response compression (see services/middleware.py)
+COMPRESSION_MIN_SIZE = 1024        # bytes; smaller bodies go out as-is
+COMPRESSION_BROTLI_QUALITY = 5     # 0-11; 4-6 is the usual sweet spot for on-the-fly pages
+
+# Cache-Control max-age for anonymous public pages (see services/httpcache.py)
+PUBLIC_PAGE_MAX_AGE = 300
+
+# Provider ranking (see services/ranking.py)
+RANKING_PRIOR_MEAN = 3.5       # score of a provider with no reviews
+RANKING_PRIOR_WEIGHT = 5       # virtual reviews at the prior mean
+RANKING_HALF_LIFE_DAYS = 365   # review weight halves every year
+LEADERBOARD_SIZE = 50          # providers kept per (district, service) leaderboard
+
+# Logging: one JSON object per line on stdout, tagged with the request id.
+# Records go through an in-memory queue so request threads never block on I/O.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "WARNING" if TESTING else "INFO")
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {'()': 'services.log.RequestIdFilter'},
+    },
+    'handlers': {
+        'json': {
+            '()': 'services.log.NonBlockingHandler',
+            'filters': ['request_id'],
+        },
+    },
+    'root': {
+        'handlers': ['json'],
+        'level': LOG_LEVEL,
+    },
+    'loggers': {
+        'django': {'level': LOG_LEVEL, 'propagate': True},
+        # runserver's access lines duplicate "request finished"; keep its 4xx/5xx warnings
+        'django.server': {'level': 'WARNING', 'propagate': True},
+    },
+}
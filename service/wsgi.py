@@ -14,3 +14,14 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'service.settings')
 
 application = get_wsgi_application()
+
+# Import the URLconf (and with it every view module) and compile the
+# templates now, before the first request, so that with gunicorn's
+# preload_app the workers share these pages instead of each doing the work
+# on its first request.
+from django.urls import get_resolver  # noqa: E402
+
+from services.templating import warm_templates  # noqa: E402
+
+get_resolver().url_patterns
+warm_templates()
@@ -1,11 +1,82 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, ServiceProvider, Customer, ServiceRequest, Review, OTPVerification, ProviderWorkPhoto
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.http import HttpRequest, HttpResponseRedirect, QueryDict
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+from . import jobs, verification
+from .models import (User, ServiceProvider, Customer, ServiceRequest, Review, OTPVerification, ProviderWorkPhoto,
+                     BackgroundJob)
+from .forms import DistrictField
+from .reference import district_choice_groups, district_name, is_district
 
-class CustomUserAdmin(BaseUserAdmin):
+
+class EstimatedCountPaginator(Paginator):
+    """
+    On PostgreSQL, an unfiltered changelist takes its row count from the
+    planner statistics instead of a COUNT(*) over the whole table. Filtered
+    lists, small tables and other databases are counted exactly.
+    """
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if not queryset.query.where and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                               [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= self.exact_below:
+                return row[0]
+        return queryset.count()
+
+
+def changelist_queryset(model, user, query_string):
+    """
+    The rows the admin changelist of `model` lists for `user` with this
+    query string (filters, search), for background jobs working on a
+    "select all" of a large table.
+    """
+    request = HttpRequest()
+    request.GET = QueryDict(query_string)
+    request.user = user
+    model_admin = admin.site._registry[model]
+    return model_admin.get_changelist_instance(request).get_queryset(request)
+
+
+class LargeTableAdmin:
+    """
+    Changelist settings for tables with millions of rows: estimated total,
+    no second COUNT(*) for the "N total" link, and searches that are
+    exact (`=field`) or prefix (`^field`) so they can use indexes.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        exact_fields = [field[1:] for field in self.get_search_fields(request) if field.startswith('=')]
+        if term.isdigit() and exact_fields:
+            # Phone and Aadhar numbers: one lookup per unique index, no LIKE scans
+            query = Q()
+            for field in exact_fields:
+                query |= Q(**{field: term})
+            return queryset.filter(query), False
+        return super().get_search_results(request, queryset, search_term)
+
+
+class CustomUserAdmin(LargeTableAdmin, BaseUserAdmin):
     list_display = ('phone_number', 'name', 'user_type', 'is_active', 'is_staff', 'date_joined')
     list_filter = ('user_type', 'is_active', 'is_staff')
-    search_fields = ('phone_number', 'name')
+    search_fields = ('=phone_number', '^name')
     ordering = ('-date_joined',)
     
     fieldsets = (
@@ -22,12 +93,70 @@ class CustomUserAdmin(BaseUserAdmin):
         }),
     )
 
-class ServiceProviderAdmin(admin.ModelAdmin):
+class DistrictSelectAdmin:
+    # district columns have no choices; give their change forms the grouped select
+    def formfield_for_dbfield(self, db_field, request, **kwargs):
+        if db_field.name == 'district':
+            return DistrictField('---------', required=not db_field.blank)
+        return super().formfield_for_dbfield(db_field, request, **kwargs)
+
+
+class ProviderActionForm(ActionForm):
+    district = DistrictField('District (for reassign)', required=False)
+
+
+class ServiceProviderAdmin(DistrictSelectAdmin, LargeTableAdmin, admin.ModelAdmin):
     list_display = ('user', 'aadhar_number', 'is_verified', 'rating', 'total_reviews', 'created_at')
     list_filter = ('is_verified', 'service1', 'service2', 'service3', 'created_at')
-    search_fields = ('user__name', 'user__phone_number', 'aadhar_number')
+    list_select_related = ('user',)
+    search_fields = ('=user__phone_number', '=aadhar_number', '^user__name')
+    raw_id_fields = ('user',)
     readonly_fields = ('created_at',)
     list_editable = ('is_verified',)
+    action_form = ProviderActionForm
+    actions = ['verify_selected', 'unverify_selected', 'reassign_district', 'check_selected', 'check_and_verify_selected']
+
+    # Bulk actions are single UPDATE statements; counters and leaderboards
+    # are adjusted once for the whole selection (see services/verification.py)
+
+    @admin.action(description='Verify selected providers', permissions=['change'])
+    def verify_selected(self, request, queryset):
+        count = verification.set_verified(queryset, True)
+        self.message_user(request, f"{count} provider(s) verified.", messages.SUCCESS)
+
+    @admin.action(description='Unverify selected providers', permissions=['change'])
+    def unverify_selected(self, request, queryset):
+        count = verification.set_verified(queryset, False)
+        self.message_user(request, f"{count} provider(s) unverified.", messages.SUCCESS)
+
+    @admin.action(description='Reassign selected providers to district', permissions=['change'])
+    def reassign_district(self, request, queryset):
+        district = request.POST.get('district')
+        if not is_district(district):
+            self.message_user(request, "Choose a district next to the action first.", messages.ERROR)
+            return None
+        count = verification.reassign_district(queryset, district)
+        self.message_user(request, f"{count} provider(s) moved to {district_name(district)}.",
+                          messages.SUCCESS)
+
+    @admin.action(description='Run pre-verification checks (background)', permissions=['change'])
+    def check_selected(self, request, queryset):
+        return self._start_checks(request, queryset, verify_passing=False)
+
+    @admin.action(description='Run checks, then verify providers that pass (background)', permissions=['change'])
+    def check_and_verify_selected(self, request, queryset):
+        return self._start_checks(request, queryset, verify_passing=True)
+
+    def _start_checks(self, request, queryset, verify_passing):
+        if request.POST.get('select_across') == '1':
+            # "Select all": the job re-applies the changelist's filters and search
+            # instead of carrying every id (see changelist_queryset)
+            selection = {'changelist_filters': request.GET.urlencode()}
+        else:
+            # The ticked checkboxes, one page at most
+            selection = {'provider_ids': list(queryset.order_by('pk').values_list('pk', flat=True))}
+        job = jobs.enqueue('verification_checks', user=request.user, verify_passing=verify_passing, **selection)
+        return HttpResponseRedirect(reverse('admin:services_backgroundjob_progress', args=[job.pk]))
     
     fieldsets = (
         ('User Information', {
@@ -47,31 +176,95 @@ class ServiceProviderAdmin(admin.ModelAdmin):
         }),
     )
 
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(DistrictSelectAdmin, LargeTableAdmin, admin.ModelAdmin):
     list_display = ('user', 'address', 'created_at')
-    search_fields = ('user__name', 'user__phone_number')
+    list_select_related = ('user',)
+    search_fields = ('=user__phone_number', '^user__name')
+    raw_id_fields = ('user',)
     readonly_fields = ('created_at',)
 
-class ServiceRequestAdmin(admin.ModelAdmin):
-    list_display = ('customer', 'provider', 'service_type', 'status', 'created_at')
-    list_filter = ('status', 'service_type', 'created_at')
-    search_fields = ('customer__user__name', 'provider__user__name')
-    readonly_fields = ('created_at',)
-    list_editable = ('status',)
+class StateListFilter(admin.SimpleListFilter):
+    # One link per state; a per-district filter would list every district
+    # in India, and without choices Django would find them with SELECT DISTINCT
+    title = 'state'
+    parameter_name = 'state'
+
+    def lookups(self, request, model_admin):
+        return [(state, state) for state, _ in district_choice_groups()]
+
+    def queryset(self, request, queryset):
+        for state, districts in district_choice_groups():
+            if state == self.value():
+                return queryset.filter(district__in=[code for code, _ in districts])
+        return queryset
+
+
+class ServiceRequestAdmin(DistrictSelectAdmin, LargeTableAdmin, admin.ModelAdmin):
+    list_display = ('customer', 'provider', 'service_type', 'district_label', 'status', 'created_at')
+    list_filter = ('status', 'service_type', StateListFilter, 'created_at')
+    list_select_related = ('customer__user', 'provider__user')
+    search_fields = ('=customer__user__phone_number', '=provider__user__phone_number',
+                     '^customer__user__name', '^provider__user__name')
+    raw_id_fields = ('customer',)
+    # Status and provider change only through services.booking, which books
+    # and releases the provider's time and withdraws the other offers
+    readonly_fields = ('status', 'provider', 'created_at', 'accepted_at')
 
-class OTPVerificationAdmin(admin.ModelAdmin):
+    @admin.display(description='District', ordering='district')
+    def district_label(self, obj):
+        return obj.get_district_display()
+
+class OTPVerificationAdmin(LargeTableAdmin, admin.ModelAdmin):
     list_display = ('phone_number', 'otp', 'is_verified', 'created_at')
     list_filter = ('is_verified', 'created_at')
-    search_fields = ('phone_number',)
+    search_fields = ('=phone_number',)
     readonly_fields = ('created_at',)
 
-class ProviderWorkPhotoAdmin(admin.ModelAdmin):
+class ProviderWorkPhotoAdmin(LargeTableAdmin, admin.ModelAdmin):
     list_display = ('provider', 'title', 'uploaded_at')
     list_filter = ('uploaded_at',)
-    search_fields = ('provider__user__name', 'title')
+    list_select_related = ('provider__user',)
+    search_fields = ('=provider__user__phone_number', '^provider__user__name', '^title')
+    raw_id_fields = ('provider',)
     readonly_fields = ('uploaded_at',)
 
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'progress', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('name', 'status')
+    list_select_related = ('created_by',)
+    readonly_fields = [field.name for field in BackgroundJob._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description='Progress')
+    def progress(self, obj):
+        return f"{obj.processed}/{obj.total} ({obj.percent}%)"
+
+    def get_urls(self):
+        return [
+            path('<int:job_id>/progress/', self.admin_site.admin_view(self.progress_view),
+                 name='services_backgroundjob_progress'),
+        ] + super().get_urls()
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        return HttpResponseRedirect(reverse('admin:services_backgroundjob_progress', args=[object_id]))
+
+    def progress_view(self, request, job_id):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        job = get_object_or_404(BackgroundJob.objects.select_related('created_by'), pk=job_id)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f"{job.name} #{job.pk}",
+            'job': job,
+        }
+        return TemplateResponse(request, 'admin/services/backgroundjob/progress.html', context)
+
+
 admin.site.register(ProviderWorkPhoto, ProviderWorkPhotoAdmin)
+admin.site.register(BackgroundJob, BackgroundJobAdmin)
 admin.site.register(OTPVerification, OTPVerificationAdmin)
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(ServiceProvider, ServiceProviderAdmin)
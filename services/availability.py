@@ -0,0 +1,199 @@
+# availability.py - Working hours, booked intervals and "available soon" checks
+#
+# Weekly hours live on the provider row and are turned into sorted arrays of
+# minute-of-week intervals, cached per distinct schedule (most providers
+# share a handful). Booked time is BookedInterval rows. Checking hundreds of
+# providers is two queries, their hours and the bookings overlapping the
+# window, then a bisect and a short sweep per provider.
+import bisect
+from collections import defaultdict
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import BookedInterval, ServiceProvider
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# The listing's "available soon" filter: a free slot of AVAILABLE_SLOT
+# starting within AVAILABLE_WINDOW from now
+AVAILABLE_WINDOW = timedelta(hours=getattr(settings, 'AVAILABILITY_WINDOW_HOURS', 2))
+AVAILABLE_SLOT = timedelta(minutes=getattr(settings, 'AVAILABILITY_SLOT_MINUTES', 60))
+# Time booked for an accepted job
+JOB_DURATION = timedelta(minutes=getattr(settings, 'BOOKING_JOB_MINUTES', 120))
+
+
+def parse_minutes(value):
+    """'HH:MM' -> minutes after midnight"""
+    hours, minutes = value.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+@lru_cache(maxsize=1024)
+def _week_index(schedule):
+    intervals = []
+    for day, hours in enumerate(schedule):
+        if not hours:
+            continue
+        start = day * MINUTES_PER_DAY + parse_minutes(hours[0])
+        end = day * MINUTES_PER_DAY + parse_minutes(hours[1])
+        if end <= start:
+            end += MINUTES_PER_DAY  # past midnight
+        if end > MINUTES_PER_WEEK:
+            # Sunday night into Monday morning
+            intervals.append((0, end - MINUTES_PER_WEEK))
+            end = MINUTES_PER_WEEK
+        intervals.append((start, end))
+
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return tuple(start for start, _ in merged), tuple(end for _, end in merged)
+
+
+def week_index(working_hours):
+    """(starts, ends): sorted minute-of-week arrays, or None if hours aren't set"""
+    if not working_hours:
+        return None
+    return _week_index(tuple(tuple(hours) if hours else None for hours in working_hours))
+
+
+def working_periods(working_hours, start, end):
+    """Working time within [start, end) as sorted, non-overlapping (start, end) datetimes"""
+    index = week_index(working_hours)
+    if index is None:
+        return [(start, end)]
+    starts, ends = index
+
+    local = timezone.localtime(start)
+    week = (local - timedelta(days=local.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    offset = (local - week) / timedelta(minutes=1)
+    periods = []
+    while week < end:
+        # First interval still running at `offset`; later ones follow in order
+        i = bisect.bisect_right(ends, offset)
+        while i < len(starts):
+            period_start = week + timedelta(minutes=starts[i])
+            if period_start >= end:
+                break
+            period = (max(period_start, start), min(week + timedelta(minutes=ends[i]), end))
+            if periods and period[0] <= periods[-1][1]:
+                # Joined across the week boundary
+                periods[-1] = (periods[-1][0], period[1])
+            else:
+                periods.append(period)
+            i += 1
+        week += timedelta(days=7)
+        offset = 0
+    return periods
+
+
+def free_periods(periods, busy):
+    """`periods` minus the sorted (start, end) `busy` intervals"""
+    free = []
+    for start, end in periods:
+        cursor = start
+        # A handful of bookings per provider fall in any window
+        for busy_start, busy_end in busy:
+            if busy_end <= cursor:
+                continue
+            if busy_start >= end:
+                break
+            if busy_start > cursor:
+                free.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+        if cursor < end:
+            free.append((cursor, end))
+    return free
+
+
+def earliest_slot(working_hours, busy, start, latest_start, length):
+    """Start of the first free stretch of `length` that begins by latest_start, or None"""
+    for free_start, free_end in free_periods(working_periods(working_hours, start, latest_start + length), busy):
+        if free_start > latest_start:
+            return None
+        if free_end - free_start >= length:
+            return free_start
+    return None
+
+
+def is_free(working_hours, busy, start, end):
+    return free_periods(working_periods(working_hours, start, end), busy) == [(start, end)]
+
+
+def busy_intervals(provider_ids, start, end):
+    """{provider id: sorted (start, end) bookings overlapping [start, end)}, in one query"""
+    busy = defaultdict(list)
+    rows = BookedInterval.objects.filter(
+        provider_id__in=provider_ids, end__gt=start, start__lt=end,
+    ).order_by('provider_id', 'start').values_list('provider_id', 'start', 'end')
+    for provider_id, busy_start, busy_end in rows:
+        busy[provider_id].append((busy_start, busy_end))
+    return busy
+
+
+def available_providers(providers, start=None, window=AVAILABLE_WINDOW, length=AVAILABLE_SLOT):
+    """
+    {provider id: start of their first free slot} for the providers in the
+    queryset that have `length` free, within working hours, starting no
+    later than `window` from `start` (default now). Two queries.
+    """
+    start = start or timezone.now()
+    hours = dict(providers.order_by().values_list('pk', 'working_hours'))
+    busy = busy_intervals(list(hours), start, start + window + length)
+    available = {}
+    for provider_id, working_hours in hours.items():
+        slot = earliest_slot(working_hours, busy.get(provider_id, []), start, start + window, length)
+        if slot is not None:
+            available[provider_id] = slot
+    return available
+
+
+def job_slot(preferred_start, now=None):
+    """The interval a request asks for: its preferred time, or as soon as possible (start None)"""
+    now = now or timezone.now()
+    if preferred_start and preferred_start > now:
+        return preferred_start, preferred_start + JOB_DURATION
+    return None, None
+
+
+def can_take(working_hours, busy, preferred_start, now):
+    """Whether a provider can be offered a request (see job_slot)"""
+    start, end = job_slot(preferred_start, now)
+    if start is None:
+        return earliest_slot(working_hours, busy, now, now + AVAILABLE_WINDOW, JOB_DURATION) is not None
+    return is_free(working_hours, busy, start, end)
+
+
+def booking_slot(provider_id, preferred_start):
+    """
+    The interval to book when a provider accepts: the preferred time, or for
+    "as soon as possible" their first free stretch within AVAILABLE_WINDOW.
+    None if that clashes with their other bookings. Working hours aren't
+    enforced here; taking a job outside them is the provider's call.
+    """
+    now = timezone.now()
+    start, end = job_slot(preferred_start, now)
+    if start is not None:
+        busy = busy_intervals([provider_id], start, end)[provider_id]
+        return (start, end) if not busy else None
+    busy = busy_intervals([provider_id], now, now + AVAILABLE_WINDOW + JOB_DURATION)[provider_id]
+    slot = earliest_slot(None, busy, now, now + AVAILABLE_WINDOW, JOB_DURATION)
+    return (slot, slot + JOB_DURATION) if slot else None
+
+
+def release(request_id):
+    """Free the rest of a booking once its job is completed"""
+    now = timezone.now()
+    BookedInterval.objects.filter(request_id=request_id, start__gte=now).delete()
+    BookedInterval.objects.filter(request_id=request_id, end__gt=now).update(end=now)
+
+
+def provider_hours(provider_ids):
+    return dict(ServiceProvider.objects.filter(pk__in=provider_ids).values_list('pk', 'working_hours'))
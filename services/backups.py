@@ -0,0 +1,304 @@
+# backups.py - Online database backups, content-addressed media snapshots, verified restore
+#
+# A snapshot is a directory under BACKUP_DIR holding a copy of the database
+# and manifest.json. SQLite is copied with its online backup API a few
+# hundred pages at a time, so writers are only held off for one batch at a
+# time; Postgres is streamed out of pg_dump. Media files go into a store
+# under BACKUP_DIR/media shared by every snapshot and keyed by SHA-256, so
+# each snapshot only copies files whose content is new. Files whose size
+# and mtime match the previous snapshot aren't even re-read.
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+BACKUP_DIR = Path(getattr(settings, 'BACKUP_DIR', settings.BASE_DIR / 'backups'))
+# SQLite pages copied per step; the database is unlocked between steps
+BACKUP_PAGES = getattr(settings, 'BACKUP_PAGES', 256)
+BACKUP_SLEEP = 0.005
+CHUNK_SIZE = 1024 * 1024
+MANIFEST = 'manifest.json'
+
+
+class BackupError(Exception):
+    """A backup that can't be taken, or a snapshot that fails verification"""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        while chunk := fh.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _database(using):
+    db = settings.DATABASES[using]
+    vendor = connections[using].vendor
+    if vendor not in ('sqlite', 'postgresql'):
+        raise BackupError(f'Backups support SQLite and PostgreSQL, not {vendor}')
+    return vendor, db
+
+
+def _pg_env(db):
+    env = dict(os.environ)
+    if db.get('PASSWORD'):
+        env['PGPASSWORD'] = str(db['PASSWORD'])
+    return env
+
+
+def _pg_args(db):
+    args = []
+    for flag, key in (('--host', 'HOST'), ('--port', 'PORT'), ('--username', 'USER')):
+        if db.get(key):
+            args += [flag, str(db[key])]
+    return args + ['--dbname', str(db['NAME'])]
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _sqlite_copy(source, target, progress=None):
+    """
+    Online copy between two SQLite connections, BACKUP_PAGES at a time.
+    SQLite starts the copy over whenever another connection writes between
+    batches, which under steady writes would never finish: after three
+    passes' worth of batches the rest is copied in one step instead.
+    """
+    steps = 0
+
+    def step(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        if progress:
+            progress(total - remaining, total)
+        if steps > 3 * (total // BACKUP_PAGES + 1):
+            raise _TooManyRestarts
+
+    try:
+        source.backup(target, pages=BACKUP_PAGES, progress=step, sleep=BACKUP_SLEEP)
+    except _TooManyRestarts:
+        source.backup(target)
+
+
+def _check_sqlite(path):
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+    finally:
+        conn.close()
+    if result != 'ok':
+        raise BackupError(f'{path} failed the integrity check: {result}')
+
+
+def _backup_sqlite(db, target, progress=None):
+    source = sqlite3.connect(str(db['NAME']))
+    copy = sqlite3.connect(str(target))
+    try:
+        _sqlite_copy(source, copy, progress)
+    finally:
+        copy.close()
+        source.close()
+    _check_sqlite(target)
+
+
+def _run_pg(args, db, **kwargs):
+    try:
+        return subprocess.Popen([*args, *_pg_args(db)], env=_pg_env(db), **kwargs)
+    except FileNotFoundError:
+        raise BackupError(f'{args[0]} not found; install the PostgreSQL client tools')
+
+
+def _backup_postgres(db, target, progress=None):
+    """Stream pg_dump's custom-format archive into target"""
+    # stderr goes to a file: a full pipe would stall pg_dump while stdout is read
+    with tempfile.TemporaryFile() as errors, open(target, 'wb') as fh:
+        process = _run_pg(['pg_dump', '--format=custom'], db, stdout=subprocess.PIPE, stderr=errors)
+        written = 0
+        while chunk := process.stdout.read(CHUNK_SIZE):
+            fh.write(chunk)
+            written += len(chunk)
+            if progress:
+                progress(written, None)
+        if process.wait():
+            errors.seek(0)
+            raise BackupError(f'pg_dump failed: {errors.read().decode(errors="replace").strip()}')
+
+
+def _media_files(root):
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = Path(directory) / name
+            yield path.relative_to(root).as_posix(), path
+
+
+def _object_path(root, digest):
+    return root / 'media' / digest[:2] / digest
+
+
+def _snapshot_media(root, previous):
+    """{relative path: {sha256, size, mtime_ns}} for MEDIA_ROOT, storing new content"""
+    media_root = Path(settings.MEDIA_ROOT)
+    files = {}
+    stats = {'files': 0, 'copied': 0, 'bytes_copied': 0}
+    if not media_root.is_dir():
+        return files, stats
+    for name, path in _media_files(media_root):
+        st = path.stat()
+        known = previous.get(name)
+        if known and known['size'] == st.st_size and known['mtime_ns'] == st.st_mtime_ns:
+            digest = known['sha256']
+        else:
+            digest = _sha256(path)
+        stored = _object_path(root, digest)
+        if not stored.exists():
+            stored.parent.mkdir(parents=True, exist_ok=True)
+            partial = stored.with_suffix('.partial')
+            shutil.copyfile(path, partial)
+            os.replace(partial, stored)
+            stats['copied'] += 1
+            stats['bytes_copied'] += st.st_size
+        files[name] = {'sha256': digest, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+        stats['files'] += 1
+    return files, stats
+
+
+def list_snapshots(root=BACKUP_DIR):
+    """Names of complete snapshots, oldest first"""
+    root = Path(root)
+    if not root.is_dir():
+        return []
+    return sorted(entry.name for entry in root.iterdir()
+                  if entry.name != 'media' and (entry / MANIFEST).is_file())
+
+
+def load_manifest(name, root=BACKUP_DIR):
+    root = Path(root)
+    if name == 'latest':
+        snapshots = list_snapshots(root)
+        if not snapshots:
+            raise BackupError(f'No snapshots in {root}')
+        name = snapshots[-1]
+    path = root / name / MANIFEST
+    if not path.is_file():
+        raise BackupError(f'No snapshot {name!r} in {root}')
+    return name, json.loads(path.read_text())
+
+
+def create_backup(root=BACKUP_DIR, using='default', include_media=True, progress=None):
+    """
+    Take a snapshot and return its manifest. The snapshot directory only
+    gets its final name once everything is written, so an interrupted
+    backup never looks complete.
+    """
+    root = Path(root)
+    vendor, db = _database(using)
+    name = timezone.now().strftime('%Y%m%dT%H%M%SZ')
+    partial = root / f'{name}.partial'
+    partial.mkdir(parents=True, exist_ok=False)
+    started = time.monotonic()
+    try:
+        database_file = 'db.sqlite3' if vendor == 'sqlite' else 'db.dump'
+        if vendor == 'sqlite':
+            _backup_sqlite(db, partial / database_file, progress)
+        else:
+            _backup_postgres(db, partial / database_file, progress)
+
+        manifest = {
+            'name': name,
+            'created_at': timezone.now().isoformat(),
+            'vendor': vendor,
+            'database': {'file': database_file, 'sha256': _sha256(partial / database_file),
+                         'size': (partial / database_file).stat().st_size},
+            'media': None,
+        }
+        if include_media:
+            snapshots = list_snapshots(root)
+            previous = load_manifest(snapshots[-1], root)[1]['media'] if snapshots else None
+            manifest['media'], manifest['media_stats'] = _snapshot_media(root, previous or {})
+        manifest['seconds'] = round(time.monotonic() - started, 2)
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+
+    (partial / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    os.replace(partial, root / name)
+    return manifest
+
+
+def verify_snapshot(name, root=BACKUP_DIR):
+    """Check every file of a snapshot against its manifest; returns the manifest"""
+    root = Path(root)
+    name, manifest = load_manifest(name, root)
+    database = root / name / manifest['database']['file']
+    if not database.is_file() or _sha256(database) != manifest['database']['sha256']:
+        raise BackupError(f'{database} is missing or does not match the manifest')
+    if manifest['vendor'] == 'sqlite':
+        _check_sqlite(database)
+    problems = []
+    for path, entry in (manifest['media'] or {}).items():
+        stored = _object_path(root, entry['sha256'])
+        if not stored.is_file() or _sha256(stored) != entry['sha256']:
+            problems.append(path)
+    if problems:
+        raise BackupError(f'{len(problems)} media file(s) missing or corrupt, e.g. {problems[0]}')
+    return manifest
+
+
+def restore_snapshot(name, root=BACKUP_DIR, using='default', include_media=True, prune_media=False,
+                     progress=None):
+    """
+    Verify a snapshot, then restore the database and (optionally) media from
+    it. Returns {'snapshot', 'media_restored', 'media_pruned'}.
+    """
+    root = Path(root)
+    manifest = verify_snapshot(name, root)
+    vendor, db = _database(using)
+    if vendor != manifest['vendor']:
+        raise BackupError(f"Snapshot is a {manifest['vendor']} backup, the database is {vendor}")
+    database = root / manifest['name'] / manifest['database']['file']
+
+    connections[using].close()
+    if vendor == 'sqlite':
+        # Copying into the live file through SQLite keeps its locking intact,
+        # unlike overwriting it while other processes have it open
+        source = sqlite3.connect(f'file:{database}?mode=ro', uri=True)
+        target = sqlite3.connect(str(db['NAME']))
+        try:
+            _sqlite_copy(source, target, progress)
+        finally:
+            target.close()
+            source.close()
+    else:
+        process = _run_pg(['pg_restore', '--clean', '--if-exists', '--no-owner', '--single-transaction',
+                           str(database)], db, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        _, errors = process.communicate()
+        if process.returncode:
+            raise BackupError(f'pg_restore failed: {errors.decode(errors="replace").strip()}')
+
+    result = {'snapshot': manifest['name'], 'media_restored': 0, 'media_pruned': 0}
+    if include_media and manifest['media'] is not None:
+        media_root = Path(settings.MEDIA_ROOT)
+        for path, entry in manifest['media'].items():
+            target = media_root / path
+            if target.is_file() and target.stat().st_size == entry['size'] and _sha256(target) == entry['sha256']:
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(_object_path(root, entry['sha256']), target)
+            result['media_restored'] += 1
+        if prune_media and media_root.is_dir():
+            for path, file in list(_media_files(media_root)):
+                if path not in manifest['media']:
+                    file.unlink()
+                    result['media_pruned'] += 1
+    return result
@@ -0,0 +1,454 @@
+# benchmarking.py - Synthetic data and scripted customer journeys for `manage.py benchmark`
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from http.cookiejar import CookieJar
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import booking, counters, geo, ranking, reference
+from .middleware import brotli
+from .models import (User, ServiceProvider, Customer, Review, ProviderWorkPhoto, ProviderLeaderboardEntry,
+                     ServiceRequest)
+from .reference import SERVICE_CHOICES
+
+BENCH_PASSWORD = 'bench123'
+# Most customers and providers live here so the listing pages get heavy
+HOT_DISTRICT = 'lucknow'
+HOT_SERVICE = 'plumber'
+
+FIRST_NAMES = ['Amit', 'Ravi', 'Suresh', 'Priya', 'Neha', 'Rahul', 'Vikas', 'Anita', 'Deepak', 'Pooja',
+               'Manoj', 'Sunita', 'Rajesh', 'Kavita', 'Arjun', 'Meena', 'Sanjay', 'Geeta', 'Ajay', 'Rekha']
+LAST_NAMES = ['Sharma', 'Verma', 'Yadav', 'Singh', 'Gupta', 'Mishra', 'Pandey', 'Tiwari', 'Kumar', 'Patel']
+
+
+def generate_data(providers=500, customers=50, reviews_per_provider=8, photos_per_provider=3,
+                  hot_share=0.3, seed=42):
+    """
+    Create `providers` verified providers spread across every district
+    (hot_share of them in HOT_DISTRICT), plus customers, reviews and work
+    photos. Uses bulk inserts and a single password hash so large N is quick.
+    """
+    rng = random.Random(seed)
+    password = make_password(BENCH_PASSWORD)
+    districts = [district.code for district in reference.districts()]
+    services = [code for code, _ in SERVICE_CHOICES]
+
+    customer_users = [
+        User(phone_number=f'6{i:09d}', name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+             user_type='customer', password=password)
+        for i in range(customers)
+    ]
+    provider_users = [
+        User(phone_number=f'7{i:09d}', name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+             user_type='provider', password=password)
+        for i in range(providers)
+    ]
+    User.objects.bulk_create(customer_users + provider_users, batch_size=500)
+
+    customer_rows = Customer.objects.bulk_create([
+        Customer(user=user, district=HOT_DISTRICT, address='Benchmark Street')
+        for user in customer_users
+    ], batch_size=500)
+
+    provider_rows = []
+    for i, user in enumerate(provider_users):
+        district = HOT_DISTRICT if rng.random() < hot_share else rng.choice(districts)
+        offered = rng.sample(services, rng.randint(1, 3))
+        if district == HOT_DISTRICT and rng.random() < 0.5:
+            offered[0] = HOT_SERVICE
+        offered = list(dict.fromkeys(offered)) + [None, None]
+        centroid = geo.district_centroid(district)
+        provider_rows.append(ServiceProvider(
+            user=user,
+            address=f'{i} Benchmark Road',
+            district=district,
+            aadhar_number=f'{i:012d}',
+            date_of_birth=date(1980, 1, 1) + timedelta(days=rng.randint(0, 9000)),
+            service1=offered[0],
+            service2=offered[1],
+            service3=offered[2],
+            is_verified=True,
+            geo_cell=geo.geohash_encode(*centroid) if centroid else '',
+        ))
+    ServiceProvider.objects.bulk_create(provider_rows, batch_size=500)
+
+    now = timezone.now()
+    reviews = []
+    photos = []
+    for provider in provider_rows:
+        reviewers = rng.sample(customer_rows, min(reviews_per_provider, len(customer_rows)))
+        for customer in reviewers:
+            reviews.append(Review(customer=customer, provider=provider, rating=rng.randint(1, 5),
+                                  comment='Good work, on time.'))
+        for n in range(photos_per_provider):
+            photos.append(ProviderWorkPhoto(provider=provider, photo=f'work_photos/bench_{n}.jpg',
+                                            title=f'Job {n}', description='Benchmark photo'))
+    Review.objects.bulk_create(reviews, batch_size=1000)
+    ProviderWorkPhoto.objects.bulk_create(photos, batch_size=1000)
+
+    # bulk_create skips Review.save(), so fill in the denormalized rating columns here
+    by_provider = {}
+    for review in reviews:
+        by_provider.setdefault(review.provider_id, []).append(review.rating)
+    for provider in provider_rows:
+        ratings = by_provider.get(provider.pk, [])
+        provider.total_reviews = len(ratings)
+        provider.rating = round(sum(ratings) / len(ratings), 2) if ratings else 0
+    ServiceProvider.objects.bulk_update(provider_rows, ['rating', 'total_reviews'], batch_size=500)
+
+    ranking.rebuild_rankings()
+    counters.rebuild_counts()
+    return {
+        'providers': providers,
+        'customers': customers,
+        'reviews': len(reviews),
+        'work_photos': len(photos),
+        'generated_at': now.isoformat(),
+    }
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+class QueryCounter:
+    """connection.execute_wrapper hook that just counts queries"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def decoded_size(response):
+    """(uncompressed bytes, bytes on the wire) of a test client response"""
+    wire = response.content
+    encoding = response.get('Content-Encoding')
+    if encoding == 'gzip':
+        return len(zlib.decompress(wire, 16 + zlib.MAX_WBITS)), len(wire)
+    if encoding == 'br':
+        return len(brotli.decompress(wire)), len(wire)
+    return len(wire), len(wire)
+
+
+def _measure(client, method, path, data=None):
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        start = time.perf_counter()
+        response = getattr(client, method)(path, data or {})
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    return (elapsed_ms, counter.count, *decoded_size(response), response.status_code)
+
+
+def listing_variants():
+    """(scenario name, query string) for every sort and filter on the listing"""
+    variants = [(f'providers_list:sort={sort}', f'?sort={sort}')
+                for sort in ('rating', 'reviews', 'name', 'newest')]
+    variants += [
+        ('providers_list:search', '?search=Sharma'),
+        ('providers_list:rating>=4', '?rating=4.0'),
+        ('providers_list:within=25km', '?within=25'),
+        ('providers_list:nearest', '?within=nearest&sort=distance'),
+        ('providers_list:available', '?available=1'),
+    ]
+    return variants
+
+
+def run_journeys(iterations=30, accept_encoding='br, gzip'):
+    """
+    login -> customer_home -> service_providers_list (each sort/filter) -> add_review,
+    repeated `iterations` times. Returns per-scenario stats; `bytes_per_response`
+    is the page size, `wire_bytes` what was sent after compression.
+    """
+    samples = {}
+
+    def record(name, result):
+        samples.setdefault(name, []).append(result)
+
+    customers = list(Customer.objects.select_related('user').order_by('pk')[:iterations])
+    targets = list(
+        ServiceProvider.objects.filter(district=HOT_DISTRICT).select_related('user').order_by('pk')[:iterations]
+    )
+    listing_path = f'/service/{HOT_SERVICE}/providers/'
+
+    for i in range(iterations):
+        customer = customers[i % len(customers)]
+        # Headers a browser sends when navigating within the site
+        client = Client(HTTP_ACCEPT_ENCODING=accept_encoding, HTTP_SEC_FETCH_SITE='same-origin')
+        record('login', _measure(client, 'post', '/login/customer/',
+                                 {'username': customer.user.phone_number, 'password': BENCH_PASSWORD}))
+        record('customer_home', _measure(client, 'get', '/customer/home/'))
+        for name, query in listing_variants():
+            record(name, _measure(client, 'get', listing_path + query))
+        if targets:
+            provider = targets[i % len(targets)]
+            path = f'/review/add/{provider.user.phone_number}/'
+            record('add_review:get', _measure(client, 'get', path))
+            record('add_review:post', _measure(client, 'post', path, {'rating': '4', 'comment': 'Benchmark review'}))
+
+    results = {}
+    for name, rows in samples.items():
+        latencies = [row[0] for row in rows]
+        results[name] = {
+            'requests': len(rows),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'queries_per_request': round(sum(row[1] for row in rows) / len(rows), 1),
+            'bytes_per_response': round(sum(row[2] for row in rows) / len(rows)),
+            'wire_bytes': round(sum(row[3] for row in rows) / len(rows)),
+            'statuses': sorted({row[4] for row in rows}),
+        }
+    return results
+
+
+def run_bookings(count=2000, seed=42):
+    """
+    Dispatch throughput: `count` pending requests spread over every
+    leaderboard, matched in dispatcher-sized batches as the queue would.
+    """
+    rng = random.Random(seed)
+    customer_ids = list(Customer.objects.values_list('pk', flat=True))
+    keys = list(ProviderLeaderboardEntry.objects.values_list('district', 'service').distinct())
+    if not customer_ids or not keys:
+        return None
+    created = ServiceRequest.objects.bulk_create([
+        ServiceRequest(customer_id=rng.choice(customer_ids), district=district, service_type=service,
+                       description='Benchmark request')
+        for district, service in (rng.choice(keys) for _ in range(count))
+    ], batch_size=1000)
+    request_ids = [service_request.pk for service_request in created]
+
+    offers = 0
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        for i in range(0, len(request_ids), booking.DISPATCH_BATCH_SIZE):
+            offers += booking.dispatch(request_ids[i:i + booking.DISPATCH_BATCH_SIZE])
+        elapsed = time.perf_counter() - start
+    return {
+        'requests': count,
+        'offers': offers,
+        'requests_per_minute': round(count / elapsed * 60),
+        'queries_per_request': round(len(queries) / count, 3),
+    }
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    List of (scenario, metric, baseline, current) regressions. Latency and
+    response size may grow by `threshold`; query counts may not grow at all.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'bytes_per_response'):
+            if current[metric] > previous[metric] * (1 + threshold):
+                regressions.append((name, metric, previous[metric], current[metric]))
+        if current['queries_per_request'] > previous['queries_per_request']:
+            regressions.append((name, 'queries_per_request', previous['queries_per_request'],
+                                current['queries_per_request']))
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_results(path, dataset, results):
+    with open(path, 'w') as fh:
+        json.dump({'dataset': dataset, 'scenarios': results}, fh, indent=2, sort_keys=True)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _request_otp(base_url, phone_number, user_type):
+    """GET the reset form for a CSRF cookie, then time the POST that sends the OTP"""
+    cookies = CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies), _NoRedirect)
+    path = f'{base_url}/forgot-password/{user_type}/'
+    opener.open(path).read()
+    token = next((cookie.value for cookie in cookies if cookie.name == 'csrftoken'), '')
+    body = urllib.parse.urlencode({'csrfmiddlewaretoken': token, 'phone_number': phone_number}).encode()
+    start = time.perf_counter()
+    try:
+        status = opener.open(path, body).status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return (time.perf_counter() - start) * 1000, status
+
+
+def _get(base_url, path):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(base_url + path) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return (time.perf_counter() - start) * 1000, status
+
+
+def _run_concurrent(send, concurrency, total, ok_status):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        rows = list(pool.map(lambda _: send(), range(total)))
+    wall_seconds = time.perf_counter() - start
+    latencies = [row[0] for row in rows]
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'wall_seconds': round(wall_seconds, 2),
+        'requests_per_second': round(total / wall_seconds, 2),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'max_ms': round(max(latencies), 2),
+        'ok': sum(1 for row in rows if row[1] == ok_status),
+        'statuses': sorted({row[1] for row in rows}),
+    }
+
+
+def run_concurrent_otp(base_url, phone_number, user_type='customer', concurrency=20, total=100):
+    """
+    Fire `total` password-reset OTP requests at a running server, `concurrency`
+    at a time. A successful send answers 302 (redirect to the OTP step).
+    """
+    base_url = base_url.rstrip('/')
+    return _run_concurrent(lambda: _request_otp(base_url, phone_number, user_type), concurrency, total, 302)
+
+
+def run_concurrent_get(base_url, path, concurrency=20, total=100):
+    """Plain GET load against a running server; 200 counts as ok"""
+    base_url = base_url.rstrip('/')
+    return _run_concurrent(lambda: _get(base_url, path), concurrency, total, 200)
+
+
+def _proc_children():
+    """{parent pid: [child pids]} for every process visible in /proc"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as fh:
+                # ppid is the 2nd field after the parenthesised command name
+                ppid = int(fh.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def process_tree_memory(pid):
+    """
+    Summed RSS and PSS in MiB of a process (e.g. the gunicorn master) and all
+    its descendants, read from /proc (Linux only). PSS splits copy-on-write
+    pages shared between workers, so it shows what preload_app saves; RSS
+    counts shared pages once per process.
+    """
+    children = _proc_children()
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        stack.extend(children.get(current, []))
+    totals = {'processes': 0, 'rss_mib': 0.0, 'pss_mib': 0.0}
+    for current in pids:
+        try:
+            with open(f'/proc/{current}/smaps_rollup') as fh:
+                fields = dict(line.split(':', 1) for line in fh if ':' in line and not line.startswith(' '))
+        except OSError:
+            continue
+        totals['processes'] += 1
+        totals['rss_mib'] += int(fields['Rss'].split()[0]) / 1024
+        totals['pss_mib'] += int(fields['Pss'].split()[0]) / 1024
+    totals['rss_mib'] = round(totals['rss_mib'], 1)
+    totals['pss_mib'] = round(totals['pss_mib'], 1)
+    return totals
+
+
+# Dropped from requirements.txt; importing any of them at startup is a regression
+UNUSED_PACKAGES = ('flask', 'werkzeug', 'jinja2', 'pygame', 'reportlab', 'crispy_forms')
+
+_COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from service.wsgi import application
+loaded = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+environ = {'PATH_INFO': sys.argv[1], 'HTTP_HOST': 'localhost'}
+setup_testing_defaults(environ)
+statuses = []
+b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+served = time.perf_counter()
+with open(sys.argv[2], 'w') as fh:
+    json.dump({'load_ms': (loaded - start) * 1000, 'first_request_ms': (served - loaded) * 1000,
+               'status': statuses[0]}, fh)
+"""
+
+
+def _cold_start_once(path, importtime=False):
+    # Results come back through a file: stdout carries the app's own log lines
+    with tempfile.NamedTemporaryFile('r', suffix='.json') as out:
+        command = [sys.executable] + (['-X', 'importtime'] if importtime else [])
+        command += ['-c', _COLD_START_SCRIPT, path, out.name]
+        start = time.perf_counter()
+        proc = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True, check=True)
+        total_ms = (time.perf_counter() - start) * 1000
+        result = json.load(out)
+    result['process_ms'] = total_ms
+    return result, proc.stderr
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us)] from `python -X importtime` output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile_cold_start(path='/', runs=5):
+    """
+    Start fresh interpreters that load service.wsgi and serve `path` once.
+    Returns median timings over `runs` plus the import table of an extra
+    `-X importtime` run (kept out of the timings, it slows imports down).
+    """
+    samples = [_cold_start_once(path)[0] for _ in range(runs)]
+    _, stderr = _cold_start_once(path, importtime=True)
+    median = {key: round(percentile([sample[key] for sample in samples], 50), 1)
+              for key in ('process_ms', 'load_ms', 'first_request_ms')}
+    median['status'] = samples[0]['status']
+    return median, parse_importtime(stderr)
@@ -0,0 +1,285 @@
+# booking.py - Service requests, offer fan-out and the in-process dispatch queue
+#
+# Creating a request is one INSERT; matching happens on a dispatcher thread
+# that drains the queue in batches, so a burst of N requests costs a handful
+# of queries per batch instead of per request. Accepting is a compare-and-set
+# UPDATE on the request status: exactly one provider can win.
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from . import availability, pubsub
+from .models import BookedInterval, ProviderLeaderboardEntry, ServiceOffer, ServiceProvider, ServiceRequest
+
+logger = logging.getLogger(__name__)
+
+# Providers offered each request
+OFFER_FANOUT = getattr(settings, 'BOOKING_OFFER_FANOUT', 5)
+# Providers with this many accepted, unfinished jobs get no new offers
+MAX_ACTIVE_JOBS = getattr(settings, 'BOOKING_MAX_ACTIVE_JOBS', 3)
+# Open (pending) requests a customer may have at once
+MAX_OPEN_REQUESTS = getattr(settings, 'BOOKING_MAX_OPEN_REQUESTS', 5)
+# Requests matched per round of queries
+DISPATCH_BATCH_SIZE = getattr(settings, 'BOOKING_DISPATCH_BATCH_SIZE', 200)
+# Offers returned by one inbox read
+INBOX_LIMIT = 50
+# How often the dispatcher re-queues recent pending requests that have no offers
+STRANDED_SWEEP_SECONDS = getattr(settings, 'BOOKING_STRANDED_SWEEP_SECONDS', 60)
+
+
+class BookingError(Exception):
+    """A booking action that isn't allowed in the request's current state"""
+
+
+def create_request(customer, service_type, district, description, preferred_start=None):
+    if ServiceRequest.objects.filter(customer=customer, status='pending').count() >= MAX_OPEN_REQUESTS:
+        raise BookingError(f'You already have {MAX_OPEN_REQUESTS} open requests. '
+                           'Cancel one or wait for a provider to accept.')
+    service_request = ServiceRequest.objects.create(
+        customer=customer, service_type=service_type, district=district, description=description,
+        preferred_start=preferred_start,
+    )
+    # Offers must not reference a request that could still roll back
+    transaction.on_commit(lambda: dispatcher.submit(service_request.pk))
+    return service_request
+
+
+def dispatch(request_ids):
+    """
+    Offer each pending request to the top-ranked available providers of its
+    (district, service) leaderboard: not at MAX_ACTIVE_JOBS, and free at the
+    requested time (or soon, for "as soon as possible"). Six queries per
+    batch however many requests it holds. Returns the number of offers created.
+    """
+    requests = list(ServiceRequest.objects.filter(pk__in=request_ids, status='pending')
+                    .values_list('pk', 'district', 'service_type', 'preferred_start'))
+    if not requests:
+        return 0
+
+    # Leaderboards of every (district, service) in the batch, best first
+    keys = {(district, service) for _, district, service, _ in requests}
+    ranked = defaultdict(list)
+    entries = ProviderLeaderboardEntry.objects.filter(
+        district__in={district for district, _ in keys}, service__in={service for _, service in keys},
+    ).order_by('position').values_list('district', 'service', 'provider_id')
+    for district, service, provider_id in entries:
+        if (district, service) in keys:
+            ranked[(district, service)].append(provider_id)
+
+    candidates = {provider_id for ids in ranked.values() for provider_id in ids}
+    busy = set(
+        ServiceRequest.objects.filter(provider_id__in=candidates, status='accepted')
+        .values('provider_id').annotate(active=Count('pk')).filter(active__gte=MAX_ACTIVE_JOBS)
+        .values_list('provider_id', flat=True)
+    )
+    # Re-dispatched requests keep the offers they already have
+    offered = set(ServiceOffer.objects.filter(request_id__in=[pk for pk, _, _, _ in requests])
+                  .values_list('request_id', 'provider_id'))
+
+    # Hours and bookings of every candidate over the span the batch asks about
+    now = timezone.now()
+    span_end = max(
+        [now + availability.AVAILABLE_WINDOW + availability.JOB_DURATION]
+        + [availability.job_slot(preferred_start, now)[1] or now for _, _, _, preferred_start in requests]
+    )
+    hours = availability.provider_hours(candidates)
+    booked = availability.busy_intervals(candidates, now, span_end)
+
+    offers = []
+    unmatched = 0
+    for pk, district, service, preferred_start in requests:
+        chosen = [provider_id for provider_id in ranked.get((district, service), ())
+                  if provider_id not in busy
+                  and availability.can_take(hours.get(provider_id), booked.get(provider_id, []), preferred_start, now)
+                  ][:OFFER_FANOUT]
+        if not chosen:
+            unmatched += 1
+        offers.extend(ServiceOffer(request_id=pk, provider_id=provider_id)
+                      for provider_id in chosen if (pk, provider_id) not in offered)
+    ServiceOffer.objects.bulk_create(offers, batch_size=500, ignore_conflicts=True)
+    inbox_hub.publish(offer.provider_id for offer in offers)
+    logger.info('requests dispatched', extra={
+        'requests': len(requests), 'offers': len(offers), 'unmatched': unmatched,
+    })
+    return len(offers)
+
+
+def _poll_new_offers(cursor):
+    """Providers with offers newer than cursor (the highest offer id seen)"""
+    if cursor is None:
+        # (Re)starting: take the last minute again so nothing created while
+        # the poller slept is missed; at worst a waiter re-reads for nothing
+        cursor = ServiceOffer.objects.filter(
+            created_at__lt=timezone.now() - timedelta(minutes=1),
+        ).order_by('-pk').values_list('pk', flat=True).first() or 0
+    rows = list(ServiceOffer.objects.filter(pk__gt=cursor).order_by('pk').values_list('pk', 'provider_id')[:5000])
+    if not rows:
+        return cursor, []
+    return rows[-1][0], [provider_id for _, provider_id in rows]
+
+
+# Channels are provider ids; dispatch() publishes, other workers are caught by polling
+inbox_hub = pubsub.Hub('inbox', poll=_poll_new_offers)
+
+
+def inbox(provider_id, cursor=0):
+    """
+    Open offers of a provider newer than cursor, oldest first, and the
+    cursor to pass next time. cursor 0 returns the current open offers.
+    """
+    offers = list(
+        ServiceOffer.objects.filter(provider_id=provider_id, status='offered', request__status='pending', pk__gt=cursor)
+        .select_related('request').order_by('pk')[:INBOX_LIMIT]
+    )
+    return offers, offers[-1].pk if offers else cursor
+
+
+def accept_offer(offer_id, provider):
+    """
+    Accept an offer. The request moves pending -> accepted with a single
+    conditional UPDATE, so when two providers accept at once one of them
+    gets a BookingError. The provider's row is locked first, so one
+    provider accepting two jobs at once can't book overlapping time.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Serializes this provider's accepts until the booking below commits
+        ServiceProvider.objects.select_for_update().get(pk=provider.pk)
+        offer = ServiceOffer.objects.filter(pk=offer_id, provider=provider).select_related('request').first()
+        if offer is None or offer.status != 'offered':
+            raise BookingError('This offer is no longer open.')
+        slot = availability.booking_slot(provider.pk, offer.request.preferred_start)
+        if slot is None:
+            raise BookingError('You are already booked for another job at that time.')
+        won = ServiceRequest.objects.filter(pk=offer.request_id, status='pending').update(
+            status='accepted', provider=provider, accepted_at=now,
+        )
+        if won:
+            BookedInterval.objects.create(provider=provider, request_id=offer.request_id, start=slot[0], end=slot[1])
+            ServiceOffer.objects.filter(pk=offer.pk).update(status='accepted', responded_at=now)
+            ServiceOffer.objects.filter(request_id=offer.request_id, status='offered').update(
+                status='withdrawn', responded_at=now,
+            )
+    if not won:
+        # After the block, so raising doesn't roll it back
+        ServiceOffer.objects.filter(pk=offer.pk, status='offered').update(status='withdrawn', responded_at=now)
+        raise BookingError('Another provider has already accepted this request.')
+    return offer.request_id
+
+
+def decline_offer(offer_id, provider):
+    declined = ServiceOffer.objects.filter(pk=offer_id, provider=provider, status='offered').update(
+        status='declined', responded_at=timezone.now(),
+    )
+    if not declined:
+        raise BookingError('This offer is no longer open.')
+
+
+def cancel_request(request_id, customer):
+    with transaction.atomic():
+        cancelled = ServiceRequest.objects.filter(pk=request_id, customer=customer, status='pending').update(
+            status='cancelled',
+        )
+        if not cancelled:
+            raise BookingError('Only requests no provider has accepted yet can be cancelled.')
+        ServiceOffer.objects.filter(request_id=request_id, status='offered').update(
+            status='withdrawn', responded_at=timezone.now(),
+        )
+
+
+def complete_request(request_id, provider):
+    with transaction.atomic():
+        completed = ServiceRequest.objects.filter(pk=request_id, provider=provider, status='accepted').update(
+            status='completed',
+        )
+        if not completed:
+            raise BookingError('Only your accepted jobs can be marked completed.')
+        availability.release(request_id)
+
+
+class Dispatcher:
+    """
+    A queue of request ids and one thread per process that dispatches them
+    in batches. The thread is started lazily (so it also exists in forked
+    gunicorn workers). On start and then every STRANDED_SWEEP_SECONDS it
+    re-queues recent pending requests that have no offers: ones a restarted
+    worker or a failed batch dropped, and ones no provider could take yet.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, request_id):
+        if settings.BACKGROUND_JOBS_INLINE:
+            dispatch([request_id])
+            return
+        self._ensure_started()
+        self.queue.put(request_id)
+
+    def wait(self):
+        """Block until everything submitted so far is dispatched"""
+        self.queue.join()
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A queue inherited through fork belongs to the parent's thread
+            self.queue = queue.Queue()
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='dispatcher', daemon=True).start()
+
+    def _stranded(self):
+        since = timezone.now() - timedelta(hours=1)
+        return list(ServiceRequest.objects.filter(status='pending', created_at__gte=since, offers__isnull=True)
+                    .values_list('pk', flat=True))
+
+    def _requeue_stranded(self):
+        try:
+            close_old_connections()
+            for request_id in self._stranded():
+                self.queue.put(request_id)
+        except Exception:
+            logger.exception('Re-queueing stranded requests failed')
+
+    def _run(self):
+        next_sweep = 0
+        while True:
+            if time.monotonic() >= next_sweep:
+                self._requeue_stranded()
+                next_sweep = time.monotonic() + STRANDED_SWEEP_SECONDS
+            try:
+                # Wake up for the next sweep even when nothing is submitted
+                batch = [self.queue.get(timeout=max(next_sweep - time.monotonic(), 0))]
+            except queue.Empty:
+                continue
+            # Drain whatever queued up meanwhile: one round of queries serves the whole batch
+            while len(batch) < DISPATCH_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                close_old_connections()
+                dispatch(batch)
+            except Exception:
+                logger.exception('Dispatching service requests failed', extra={'requests': len(batch)})
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+
+dispatcher = Dispatcher()
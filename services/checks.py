@@ -0,0 +1,62 @@
+# checks.py - System checks run by `manage.py check --deploy`
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.checks import Error, Tags, register
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.utils.module_loading import import_string
+
+from .context_processors import BUILT_CSS
+from .sms import ConsoleBackend
+from .templating import uses_cached_loader
+
+
+@register(Tags.templates, deploy=True)
+def check_template_caching(app_configs, **kwargs):
+    """Production must keep compiled templates in memory"""
+    errors = []
+    if settings.DEBUG:
+        errors.append(Error(
+            'DEBUG is True, so templates are re-read and re-parsed on every request.',
+            hint='Set the DEBUG environment variable to False in production.',
+            id='services.E001',
+        ))
+    for engine in engines.all():
+        if isinstance(engine, DjangoTemplates) and not settings.DEBUG and not uses_cached_loader(engine):
+            errors.append(Error(
+                f"Template engine '{engine.name}' does not use the cached loader.",
+                hint="Wrap its loaders in 'django.template.loaders.cached.Loader' (see TEMPLATES in settings.py).",
+                id='services.E002',
+            ))
+    return errors
+
+
+@register(Tags.staticfiles, deploy=True)
+def check_static_build(app_configs, **kwargs):
+    """Production must serve the compiled stylesheet from the collected, hashed files"""
+    if settings.DEBUG:
+        return []
+    try:
+        staticfiles_storage.url(BUILT_CSS)
+    except ValueError:
+        # No manifest at all, or one collected before app.css was built.
+        # Either way {% static %} raises and pages fall back to the Play CDN
+        return [Error(
+            f'{BUILT_CSS} is not in the collected static files.',
+            hint='Run `npm run build:css` and then `python manage.py collectstatic` (./build.sh does both).',
+            id='services.E003',
+        )]
+    return []
+
+
+@register(Tags.security, deploy=True)
+def check_sms_backend(app_configs, **kwargs):
+    """Production must send OTPs through a real SMS gateway"""
+    if settings.DEBUG or not issubclass(import_string(settings.SMS_BACKEND), ConsoleBackend):
+        return []
+    # With DEBUG off the console backend logs no OTP text, so codes reach nobody
+    return [Error(
+        f"SMS_BACKEND is '{settings.SMS_BACKEND}', which never delivers OTPs.",
+        hint="Set the SMS_BACKEND environment variable to a gateway, e.g. 'services.sms.Fast2SMSBackend'.",
+        id='services.E004',
+    )]
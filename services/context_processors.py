@@ -0,0 +1,28 @@
+# context_processors.py - Template context shared by every page
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+BUILT_CSS = 'css/app.css'
+
+
+@lru_cache(maxsize=None)
+def _collected_css_url():
+    try:
+        return staticfiles_storage.url(BUILT_CSS)
+    except ValueError:  # not in the manifest: `npm run build:css` wasn't run before collectstatic
+        return None
+
+
+def built_css_url():
+    """URL of the compiled stylesheet, or None to fall back to the CDN build"""
+    if settings.DEBUG:
+        # Checked per request so a fresh `npm run build:css` shows up without a restart
+        return staticfiles_storage.url(BUILT_CSS) if finders.find(BUILT_CSS) else None
+    return _collected_css_url()
+
+
+def assets(request):
+    return {'built_css_url': built_css_url()}
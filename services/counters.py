@@ -0,0 +1,68 @@
+# counters.py - Verified provider counts per (district, service) for the home grid
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+
+def apply_changes(added=(), removed=()):
+    """+1 for every (district, service) key in added, -1 for every key in removed"""
+    from .models import DistrictServiceCount
+
+    deltas = Counter(added)
+    deltas.subtract(removed)
+    for (district, service), delta in deltas.items():
+        if not delta:
+            continue
+        updated = DistrictServiceCount.objects.filter(district=district, service=service).update(
+            verified_count=F('verified_count') + delta
+        )
+        if not updated and delta > 0:
+            try:
+                with transaction.atomic():
+                    DistrictServiceCount.objects.create(district=district, service=service, verified_count=delta)
+            except IntegrityError:
+                # Another request created the row first
+                DistrictServiceCount.objects.filter(district=district, service=service).update(
+                    verified_count=F('verified_count') + delta
+                )
+
+
+def counts_for_district(district):
+    """Map service code -> verified provider count, in one indexed read"""
+    from .models import DistrictServiceCount
+
+    return dict(
+        DistrictServiceCount.objects.filter(district=district).values_list('service', 'verified_count')
+    )
+
+
+def rebuild_counts(stdout=None, districts=None):
+    """
+    Recount from ServiceProvider rows (consistency repair), or only the given
+    districts (after bulk changes).
+    """
+    from .models import ServiceProvider, DistrictServiceCount
+
+    providers = ServiceProvider.objects.filter(is_verified=True)
+    existing = DistrictServiceCount.objects.all()
+    if districts is not None:
+        providers = providers.filter(district__in=districts)
+        existing = existing.filter(district__in=districts)
+
+    totals = Counter()
+    rows = providers.values_list('district', 'service1', 'service2', 'service3').iterator()
+    for district, *services in rows:
+        for service in set(services) - {None, ''}:
+            totals[(district, service)] += 1
+
+    with transaction.atomic():
+        existing.delete()
+        DistrictServiceCount.objects.bulk_create([
+            DistrictServiceCount(district=district, service=service, verified_count=count)
+            for (district, service), count in totals.items()
+        ], batch_size=500)
+
+    if stdout:
+        stdout.write(f"Rebuilt {len(totals)} district/service counters")
+    return len(totals)
@@ -1,9 +1,48 @@
 # forms.py
+import calendar
+from datetime import timedelta
+
 from django import forms
 from django.contrib.auth.forms import AuthenticationForm, PasswordChangeForm
-from .models import User, ServiceProvider, Customer, Review, DISTRICT_CHOICES
+from .models import User, ServiceProvider, Customer, Review, ServiceRequest
+from .reference import district_choice_groups, is_district
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.forms import formset_factory
+from django.utils import timezone
+from functools import partial
+
+
+def validate_phone_number(phone):
+    """Format rules for a login phone number; returns it unchanged"""
+    if not phone.isdigit() or len(phone) != 10:
+        raise ValidationError("Phone number must be exactly 10 digits")
+    if phone[0] not in '6789':
+        raise ValidationError("Phone number must start with 6, 7, 8, or 9")
+    return phone
+
+
+class DistrictField(forms.ChoiceField):
+    """
+    District select with an <optgroup> per state. The dataset is only
+    loaded when a form is first rendered or validated, and base.html adds a
+    type-to-filter box in front of every select marked data-district-filter.
+    """
+
+    def __init__(self, blank_label=None, attrs=None, **kwargs):
+        kwargs.setdefault('widget', forms.Select(attrs={'data-district-filter': '', **(attrs or {})}))
+        super().__init__(choices=partial(district_choice_groups, blank_label), **kwargs)
+
+    def valid_value(self, value):
+        # A dict lookup instead of a walk over every option
+        return is_district(value)
+
+
+def validate_aadhar_number(aadhar):
+    if not aadhar.isdigit() or len(aadhar) != 12:
+        raise ValidationError("Aadhar number must be exactly 12 digits")
+    return aadhar
+
 
 class LoginForm(AuthenticationForm):
     username = forms.CharField(
@@ -22,7 +61,66 @@ class LoginForm(AuthenticationForm):
     )
 
 
-class ProviderRegistrationForm(forms.ModelForm):
+class RegistrationMixin:
+    """
+    register() creates the user and their profile in one transaction, so a
+    failure never leaves a user without a profile. Uniqueness is left to the
+    database constraints: a clash rolls both rows back and becomes a form
+    error, instead of costing existence queries on every registration.
+    """
+    user_type = None
+    # The profile row created with the user, and the cleaned form fields copied onto it
+    profile_model = None
+    profile_fields = ()
+
+    def build_profile(self, user):
+        profile = self.profile_model(user=user)
+        for field in self.profile_fields:
+            setattr(profile, field, self.cleaned_data[field])
+        return profile
+
+    def register(self):
+        """The new user, or None (with form errors added) if a unique value is taken"""
+        data = self.cleaned_data
+        user = User(phone_number=data['phone_number'], name=data['name'], user_type=self.user_type)
+        # Hashing is the slow part; the form has already passed every other check
+        user.set_password(data['password'])
+        profile = self.build_profile(user)
+        try:
+            with transaction.atomic():
+                # phone_number is the primary key: a plain save() would UPDATE an existing user
+                user.save(force_insert=True)
+                profile.save(force_insert=True)
+        except IntegrityError:
+            self._add_conflict_errors(profile)
+            return None
+        return user
+
+    def conflicts(self):
+        """(field, message) for the unique values someone else has registered"""
+        if User.objects.filter(phone_number=self.cleaned_data['phone_number']).exists():
+            return [('phone_number', 'This phone number is already registered')]
+        return []
+
+    def _add_conflict_errors(self, profile):
+        # A photo is stored just before the profile INSERT; don't leave it behind
+        photo = getattr(profile, 'photo', None)
+        if photo and photo._committed:
+            photo.delete(save=False)
+        conflicts = self.conflicts()
+        for field, message in conflicts:
+            self.add_error(field, message)
+        if not conflicts:
+            # Taken and freed again in between; rare enough to just retry
+            self.add_error(None, 'Registration failed, please try again.')
+
+
+class ProviderRegistrationForm(RegistrationMixin, forms.ModelForm):
+    user_type = 'provider'
+    profile_model = ServiceProvider
+    profile_fields = ('address', 'district', 'aadhar_number', 'date_of_birth', 'photo',
+                      'service1', 'service2', 'service3')
+
     password = forms.CharField(
         widget=forms.PasswordInput(attrs={'class': 'input input-bordered w-full', 'placeholder': 'Password'}),
         min_length=6
@@ -42,10 +140,7 @@ class ProviderRegistrationForm(forms.ModelForm):
     address = forms.CharField(
         widget=forms.Textarea(attrs={'class': 'textarea textarea-bordered w-full', 'rows': 3, 'placeholder': 'Complete Address'})
     )
-    district = forms.ChoiceField(
-        choices=[('', 'Select District')] + DISTRICT_CHOICES,
-        widget=forms.Select(attrs={'class': 'select select-bordered w-full'})
-    )
+    district = DistrictField('Select District', attrs={'class': 'select select-bordered w-full'})
     aadhar_number = forms.CharField(
         max_length=12,
         widget=forms.TextInput(attrs={'class': 'input input-bordered w-full', 'placeholder': '12-digit Aadhar Number'})
@@ -75,25 +170,44 @@ class ProviderRegistrationForm(forms.ModelForm):
         return confirm_password
 
     def clean_phone_number(self):
-        phone = self.cleaned_data.get('phone_number')
-        if User.objects.filter(phone_number=phone).exists():
-            raise ValidationError("This phone number is already registered")
-        if not phone.isdigit() or len(phone) != 10:
-            raise ValidationError("Phone number must be exactly 10 digits")
-        if phone[0] not in '6789':
-            raise ValidationError("Phone number must start with 6, 7, 8, or 9")
-        return phone
+        return validate_phone_number(self.cleaned_data.get('phone_number'))
 
     def clean_aadhar_number(self):
-        aadhar = self.cleaned_data.get('aadhar_number')
-        if ServiceProvider.objects.filter(aadhar_number=aadhar).exists():
-            raise ValidationError("This Aadhar number is already registered")
-        if not aadhar.isdigit() or len(aadhar) != 12:
-            raise ValidationError("Aadhar number must be exactly 12 digits")
-        return aadhar
+        return validate_aadhar_number(self.cleaned_data.get('aadhar_number'))
+
+    def conflicts(self):
+        conflicts = super().conflicts()
+        if ServiceProvider.objects.filter(aadhar_number=self.cleaned_data['aadhar_number']).exists():
+            conflicts.append(('aadhar_number', 'This Aadhar number is already registered'))
+        return conflicts
+
+
+class ProviderImportForm(ProviderRegistrationForm):
+    """
+    One row of `manage.py import_providers`: the registration rules, minus
+    the photo and password confirmation, plus an optional exact location.
+    Whether phone and Aadhar are already taken is checked per batch by the
+    importer.
+    """
+    confirm_password = None
+    photo = None
+    latitude = forms.FloatField(required=False, min_value=-90, max_value=90)
+    longitude = forms.FloatField(required=False, min_value=-180, max_value=180)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        latitude = cleaned_data.get('latitude')
+        longitude = cleaned_data.get('longitude')
+        if (latitude is None) != (longitude is None):
+            raise ValidationError("Enter both latitude and longitude, or leave both empty")
+        return cleaned_data
 
 
-class CustomerRegistrationForm(forms.Form):
+class CustomerRegistrationForm(RegistrationMixin, forms.Form):
+    user_type = 'customer'
+    profile_model = Customer
+    profile_fields = ('address', 'district')
+
     phone_number = forms.CharField(
         max_length=10,
         widget=forms.TextInput(attrs={'class': 'input input-bordered w-full', 'placeholder': '10-digit phone number'})
@@ -102,10 +216,7 @@ class CustomerRegistrationForm(forms.Form):
         max_length=100,
         widget=forms.TextInput(attrs={'class': 'input input-bordered w-full', 'placeholder': 'Full Name'})
     )
-    district = forms.ChoiceField(
-        choices=[('', 'Select District')] + DISTRICT_CHOICES,
-        widget=forms.Select(attrs={'class': 'select select-bordered w-full'})
-    )
+    district = DistrictField('Select District', attrs={'class': 'select select-bordered w-full'})
     password = forms.CharField(
         widget=forms.PasswordInput(attrs={'class': 'input input-bordered w-full', 'placeholder': 'Password'}),
         min_length=6
@@ -126,14 +237,7 @@ class CustomerRegistrationForm(forms.Form):
         return confirm_password
 
     def clean_phone_number(self):
-        phone = self.cleaned_data.get('phone_number')
-        if User.objects.filter(phone_number=phone).exists():
-            raise ValidationError("This phone number is already registered")
-        if not phone.isdigit() or len(phone) != 10:
-            raise ValidationError("Phone number must be exactly 10 digits")
-        if phone[0] not in '6789':
-            raise ValidationError("Phone number must start with 6, 7, 8, or 9")
-        return phone
+        return validate_phone_number(self.cleaned_data.get('phone_number'))
 
 
 class ProfileEditForm(forms.ModelForm):
@@ -151,34 +255,48 @@ class ProviderProfileEditForm(forms.ModelForm):
     address = forms.CharField(
         widget=forms.Textarea(attrs={'class': 'textarea textarea-bordered w-full', 'rows': 3})
     )
-    district = forms.ChoiceField(
-        choices=DISTRICT_CHOICES,
-        widget=forms.Select(attrs={'class': 'select select-bordered w-full'})
-    )
+    district = DistrictField(attrs={'class': 'select select-bordered w-full'})
     photo = forms.ImageField(
         required=False,
         widget=forms.FileInput(attrs={'class': 'file-input file-input-bordered w-full'})
     )
+    latitude = forms.FloatField(
+        required=False,
+        min_value=-90,
+        max_value=90,
+        widget=forms.NumberInput(attrs={'class': 'input input-bordered w-full', 'step': 'any', 'placeholder': 'Latitude (optional)'})
+    )
+    longitude = forms.FloatField(
+        required=False,
+        min_value=-180,
+        max_value=180,
+        widget=forms.NumberInput(attrs={'class': 'input input-bordered w-full', 'step': 'any', 'placeholder': 'Longitude (optional)'})
+    )
     
     class Meta:
         model = ServiceProvider
-        fields = ['address', 'district', 'photo', 'service1', 'service2', 'service3']
+        fields = ['address', 'district', 'photo', 'latitude', 'longitude', 'service1', 'service2', 'service3']
         widgets = {
             'service1': forms.Select(attrs={'class': 'select select-bordered w-full'}),
             'service2': forms.Select(attrs={'class': 'select select-bordered w-full'}),
             'service3': forms.Select(attrs={'class': 'select select-bordered w-full'}),
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        latitude = cleaned_data.get('latitude')
+        longitude = cleaned_data.get('longitude')
+        if (latitude is None) != (longitude is None):
+            raise ValidationError("Enter both latitude and longitude, or leave both empty")
+        return cleaned_data
+
 
 class CustomerProfileEditForm(forms.ModelForm):
     address = forms.CharField(
         required=False,
         widget=forms.Textarea(attrs={'class': 'textarea textarea-bordered w-full', 'rows': 3})
     )
-    district = forms.ChoiceField(
-        choices=DISTRICT_CHOICES,
-        widget=forms.Select(attrs={'class': 'select select-bordered w-full'})
-    )
+    district = DistrictField(attrs={'class': 'select select-bordered w-full'})
     
     class Meta:
         model = Customer
@@ -216,12 +334,85 @@ class ReviewForm(forms.ModelForm):
         fields = ['rating', 'comment']
 
 
-class DistrictSelectionForm(forms.Form):
-    district = forms.ChoiceField(
-        choices=[('', 'Select Your District')] + DISTRICT_CHOICES,
-        widget=forms.Select(attrs={'class': 'select select-bordered select-lg w-full max-w-md'})
+class ServiceRequestForm(forms.ModelForm):
+    description = forms.CharField(
+        max_length=1000,
+        widget=forms.Textarea(attrs={
+            'class': 'textarea textarea-bordered w-full',
+            'rows': 4,
+            'placeholder': 'Describe the job: what needs doing, where, and when suits you'
+        })
     )
 
+    preferred_start = forms.DateTimeField(
+        required=False,
+        input_formats=['%Y-%m-%dT%H:%M'],
+        widget=forms.DateTimeInput(attrs={'class': 'input input-bordered w-full', 'type': 'datetime-local'},
+                                   format='%Y-%m-%dT%H:%M'),
+        help_text='Leave empty for as soon as possible'
+    )
+
+    class Meta:
+        model = ServiceRequest
+        fields = ['preferred_start', 'description']
+
+    def clean_preferred_start(self):
+        preferred_start = self.cleaned_data.get('preferred_start')
+        if preferred_start is None:
+            return None
+        now = timezone.now()
+        if preferred_start < now - timedelta(minutes=5):
+            raise ValidationError("Choose a time in the future")
+        if preferred_start > now + timedelta(days=30):
+            raise ValidationError("Bookings can be made up to 30 days ahead")
+        return preferred_start
+
+
+class WorkingHoursForm(forms.Form):
+    """Start and end time per weekday; a day with both empty is a day off"""
+
+    def __init__(self, *args, working_hours=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        working_hours = working_hours or []
+        for day, day_name in enumerate(calendar.day_name):
+            hours = working_hours[day] if day < len(working_hours) else None
+            for index, part in enumerate(('start', 'end')):
+                self.fields[f'{part}_{day}'] = forms.TimeField(
+                    required=False,
+                    label=f'{day_name} {part}',
+                    initial=hours[index] if hours else None,
+                    widget=forms.TimeInput(attrs={'class': 'input input-bordered w-full', 'type': 'time'},
+                                           format='%H:%M'),
+                )
+
+    def days(self):
+        """(day name, start field, end field) for the template"""
+        return [(day_name, self[f'start_{day}'], self[f'end_{day}'])
+                for day, day_name in enumerate(calendar.day_name)]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for day, day_name in enumerate(calendar.day_name):
+            start, end = cleaned_data.get(f'start_{day}'), cleaned_data.get(f'end_{day}')
+            if (start is None) != (end is None):
+                raise ValidationError(f"Enter both a start and an end time for {day_name}, or leave both empty")
+            if start is not None and start == end:
+                raise ValidationError(f"{day_name}: start and end time can't be the same")
+        return cleaned_data
+
+    def working_hours(self):
+        """ServiceProvider.working_hours for the cleaned form; [] when every day is empty"""
+        hours = []
+        for day in range(7):
+            start, end = self.cleaned_data[f'start_{day}'], self.cleaned_data[f'end_{day}']
+            hours.append([start.strftime('%H:%M'), end.strftime('%H:%M')] if start else None)
+        return hours if any(hours) else []
+
+
+class DistrictSelectionForm(forms.Form):
+    district = DistrictField('Select Your District',
+                             attrs={'class': 'select select-bordered select-lg w-full max-w-md'})
+
 
 # Forgot Password Flow Forms
 class ForgotPasswordStep1Form(forms.Form):
@@ -0,0 +1,136 @@
+# geo.py - District centroids and geohash buckets for proximity search
+import math
+
+from . import reference
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Precision 4 gives cells of roughly 20 km x 39 km, small enough that a
+# district-sized radius touches only a handful of buckets
+GEOHASH_PRECISION = 4
+
+# Nearest-N search: the first radius is read alone, and if it holds too few
+# providers, everything else out to the last one is read in one more query
+SEARCH_RADII_KM = (10, 200)
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_encode(lat, lon, precision=GEOHASH_PRECISION):
+    """Encode a coordinate as a geohash string"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def _cell_size(precision):
+    """Return (lat_degrees, lon_degrees) covered by one geohash cell"""
+    total_bits = precision * 5
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def cells_within(lat, lon, radius_km, precision=GEOHASH_PRECISION):
+    """All geohash cells overlapping the bounding box of a circle"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    dlon = dlat / max(math.cos(math.radians(lat)), 0.01)
+    cell_lat, cell_lon = _cell_size(precision)
+
+    def steps(start, stop, size):
+        # Every cell edge between start and stop, plus the far edge itself
+        values = []
+        value = start
+        while value < stop:
+            values.append(value)
+            value += size
+        values.append(stop)
+        return values
+
+    cells = set()
+    for y in steps(max(lat - dlat, -90.0), min(lat + dlat, 90.0), cell_lat):
+        for x in steps(lon - dlon, lon + dlon, cell_lon):
+            cells.add(geohash_encode(y, x, precision))
+    return cells
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def district_centroid(district):
+    """Centroid for a district code, or None if unknown"""
+    return reference.district_centroid(district)
+
+
+def position_of(latitude, longitude, district):
+    """Exact provider position if set, otherwise the district centroid"""
+    if latitude is not None and longitude is not None:
+        return latitude, longitude
+    return district_centroid(district)
+
+
+def _distances_in_cells(queryset, cells, lat, lon, radius_km):
+    """Map provider pk -> distance (km) for providers in the given geohash cells within radius_km"""
+    candidates = queryset.filter(geo_cell__in=cells).order_by().values_list('pk', 'latitude', 'longitude', 'district')
+
+    distances = {}
+    for pk, p_lat, p_lon, district in candidates:
+        position = position_of(p_lat, p_lon, district)
+        if position is None:
+            continue
+        distance = haversine_km(lat, lon, *position)
+        if distance <= radius_km:
+            distances[pk] = round(distance, 1)
+    return distances
+
+
+def providers_within(queryset, lat, lon, radius_km):
+    """
+    Map provider pk -> distance (km) for providers in queryset within radius_km.
+    Only rows in the covering geohash buckets are read, via the geo_cell index.
+    """
+    return _distances_in_cells(queryset, cells_within(lat, lon, radius_km), lat, lon, radius_km)
+
+
+def nearest_providers(queryset, lat, lon, limit=20):
+    """
+    Map provider pk -> distance (km) for the nearest `limit` providers within
+    the last search radius. At most two queries: the cells of the first
+    radius, then, if fewer than `limit` providers are that close, the ring
+    of cells around them. Growing the radius a step at a time would re-read
+    the inner cells with the same query on every step.
+    """
+    first, last = SEARCH_RADII_KM[0], SEARCH_RADII_KM[-1]
+    inner = cells_within(lat, lon, first)
+    distances = _distances_in_cells(queryset, inner, lat, lon, last)
+    # Anyone within `first` km is in the inner cells, so they are certainly the closest
+    if sum(distance <= first for distance in distances.values()) < limit:
+        outer = cells_within(lat, lon, last) - inner
+        distances.update(_distances_in_cells(queryset, outer, lat, lon, last))
+    nearest = sorted(distances.items(), key=lambda item: item[1])[:limit]
+    return dict(nearest)
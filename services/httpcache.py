@@ -0,0 +1,97 @@
+# httpcache.py - Conditional GET (ETag / Last-Modified) and Cache-Control helpers
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+def has_pending_messages(request):
+    """True if the page would show flash messages (without marking them as read)"""
+    storage = getattr(request, '_messages', None)
+    return storage is not None and len(storage) > 0
+
+
+def _validators(request, user, stamp):
+    """
+    Weak ETag and Last-Modified timestamp for a page stamp. The ETag also
+    covers who is looking (navbar) and their CSRF cookie (tokens in forms);
+    it is weak because masked CSRF tokens make every render differ in bytes.
+    """
+    parts, last_modified = stamp
+    viewer = (user.pk, getattr(user, 'name', None), request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''))
+    digest = hashlib.md5(repr((parts, viewer)).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"', int(last_modified.timestamp()) if last_modified else None
+
+
+def _finish(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        if last_modified and not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(last_modified)
+    # Browsers may keep a copy but must revalidate it on every visit
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def conditional_page(stamp_func):
+    """
+    Answer repeat GETs with 304 Not Modified before the view runs.
+
+    `stamp_func(request, *args, **kwargs)` must be cheap (one or two
+    aggregate queries) and return `(parts, last_modified)`, where `parts` is
+    anything with a stable repr that changes whenever the page would, or
+    None to always run the view. Wrapping an async view needs an async
+    stamp_func. Pages with pending flash messages are always rendered.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD') or has_pending_messages(request):
+                    return await view(request, *args, **kwargs)
+                stamp = await stamp_func(request, *args, **kwargs)
+                if stamp is None:
+                    return await view(request, *args, **kwargs)
+                user = await request.auser()
+                etag, last_modified = _validators(request, user, stamp)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _finish(response, etag, last_modified)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or has_pending_messages(request):
+                return view(request, *args, **kwargs)
+            stamp = stamp_func(request, *args, **kwargs)
+            if stamp is None:
+                return view(request, *args, **kwargs)
+            etag, last_modified = _validators(request, request.user, stamp)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _finish(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def public_page(view):
+    """
+    Let browsers and CDNs cache a page for PUBLIC_PAGE_MAX_AGE seconds when
+    it is the same for everyone: anonymous visitor, no flash messages.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if request.user.is_authenticated or has_pending_messages(request):
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, public=True, max_age=settings.PUBLIC_PAGE_MAX_AGE)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+    return wrapper
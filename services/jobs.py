@@ -0,0 +1,77 @@
+# jobs.py - In-process background jobs with progress stored in the database
+# Jobs run on a small thread pool inside the web process, so admin actions
+# return at once; any worker can show progress because it lives in
+# BackgroundJob rows. A job lost to a restart stays "running" and can simply
+# be started again.
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_executor = None
+_executor_pid = None
+
+
+def register(name):
+    """Decorator: `@jobs.register('name')` on a function `fn(job, **params)` returning a JSON-able result"""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def _get_executor():
+    # One pool per process: a pool inherited through fork has no threads
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=settings.BACKGROUND_JOB_THREADS, thread_name_prefix='job')
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def enqueue(name, user=None, **params):
+    """Create a BackgroundJob and start it once the current transaction commits"""
+    if name not in _registry:
+        raise KeyError(f"Unknown job {name!r}")
+    job = BackgroundJob.objects.create(name=name, params=params, created_by=user)
+    if settings.BACKGROUND_JOBS_INLINE:
+        _run(job.pk)
+        job.refresh_from_db()
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_run, job.pk))
+    return job
+
+
+def set_progress(job, processed, total=None):
+    job.processed = processed
+    fields = {'processed': processed}
+    if total is not None:
+        job.total = fields['total'] = total
+    BackgroundJob.objects.filter(pk=job.pk).update(**fields)
+
+
+def _run(job_id):
+    close_old_connections()
+    job = BackgroundJob.objects.get(pk=job_id)
+    BackgroundJob.objects.filter(pk=job_id).update(status='running', started_at=timezone.now())
+    try:
+        result = _registry[job.name](job, **job.params)
+    except Exception as e:
+        logger.exception('background job failed', extra={'job': job.name, 'job_id': job_id})
+        BackgroundJob.objects.filter(pk=job_id).update(status='failed', error=str(e), finished_at=timezone.now())
+    else:
+        BackgroundJob.objects.filter(pk=job_id).update(
+            status='done', processed=job.total or job.processed, result=result, finished_at=timezone.now(),
+        )
+        logger.info('background job finished', extra={'job': job.name, 'job_id': job_id})
+    finally:
+        if not settings.BACKGROUND_JOBS_INLINE:
+            connection.close()
@@ -0,0 +1,161 @@
+# log.py - Structured JSON logging with request IDs and a non-blocking queue handler
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+request_id_var = ContextVar('request_id', default='-')
+
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+logger = logging.getLogger('services.request')
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp every record with the id of the request being handled"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra={...}` fields become top-level keys"""
+
+    def format(self, record):
+        payload = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+            'pid': record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exc'] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class NonBlockingHandler(QueueHandler):
+    """
+    Request threads only put records on an in-memory queue; a QueueListener
+    thread formats them and writes to stdout. The listener is (re)started
+    lazily per process so it also works after gunicorn forks its workers.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        target = logging.StreamHandler(stream or sys.stdout)
+        target.setFormatter(JsonFormatter())
+        self._target = target
+        self._listener = None
+        self._pid = None
+
+    def prepare(self, record):
+        # Render message and traceback now (args may be mutated later),
+        # but keep the record structured for the JSON formatter
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not isinstance(value, (str, int, float, bool, type(None), list, dict)):
+                setattr(record, key, str(value))
+        if record.exc_info:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info)).rstrip()
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._start_listener()
+        super().emit(record)
+
+    def _start_listener(self):
+        # A fresh queue after fork: the inherited one may hold a lock taken
+        # by the parent's listener thread, which doesn't exist in this process
+        self._pid = os.getpid()
+        self.queue = queue.SimpleQueue()
+        self._listener = QueueListener(self.queue, self._target, respect_handler_level=True)
+        self._listener.start()
+        atexit.register(self._listener.stop)
+
+
+class RequestIdMiddleware:
+    """
+    Assigns each request an id (reusing a sane incoming X-Request-ID),
+    echoes it in the response and logs one timing line per request.
+    Works natively under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token, start = self._begin(request)
+        try:
+            return self._finish(request, self.get_response(request), start)
+        finally:
+            request_id_var.reset(token)
+
+    async def __acall__(self, request):
+        token, start = self._begin(request)
+        try:
+            return self._finish(request, await self.get_response(request), start)
+        finally:
+            request_id_var.reset(token)
+
+    @staticmethod
+    def _begin(request):
+        incoming = request.headers.get('X-Request-ID', '')
+        request.request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        return request_id_var.set(request.request_id), time.perf_counter()
+
+    @staticmethod
+    def _finish(request, response, start):
+        match = getattr(request, 'resolver_match', None)
+        logger.info('request finished', extra={
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - start) * 1000, 2),
+        })
+        response['X-Request-ID'] = request.request_id
+        return response
+
+
+@contextmanager
+def span(name, log=logger, **fields):
+    """Log how long a block took: `with span('listing.query', service=code): ...`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        log.info('span', extra={'span': name, 'duration_ms': round((time.perf_counter() - start) * 1000, 2), **fields})
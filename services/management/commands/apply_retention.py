@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from services import retention
+
+
+class Command(BaseCommand):
+    help = ("Delete or archive rows older than their retention policy (see services/retention.py), "
+            "in small chunks with pauses so the site keeps running. Run it nightly.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('policies', nargs='*', help='Policy names (default: all)')
+        parser.add_argument('--list', action='store_true', help='Show the policies and exit')
+        parser.add_argument('--dry-run', action='store_true', help='Only count expired rows')
+        parser.add_argument('--chunk-size', type=int, default=retention.CHUNK_SIZE)
+        parser.add_argument('--pause', type=float, default=retention.PAUSE, help='Seconds to sleep between chunks')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for policy in retention.POLICIES:
+                self.stdout.write(str(policy))
+            return
+        try:
+            policies = retention.get_policies(options['policies'])
+        except KeyError as e:
+            raise CommandError(e.args[0])
+
+        def progress(policy, done, total):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'  {policy.name}: {done}/{total}')
+
+        verb = 'would remove' if options['dry_run'] else 'removed'
+        for policy in policies:
+            count = retention.apply_policy(policy, dry_run=options['dry_run'], chunk_size=options['chunk_size'],
+                                           pause=options['pause'], progress=progress)
+            archived = f" (archived to {retention.ARCHIVE_DIR})" if policy.archive and count and not options['dry_run'] else ''
+            self.stdout.write(f"{policy.name}: {verb} {count} row(s){archived}")
+        self.stdout.write(self.style.SUCCESS('Retention applied' if not options['dry_run'] else 'Dry run, nothing removed'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from services import backups
+
+
+class Command(BaseCommand):
+    help = ("Snapshot the database (SQLite online backup API, or pg_dump) and MEDIA_ROOT into the backup "
+            "directory. Safe while the site is running; media is stored by content hash, so only new or "
+            "changed files are copied.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=str(backups.BACKUP_DIR), help='Backup directory (default: BACKUP_DIR)')
+        parser.add_argument('--skip-media', action='store_true', help='Only back up the database')
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--list', action='store_true', help='List existing snapshots and exit')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name in backups.list_snapshots(options['dir']):
+                self.stdout.write(name)
+            return
+
+        def progress(done, total):
+            if total and options['verbosity'] >= 2:
+                self.stdout.write(f'  {done}/{total} pages')
+
+        try:
+            manifest = backups.create_backup(options['dir'], using=options['database'],
+                                             include_media=not options['skip_media'], progress=progress)
+        except backups.BackupError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Database: {manifest['database']['size']} bytes")
+        if manifest['media'] is not None:
+            stats = manifest['media_stats']
+            self.stdout.write(f"Media: {stats['files']} file(s), {stats['copied']} new "
+                              f"({stats['bytes_copied']} bytes copied)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot {manifest['name']} written to {options['dir']} in {manifest['seconds']}s"
+        ))
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from services import benchmarking
+
+
+class Command(BaseCommand):
+    help = ("Run the customer journey benchmark against a throwaway database filled with synthetic data. "
+            "Reports p50/p95/p99 latency, queries per request and bytes per response (before and after "
+            "compression) per scenario.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--providers', type=int, default=500, help='Synthetic providers to create')
+        parser.add_argument('--customers', type=int, default=50, help='Synthetic customers to create')
+        parser.add_argument('--reviews', type=int, default=8, help='Reviews per provider')
+        parser.add_argument('--photos', type=int, default=3, help='Work photos per provider')
+        parser.add_argument('--iterations', type=int, default=30, help='Times each journey is repeated')
+        parser.add_argument('--bookings', type=int, default=0,
+                            help='Also dispatch this many service requests and report throughput')
+        parser.add_argument('--accept-encoding', default='br, gzip',
+                            help="Accept-Encoding the journeys send ('identity' for uncompressed)")
+        parser.add_argument('--save', metavar='PATH', help='Write results as JSON (e.g. to use as a baseline)')
+        parser.add_argument('--compare', metavar='PATH', help='Baseline JSON to check for regressions')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed latency/size growth over the baseline (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        baseline = benchmarking.load_baseline(options['compare']) if options['compare'] else None
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        # Measure what production runs, without the development query watcher
+        watcher = override_settings(QUERYWATCH_ENABLED=False)
+        watcher.enable()
+        try:
+            self.stdout.write(f"Generating {options['providers']} providers...")
+            dataset = benchmarking.generate_data(
+                providers=options['providers'],
+                customers=options['customers'],
+                reviews_per_provider=options['reviews'],
+                photos_per_provider=options['photos'],
+            )
+            self.stdout.write(f"Running {options['iterations']} iterations of each journey...")
+            results = benchmarking.run_journeys(
+                iterations=options['iterations'], accept_encoding=options['accept_encoding'],
+            )
+            bookings = benchmarking.run_bookings(options['bookings']) if options['bookings'] else None
+        finally:
+            watcher.disable()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write('')
+        self.stdout.write(f"{'scenario':<32}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'bytes':>10}{'wire':>9}{'saved':>7}  status")
+        for name, row in results.items():
+            saved = 1 - row['wire_bytes'] / row['bytes_per_response'] if row['bytes_per_response'] else 0
+            self.stdout.write(
+                f"{name:<32}{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}"
+                f"{row['queries_per_request']:>9}{row['bytes_per_response']:>10}{row['wire_bytes']:>9}"
+                f"{saved:>7.0%}  {row['statuses']}"
+            )
+
+        if bookings:
+            self.stdout.write('')
+            self.stdout.write(
+                f"dispatch: {bookings['requests']} requests -> {bookings['offers']} offers, "
+                f"{bookings['requests_per_minute']} requests/min, {bookings['queries_per_request']} queries/request"
+            )
+
+        if options['save']:
+            benchmarking.save_results(options['save'], dataset, results)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['save']}"))
+
+        if baseline is not None:
+            regressions = benchmarking.compare(results, baseline, options['threshold'])
+            if regressions:
+                self.stdout.write('')
+                for name, metric, before, after in regressions:
+                    self.stdout.write(self.style.ERROR(f"REGRESSION {name} {metric}: {before} -> {after}"))
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
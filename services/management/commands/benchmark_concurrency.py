@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from services import benchmarking
+
+
+class Command(BaseCommand):
+    help = ("Load a running server with concurrent requests. With --phone it sends password-reset OTPs, to "
+            "compare sync (WSGI) and async (ASGI) workers against a slow SMS stub "
+            "(SMS_BACKEND=services.sms.SlowStubBackend); with --path it GETs that page. "
+            "--pid also reports the memory of the gunicorn master and its workers.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the running server')
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--phone', help='Phone number of an existing account (OTP journey)')
+        target.add_argument('--path', help='Page to GET, e.g. / or /health/')
+        parser.add_argument('--user-type', default='customer', choices=['customer', 'provider'])
+        parser.add_argument('--concurrency', type=int, default=20, help='Requests in flight at once')
+        parser.add_argument('--requests', type=int, default=100, help='Total requests to send')
+        parser.add_argument('--pid', type=int, help='gunicorn master PID; report RSS/PSS before and after (Linux)')
+
+    def handle(self, *args, **options):
+        if options['pid']:
+            self._report_memory('memory before', options['pid'])
+        try:
+            if options['phone']:
+                result = benchmarking.run_concurrent_otp(
+                    options['url'], options['phone'], options['user_type'],
+                    concurrency=options['concurrency'], total=options['requests'],
+                )
+            else:
+                result = benchmarking.run_concurrent_get(
+                    options['url'], options['path'],
+                    concurrency=options['concurrency'], total=options['requests'],
+                )
+        except OSError as e:
+            raise CommandError(f"Could not reach {options['url']}: {e}")
+
+        for key, value in result.items():
+            self.stdout.write(f"{key:<22}{value}")
+        if options['pid']:
+            self._report_memory('memory after', options['pid'])
+        if result['ok'] < result['requests']:
+            self.stdout.write(self.style.WARNING(
+                f"{result['requests'] - result['ok']} request(s) failed; check the arguments and the server log"
+            ))
+
+    def _report_memory(self, label, pid):
+        memory = benchmarking.process_tree_memory(pid)
+        if not memory['processes']:
+            raise CommandError(f"No process {pid} (memory sampling needs Linux /proc)")
+        self.stdout.write(f"{label:<22}{memory['processes']} processes, "
+                          f"RSS {memory['rss_mib']} MiB, PSS {memory['pss_mib']} MiB")
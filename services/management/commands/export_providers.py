@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services import provider_io
+from services.reference import is_district
+
+
+class Command(BaseCommand):
+    help = ("Write providers as CSV or JSON Lines ('-' for stdout). Rows are streamed from the database, "
+            "so memory use stays flat however many providers there are. Passwords are not exported.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to write, or '-' for stdout")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension (csv)')
+        parser.add_argument('--district', help='Only providers in this district code')
+        parser.add_argument('--verified-only', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched from the database at a time')
+
+    def handle(self, *args, **options):
+        if options['district'] and not is_district(options['district']):
+            raise CommandError(f"Unknown district {options['district']!r}")
+        path = options['path']
+        fmt = options['format'] or provider_io.detect_format(path)
+        rows = provider_io.export_rows(
+            district=options['district'], verified_only=options['verified_only'], chunk_size=options['chunk_size'],
+        )
+        if path == '-':
+            provider_io.write_rows(rows, sys.stdout, fmt)
+            return
+        try:
+            with open(path, 'w', newline='', encoding='utf-8') as fh:
+                count = provider_io.write_rows(rows, fh, fmt)
+        except OSError as e:
+            raise CommandError(f"Cannot write {path}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Exported {count} provider(s) to {path}"))
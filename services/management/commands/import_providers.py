@@ -0,0 +1,52 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services import provider_io
+
+
+class Command(BaseCommand):
+    help = ("Bulk-register providers from a CSV or JSON Lines file ('-' for stdin), streaming it in batches. "
+            f"Columns: {', '.join(provider_io.IMPORT_FIELDS)} (service2/3, latitude, longitude optional). "
+            "Rows are checked with the registration form rules; bad rows are reported and skipped.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension (csv)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per transaction')
+        parser.add_argument('--workers', type=int, help='Password hashing processes (default: CPU count)')
+        parser.add_argument('--verified', action='store_true', help='Mark imported providers as verified')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or provider_io.detect_format(path)
+        try:
+            fh = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+
+        def report(line_num, message):
+            self.stderr.write(f"line {line_num}: {message}")
+
+        def progress(stats):
+            self.stdout.write(f"{stats['imported']} imported, {stats['skipped']} skipped...")
+
+        try:
+            stats = provider_io.import_providers(
+                provider_io.read_rows(fh, fmt),
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                verified=options['verified'],
+                dry_run=options['dry_run'],
+                report=report,
+                progress=None if options['dry_run'] else progress,
+            )
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"{stats['valid']} valid row(s), {stats['skipped']} rejected (dry run)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Imported {stats['imported']} provider(s), skipped {stats['skipped']}"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from services import benchmarking
+
+
+class Command(BaseCommand):
+    help = ("Measure cold start: time for a fresh interpreter to load service.wsgi and serve its first "
+            "request, with a `python -X importtime` summary of where import time goes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/', help='Page served as the first request')
+        parser.add_argument('--runs', type=int, default=5, help='Cold starts to take the median of')
+        parser.add_argument('--top', type=int, default=15, help='Rows to show in each table')
+
+    def handle(self, *args, **options):
+        timings, imports = benchmarking.profile_cold_start(options['path'], options['runs'])
+        self.stdout.write(f"process start to exit   {timings['process_ms']} ms")
+        self.stdout.write(f"load service.wsgi       {timings['load_ms']} ms")
+        self.stdout.write(f"first request ({options['path']})  {timings['first_request_ms']} ms  [{timings['status']}]")
+
+        by_package = {}
+        for module, self_us, _ in imports:
+            root = module.split('.')[0]
+            by_package[root] = by_package.get(root, 0) + self_us
+        self.stdout.write('')
+        self.stdout.write(f"{'package':<40}{'import ms':>10}")
+        for root, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f"{root:<40}{self_us / 1000:>10.1f}")
+
+        self.stdout.write('')
+        self.stdout.write(f"{'module (slowest own time)':<40}{'self ms':>10}{'cumul ms':>10}")
+        for module, self_us, cumulative_us in sorted(imports, key=lambda row: -row[1])[:options['top']]:
+            self.stdout.write(f"{module:<40}{self_us / 1000:>10.1f}{cumulative_us / 1000:>10.1f}")
+
+        unused = sorted({module.split('.')[0] for module, _, _ in imports} & set(benchmarking.UNUSED_PACKAGES))
+        if unused:
+            self.stdout.write(self.style.WARNING(f"Unused packages imported at startup: {', '.join(unused)}"))
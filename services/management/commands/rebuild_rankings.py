@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from services import ranking
+
+
+class Command(BaseCommand):
+    help = "Recompute provider ranking scores (applying recency decay) and rebuild all leaderboards"
+
+    def handle(self, *args, **options):
+        ranking.rebuild_rankings(stdout=self.stdout)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from services import counters
+
+
+class Command(BaseCommand):
+    help = "Recount verified providers per (district, service) from scratch"
+
+    def handle(self, *args, **options):
+        counters.rebuild_counts(stdout=self.stdout)
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from services import backups
+
+
+class Command(BaseCommand):
+    help = ("Restore a snapshot taken by `manage.py backup`. Every file is checked against the snapshot's "
+            "manifest first; nothing is touched if verification fails.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('snapshot', nargs='?', default='latest', help="Snapshot name (default: latest)")
+        parser.add_argument('--dir', default=str(backups.BACKUP_DIR), help='Backup directory (default: BACKUP_DIR)')
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--verify-only', action='store_true', help='Check the snapshot without restoring it')
+        parser.add_argument('--skip-media', action='store_true', help='Only restore the database')
+        parser.add_argument('--prune-media', action='store_true',
+                            help='Also delete media files that are not in the snapshot')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Do not ask for confirmation')
+
+    def handle(self, *args, **options):
+        try:
+            if options['verify_only']:
+                manifest = backups.verify_snapshot(options['snapshot'], options['dir'])
+                self.stdout.write(self.style.SUCCESS(f"Snapshot {manifest['name']} is intact"))
+                return
+            name, _ = backups.load_manifest(options['snapshot'], options['dir'])
+            if options['interactive']:
+                answer = input(f"This replaces the current database{'' if options['skip_media'] else ' and media'} "
+                               f"with snapshot {name}. Type 'yes' to continue: ")
+                if answer != 'yes':
+                    raise CommandError('Restore cancelled.')
+            result = backups.restore_snapshot(
+                name, options['dir'], using=options['database'], include_media=not options['skip_media'],
+                prune_media=options['prune_media'],
+            )
+        except backups.BackupError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored snapshot {result['snapshot']}: {result['media_restored']} media file(s) restored, "
+            f"{result['media_pruned']} removed"
+        ))
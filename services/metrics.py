@@ -0,0 +1,109 @@
+# metrics.py - In-process request metrics, exported in Prometheus text format
+# Every gunicorn worker keeps its own registry; Prometheus scrapes whichever
+# worker answers, so use per-instance rates/quantiles rather than raw totals.
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Per-request accumulators; None when no request is being measured
+current_request = ContextVar('metrics_current_request', default=None)
+
+
+class RequestStats:
+    """What one request spent in the database and in templates"""
+    __slots__ = ('query_count', 'query_seconds', 'template_seconds')
+
+    def __init__(self):
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """Histograms and counters keyed by (metric name, label tuple)"""
+
+    HISTOGRAMS = {
+        'servicehub_request_duration_seconds': ('Request latency', LATENCY_BUCKETS),
+        'servicehub_db_queries': ('Database queries per request', QUERY_COUNT_BUCKETS),
+        'servicehub_db_query_duration_seconds': ('Time spent in database queries per request', LATENCY_BUCKETS),
+        'servicehub_template_render_seconds': ('Time spent rendering templates per request', LATENCY_BUCKETS),
+        'servicehub_response_size_bytes': ('Response body size', SIZE_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._requests = {}
+
+    def record(self, view, method, status, duration, stats, size):
+        labels = (('view', view),)
+        with self._lock:
+            key = (view, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self._observe('servicehub_request_duration_seconds', labels, duration)
+            self._observe('servicehub_db_queries', labels, stats.query_count)
+            self._observe('servicehub_db_query_duration_seconds', labels, stats.query_seconds)
+            self._observe('servicehub_template_render_seconds', labels, stats.template_seconds)
+            if size is not None:
+                self._observe('servicehub_response_size_bytes', labels, size)
+
+    def _observe(self, name, labels, value):
+        histogram = self._histograms.get((name, labels))
+        if histogram is None:
+            histogram = self._histograms[(name, labels)] = Histogram(self.HISTOGRAMS[name][1])
+        histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._requests.clear()
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = [
+            '# HELP servicehub_requests_total Requests handled',
+            '# TYPE servicehub_requests_total counter',
+        ]
+        with self._lock:
+            for (view, method, status), value in sorted(self._requests.items()):
+                lines.append(
+                    f'servicehub_requests_total{{view="{_escape(view)}",method="{method}",status="{status}"}} {value}'
+                )
+            for name, (help_text, _) in self.HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, labels), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label_text}}} {histogram.total}')
+                    lines.append(f'{name}_count{{{label_text}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
@@ -0,0 +1,269 @@
+# middleware.py - Project middleware
+import gzip
+import io
+import re
+import secrets
+import string
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+from . import metrics
+
+
+def _add_execute_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def _remove_execute_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+class MetricsMiddleware:
+    """
+    Records per-view latency, DB query count/time, template render time and
+    response size into metrics.registry. Removed from the stack entirely
+    (MiddlewareNotUsed) unless METRICS_ENABLED is set. Async-capable, so
+    under ASGI latency is measured on the event loop, not on a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = metrics.RequestStats()
+        token = metrics.current_request.set(stats)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self._time_query):
+                response = self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+        return self._record(request, response, time.perf_counter() - start, stats)
+
+    async def __acall__(self, request):
+        stats = metrics.RequestStats()
+        token = metrics.current_request.set(stats)
+        start = time.perf_counter()
+        # Queries run on the request's sync thread, with its own connection,
+        # so the timing hook goes there (sync_to_async carries `stats` along)
+        await sync_to_async(_add_execute_wrapper)(self._time_query)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_execute_wrapper)(self._time_query)
+            metrics.current_request.reset(token)
+        return self._record(request, response, time.perf_counter() - start, stats)
+
+    @staticmethod
+    def _record(request, response, duration, stats):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        metrics.registry.record(view, request.method, response.status_code, duration, stats, size)
+        return response
+
+    @staticmethod
+    def _time_query(execute, sql, params, many, context):
+        stats = metrics.current_request.get()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if stats is not None:
+                stats.query_count += 1
+                stats.query_seconds += time.perf_counter() - start
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that stays async under ASGI. The stock middleware is sync-only,
+    so Django runs every request beneath it on a thread of its own; a held-open
+    request (the provider inbox stream) would then pin a thread for its whole
+    life. Here only static file hits leave the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        # In production the lookup is a dict hit; autorefresh (DEBUG) stats files
+        static_file = self.find_file(request.path_info) if self.autorefresh else self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+# Event streams are left alone: each open one would hold a compressor's memory
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/(?!event-stream)|application/(json|javascript|xml|xhtml\+xml|manifest\+json)|image/svg\+xml)'
+)
+_PADDING_CHARS = string.ascii_letters + string.digits
+
+
+def _random_filename(max_bytes):
+    """Random-length gzip FNAME: every compressed body gets an unpredictable length"""
+    length = secrets.randbelow(max_bytes) + 1
+    return ''.join(secrets.choice(_PADDING_CHARS) for _ in range(length))
+
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header"""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    return accepted
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, max_random_bytes):
+        self._buffer = io.BytesIO()
+        self._file = gzip.GzipFile(filename=_random_filename(max_random_bytes), mode='wb',
+                                   compresslevel=6, fileobj=self._buffer, mtime=0)
+
+    def _drain(self):
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def compress(self, data):
+        """Compress and flush, so a streamed chunk reaches the client right away"""
+        self._file.write(data)
+        self._file.flush()
+        return self._drain()
+
+    def finish(self, data=b''):
+        if data:
+            self._file.write(data)
+        self._file.close()
+        return self._drain()
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data=b''):
+        return (self._compressor.process(data) if data else b'') + self._compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Brotli (when the `brotli` package is installed) or gzip for dynamic text
+    responses of at least COMPRESSION_MIN_SIZE bytes, streamed ones included.
+
+    BREACH (secrets leaking through the size of compressed pages):
+    - Django masks the CSRF token differently in every response.
+    - Requests another site made the browser send (Sec-Fetch-Site:
+      cross-site), which is how the attack drives its guesses, are never
+      compressed.
+    - Brotli is used only when the browser says the request came from our own
+      pages (Sec-Fetch-Site same-origin/none). Otherwise gzip is used with a
+      random-length header field (as in Django's GZipMiddleware), so response
+      sizes carry noise.
+    """
+    max_random_bytes = 100
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or not COMPRESSIBLE_TYPES.match(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        fetch_site = request.headers.get('Sec-Fetch-Site')
+        if fetch_site == 'cross-site':
+            return response
+        encoder = self._choose_encoder(request.headers.get('Accept-Encoding', ''), fetch_site)
+        if encoder is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = (
+                self._compress_async(encoder, response.streaming_content) if response.is_async
+                else self._compress_stream(encoder, response.streaming_content)
+            )
+            del response.headers['Content-Length']
+        else:
+            compressed = encoder.finish(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A compressed body is a different representation: strong ETags become weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoder.name
+        return response
+
+    def _choose_encoder(self, accept_encoding, fetch_site):
+        accepted = accepted_encodings(accept_encoding)
+        wildcard = accepted.get('*', 0)
+        if brotli is not None and fetch_site in ('same-origin', 'none') and accepted.get('br', wildcard) > 0:
+            return BrotliEncoder(settings.COMPRESSION_BROTLI_QUALITY)
+        if accepted.get('gzip', wildcard) > 0:
+            return GzipEncoder(self.max_random_bytes)
+        return None
+
+    @staticmethod
+    def _compress_stream(encoder, chunks):
+        for chunk in chunks:
+            data = encoder.compress(chunk)
+            if data:
+                yield data
+        yield encoder.finish()
+
+    @staticmethod
+    async def _compress_async(encoder, chunks):
+        async for chunk in chunks:
+            data = encoder.compress(chunk)
+            if data:
+                yield data
+        yield encoder.finish()
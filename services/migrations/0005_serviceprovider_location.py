@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:40
+
+from django.db import migrations, models
+
+
+def backfill_geo_cells(apps, schema_editor):
+    from services import geo
+
+    ServiceProvider = apps.get_model('services', 'ServiceProvider')
+    for provider in ServiceProvider.objects.only('pk', 'district').iterator():
+        centroid = geo.district_centroid(provider.district)
+        if centroid:
+            ServiceProvider.objects.filter(pk=provider.pk).update(geo_cell=geo.geohash_encode(*centroid))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0004_providerworkphoto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='geo_cell',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_geo_cells, migrations.RunPython.noop),
+    ]
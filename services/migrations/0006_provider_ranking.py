@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_rankings(apps, schema_editor):
+    from services.ranking import bayesian_score, LEADERBOARD_SIZE
+
+    ServiceProvider = apps.get_model('services', 'ServiceProvider')
+    Review = apps.get_model('services', 'Review')
+    ProviderLeaderboardEntry = apps.get_model('services', 'ProviderLeaderboardEntry')
+
+    boards = {}
+    for provider in ServiceProvider.objects.all():
+        reviews = Review.objects.filter(provider=provider).values_list('rating', 'created_at')
+        provider.ranking_score = bayesian_score(reviews)
+        provider.save(update_fields=['ranking_score'])
+        if provider.is_verified:
+            for service in {provider.service1, provider.service2, provider.service3} - {None, ''}:
+                boards.setdefault((provider.district, service), []).append(provider)
+
+    for (district, service), providers in boards.items():
+        providers.sort(key=lambda p: (-p.ranking_score, -p.total_reviews, p.pk))
+        ProviderLeaderboardEntry.objects.bulk_create([
+            ProviderLeaderboardEntry(district=district, service=service, position=position,
+                                     provider=provider, score=provider.ranking_score)
+            for position, provider in enumerate(providers[:LEADERBOARD_SIZE], start=1)
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0005_serviceprovider_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='ranking_score',
+            field=models.FloatField(db_index=True, default=3.5, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ProviderLeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('district', models.CharField(max_length=50)),
+                ('service', models.CharField(max_length=20)),
+                ('position', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='services.serviceprovider')),
+            ],
+            options={
+                'ordering': ['district', 'service', 'position'],
+                'unique_together': {('district', 'service', 'position')},
+            },
+        ),
+        migrations.RunPython(backfill_rankings, migrations.RunPython.noop),
+    ]
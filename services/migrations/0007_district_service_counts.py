@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:43
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def backfill_counts(apps, schema_editor):
+    ServiceProvider = apps.get_model('services', 'ServiceProvider')
+    DistrictServiceCount = apps.get_model('services', 'DistrictServiceCount')
+
+    totals = Counter()
+    rows = ServiceProvider.objects.filter(is_verified=True).values_list('district', 'service1', 'service2', 'service3')
+    for district, *services in rows:
+        for service in set(services) - {None, ''}:
+            totals[(district, service)] += 1
+    DistrictServiceCount.objects.bulk_create([
+        DistrictServiceCount(district=district, service=service, verified_count=count)
+        for (district, service), count in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0006_provider_ranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DistrictServiceCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('district', models.CharField(max_length=50)),
+                ('service', models.CharField(max_length=20)),
+                ('verified_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('district', 'service')},
+            },
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
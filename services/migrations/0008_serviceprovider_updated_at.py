@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0007_district_service_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('services', '0008_serviceprovider_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='otpverification',
+            index=models.Index(fields=['phone_number', '-created_at'], name='otp_phone_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceprovider',
+            index=models.Index(fields=['-rating', '-created_at'], name='provider_rating_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceprovider',
+            index=models.Index(fields=['service1'], name='provider_service1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceprovider',
+            index=models.Index(fields=['service2'], name='provider_service2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceprovider',
+            index=models.Index(fields=['service3'], name='provider_service3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceprovider',
+            index=models.Index(fields=['created_at'], name='provider_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['-created_at'], name='request_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['status', '-created_at'], name='request_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-date_joined'], name='user_date_joined_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0010_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequest',
+            name='accepted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='district',
+            field=models.CharField(blank=True, choices=[('agra', 'Agra'), ('aligarh', 'Aligarh'), ('allahabad', 'Allahabad'), ('ambedkar_nagar', 'Ambedkar Nagar'), ('amethi', 'Amethi'), ('amroha', 'Amroha'), ('auraiya', 'Auraiya'), ('azamgarh', 'Azamgarh'), ('baghpat', 'Baghpat'), ('bahraich', 'Bahraich'), ('ballia', 'Ballia'), ('balrampur', 'Balrampur'), ('banda', 'Banda'), ('barabanki', 'Barabanki'), ('bareilly', 'Bareilly'), ('basti', 'Basti'), ('bhadohi', 'Bhadohi'), ('bijnor', 'Bijnor'), ('budaun', 'Budaun'), ('bulandshahr', 'Bulandshahr'), ('chandauli', 'Chandauli'), ('chitrakoot', 'Chitrakoot'), ('deoria', 'Deoria'), ('etah', 'Etah'), ('etawah', 'Etawah'), ('faizabad', 'Faizabad'), ('farrukhabad', 'Farrukhabad'), ('fatehpur', 'Fatehpur'), ('firozabad', 'Firozabad'), ('gautam_buddha_nagar', 'Gautam Buddha Nagar'), ('ghaziabad', 'Ghaziabad'), ('ghazipur', 'Ghazipur'), ('gonda', 'Gonda'), ('gorakhpur', 'Gorakhpur'), ('hamirpur', 'Hamirpur'), ('hapur', 'Hapur'), ('hardoi', 'Hardoi'), ('hathras', 'Hathras'), ('jalaun', 'Jalaun'), ('jaunpur', 'Jaunpur'), ('jhansi', 'Jhansi'), ('kannauj', 'Kannauj'), ('kanpur_dehat', 'Kanpur Dehat'), ('kanpur_nagar', 'Kanpur Nagar'), ('kasganj', 'Kasganj'), ('kaushambi', 'Kaushambi'), ('kheri', 'Kheri'), ('kushinagar', 'Kushinagar'), ('lalitpur', 'Lalitpur'), ('lucknow', 'Lucknow'), ('maharajganj', 'Maharajganj'), ('mahoba', 'Mahoba'), ('mainpuri', 'Mainpuri'), ('mathura', 'Mathura'), ('mau', 'Mau'), ('meerut', 'Meerut'), ('mirzapur', 'Mirzapur'), ('moradabad', 'Moradabad'), ('muzaffarnagar', 'Muzaffarnagar'), ('pilibhit', 'Pilibhit'), ('pratapgarh', 'Pratapgarh'), ('raebareli', 'Raebareli'), ('rampur', 'Rampur'), ('saharanpur', 'Saharanpur'), ('sambhal', 'Sambhal'), ('sant_kabir_nagar', 'Sant Kabir Nagar'), ('shahjahanpur', 'Shahjahanpur'), ('shamli', 'Shamli'), ('shravasti', 'Shravasti'), ('siddharthnagar', 'Siddharthnagar'), ('sitapur', 'Sitapur'), ('sonbhadra', 'Sonbhadra'), ('sultanpur', 'Sultanpur'), ('unnao', 'Unnao'), ('varanasi', 'Varanasi'), ('mumbai', 'Mumbai'), ('pune', 'Pune'), ('nagpur', 'Nagpur'), ('thane', 'Thane'), ('nashik', 'Nashik'), ('aurangabad', 'Aurangabad'), ('solapur', 'Solapur'), ('kolhapur', 'Kolhapur'), ('amravati', 'Amravati'), ('delhi', 'Delhi'), ('new_delhi', 'New Delhi'), ('north_delhi', 'North Delhi'), ('south_delhi', 'South Delhi'), ('east_delhi', 'East Delhi'), ('west_delhi', 'West Delhi'), ('bengaluru', 'Bengaluru'), ('mysuru', 'Mysuru'), ('hubli', 'Hubli'), ('mangaluru', 'Mangaluru'), ('chennai', 'Chennai'), ('coimbatore', 'Coimbatore'), ('madurai', 'Madurai'), ('tiruchirappalli', 'Tiruchirappalli'), ('kolkata', 'Kolkata'), ('howrah', 'Howrah'), ('durgapur', 'Durgapur'), ('siliguri', 'Siliguri'), ('jaipur', 'Jaipur'), ('jodhpur', 'Jodhpur'), ('kota', 'Kota'), ('udaipur', 'Udaipur'), ('ahmedabad', 'Ahmedabad'), ('surat', 'Surat'), ('vadodara', 'Vadodara'), ('rajkot', 'Rajkot')], max_length=50),
+        ),
+        migrations.CreateModel(
+            name='ServiceOffer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('offered', 'Offered'), ('accepted', 'Accepted'), ('declined', 'Declined'), ('withdrawn', 'Withdrawn')], default='offered', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('responded_at', models.DateTimeField(blank=True, null=True)),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offers', to='services.serviceprovider')),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offers', to='services.servicerequest')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['provider', 'status', '-created_at'], name='offer_provider_status_idx')],
+                'unique_together': {('request', 'provider')},
+            },
+        ),
+    ]
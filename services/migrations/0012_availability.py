@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0011_booking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='working_hours',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='preferred_start',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='BookedInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booked_intervals', to='services.serviceprovider')),
+                ('request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='booking', to='services.servicerequest')),
+            ],
+            options={
+                'ordering': ['start'],
+                'indexes': [models.Index(fields=['provider', 'end'], name='booking_provider_end_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:46
+
+import services.reference
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0012_availability'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='district',
+            field=models.CharField(default='lucknow', max_length=50, validators=[services.reference.validate_district]),
+        ),
+        migrations.AlterField(
+            model_name='serviceprovider',
+            name='district',
+            field=models.CharField(default='lucknow', max_length=50, validators=[services.reference.validate_district]),
+        ),
+        migrations.AlterField(
+            model_name='servicerequest',
+            name='district',
+            field=models.CharField(blank=True, max_length=50, validators=[services.reference.validate_district]),
+        ),
+    ]
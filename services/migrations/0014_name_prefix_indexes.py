@@ -0,0 +1,44 @@
+from django.db import migrations
+
+# Admin `^name` searches run `UPPER(name::text) LIKE UPPER('ram%')` on
+# PostgreSQL. A plain B-tree index can't serve that (wrong expression, and
+# LIKE needs pattern_ops outside the C locale), so these match it exactly.
+# SQLite gets none: its LIKE never uses an ordinary index.
+PREFIX_INDEXES = [
+    ('User', 'name', 'user_name_prefix_idx'),
+    ('ProviderWorkPhoto', 'title', 'work_photo_title_prefix_idx'),
+]
+
+
+def _indexes(apps):
+    from django.contrib.postgres.indexes import OpClass
+    from django.db.models import Index
+    from django.db.models.functions import Upper
+
+    for model_name, field, name in PREFIX_INDEXES:
+        yield apps.get_model('services', model_name), Index(OpClass(Upper(field), name='text_pattern_ops'), name=name)
+
+
+def add_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model, index in _indexes(apps):
+        schema_editor.add_index(model, index)
+
+
+def remove_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model, index in _indexes(apps):
+        schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0013_district_validator'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_prefix_indexes, remove_prefix_indexes),
+    ]
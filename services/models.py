@@ -4,55 +4,12 @@ from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, Permis
 from django.core.validators import RegexValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+import calendar
 import random
 
-# Indian Districts List (Major ones)
-DISTRICT_CHOICES = [
-    # Uttar Pradesh
-    ('agra', 'Agra'), ('aligarh', 'Aligarh'), ('allahabad', 'Allahabad'), ('ambedkar_nagar', 'Ambedkar Nagar'),
-    ('amethi', 'Amethi'), ('amroha', 'Amroha'), ('auraiya', 'Auraiya'), ('azamgarh', 'Azamgarh'),
-    ('baghpat', 'Baghpat'), ('bahraich', 'Bahraich'), ('ballia', 'Ballia'), ('balrampur', 'Balrampur'),
-    ('banda', 'Banda'), ('barabanki', 'Barabanki'), ('bareilly', 'Bareilly'), ('basti', 'Basti'),
-    ('bhadohi', 'Bhadohi'), ('bijnor', 'Bijnor'), ('budaun', 'Budaun'), ('bulandshahr', 'Bulandshahr'),
-    ('chandauli', 'Chandauli'), ('chitrakoot', 'Chitrakoot'), ('deoria', 'Deoria'), ('etah', 'Etah'),
-    ('etawah', 'Etawah'), ('faizabad', 'Faizabad'), ('farrukhabad', 'Farrukhabad'), ('fatehpur', 'Fatehpur'),
-    ('firozabad', 'Firozabad'), ('gautam_buddha_nagar', 'Gautam Buddha Nagar'), ('ghaziabad', 'Ghaziabad'),
-    ('ghazipur', 'Ghazipur'), ('gonda', 'Gonda'), ('gorakhpur', 'Gorakhpur'), ('hamirpur', 'Hamirpur'),
-    ('hapur', 'Hapur'), ('hardoi', 'Hardoi'), ('hathras', 'Hathras'), ('jalaun', 'Jalaun'),
-    ('jaunpur', 'Jaunpur'), ('jhansi', 'Jhansi'), ('kannauj', 'Kannauj'), ('kanpur_dehat', 'Kanpur Dehat'),
-    ('kanpur_nagar', 'Kanpur Nagar'), ('kasganj', 'Kasganj'), ('kaushambi', 'Kaushambi'), ('kheri', 'Kheri'),
-    ('kushinagar', 'Kushinagar'), ('lalitpur', 'Lalitpur'), ('lucknow', 'Lucknow'), ('maharajganj', 'Maharajganj'),
-    ('mahoba', 'Mahoba'), ('mainpuri', 'Mainpuri'), ('mathura', 'Mathura'), ('mau', 'Mau'),
-    ('meerut', 'Meerut'), ('mirzapur', 'Mirzapur'), ('moradabad', 'Moradabad'), ('muzaffarnagar', 'Muzaffarnagar'),
-    ('pilibhit', 'Pilibhit'), ('pratapgarh', 'Pratapgarh'), ('raebareli', 'Raebareli'), ('rampur', 'Rampur'),
-    ('saharanpur', 'Saharanpur'), ('sambhal', 'Sambhal'), ('sant_kabir_nagar', 'Sant Kabir Nagar'),
-    ('shahjahanpur', 'Shahjahanpur'), ('shamli', 'Shamli'), ('shravasti', 'Shravasti'), ('siddharthnagar', 'Siddharthnagar'),
-    ('sitapur', 'Sitapur'), ('sonbhadra', 'Sonbhadra'), ('sultanpur', 'Sultanpur'), ('unnao', 'Unnao'),
-    ('varanasi', 'Varanasi'),
-
-    # Maharashtra
-    ('mumbai', 'Mumbai'), ('pune', 'Pune'), ('nagpur', 'Nagpur'), ('thane', 'Thane'), ('nashik', 'Nashik'),
-    ('aurangabad', 'Aurangabad'), ('solapur', 'Solapur'), ('kolhapur', 'Kolhapur'), ('amravati', 'Amravati'),
-
-    # Delhi
-    ('delhi', 'Delhi'), ('new_delhi', 'New Delhi'), ('north_delhi', 'North Delhi'), ('south_delhi', 'South Delhi'),
-    ('east_delhi', 'East Delhi'), ('west_delhi', 'West Delhi'),
-
-    # Karnataka
-    ('bengaluru', 'Bengaluru'), ('mysuru', 'Mysuru'), ('hubli', 'Hubli'), ('mangaluru', 'Mangaluru'),
-
-    # Tamil Nadu
-    ('chennai', 'Chennai'), ('coimbatore', 'Coimbatore'), ('madurai', 'Madurai'), ('tiruchirappalli', 'Tiruchirappalli'),
-
-    # West Bengal
-    ('kolkata', 'Kolkata'), ('howrah', 'Howrah'), ('durgapur', 'Durgapur'), ('siliguri', 'Siliguri'),
-
-    # Rajasthan
-    ('jaipur', 'Jaipur'), ('jodhpur', 'Jodhpur'), ('kota', 'Kota'), ('udaipur', 'Udaipur'),
-
-    # Gujarat
-    ('ahmedabad', 'Ahmedabad'), ('surat', 'Surat'), ('vadodara', 'Vadodara'), ('rajkot', 'Rajkot'),
-]
+from . import counters, geo, ranking
+from .reference import SERVICE_CHOICES, SERVICE_NAMES, district_name, validate_district
+
 
 class UserManager(BaseUserManager):
     def create_user(self, phone_number, password=None, **extra_fields):
@@ -100,12 +57,18 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return f"{self.name} - {self.phone_number}"
 
+    class Meta:
+        indexes = [
+            # Admin user list default ordering
+            models.Index(fields=['-date_joined'], name='user_date_joined_idx'),
+        ]
+
 
 class ServiceProvider(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='provider_profile')
     photo = models.ImageField(upload_to='provider_photos/', blank=True, null=True)
     address = models.TextField()
-    district = models.CharField(max_length=50, choices=DISTRICT_CHOICES, default='lucknow')
+    district = models.CharField(max_length=50, validators=[validate_district], default='lucknow')
     aadhar_regex = RegexValidator(
         regex=r'^\d{12}$',
         message="Aadhar number must be exactly 12 digits"
@@ -117,18 +80,7 @@ class ServiceProvider(models.Model):
     )
     date_of_birth = models.DateField()
 
-    SERVICE_CHOICES = [
-        ('mason', 'Mason'),
-        ('painter', 'Painter'),
-        ('plumber', 'Plumber'),
-        ('carpenter', 'Carpenter'),
-        ('electrician', 'Electrician'),
-        ('tile_marble', 'Tile/Marble Worker'),
-        ('steel_fabricator', 'Steel Fabricator'),
-        ('glass_worker', 'Glass Worker'),
-        ('gardener', 'Gardener'),
-        ('driver', 'Driver'),
-    ]
+    SERVICE_CHOICES = SERVICE_CHOICES
 
     service1 = models.CharField(max_length=20, choices=SERVICE_CHOICES)
     service2 = models.CharField(max_length=20, choices=SERVICE_CHOICES, blank=True, null=True)
@@ -137,7 +89,21 @@ class ServiceProvider(models.Model):
     is_verified = models.BooleanField(default=False)
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     total_reviews = models.IntegerField(default=0)
+    # Bayesian-smoothed, recency-weighted rating used for the default sort
+    ranking_score = models.FloatField(default=ranking.PRIOR_MEAN, db_index=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every save; part of the ETag of pages showing this provider
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Optional exact location; the district centroid is used when unset
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    # Geohash bucket of the effective position, used for proximity search
+    geo_cell = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
+    # Weekly hours, Monday first: ["HH:MM", "HH:MM"] per day, null for a day
+    # off (an end at or before the start runs past midnight). Empty = not set,
+    # which counts as always working. See availability.py
+    working_hours = models.JSONField(default=list, blank=True)
 
     def clean(self):
         services = [self.service1, self.service2, self.service3]
@@ -145,29 +111,77 @@ class ServiceProvider(models.Model):
         if len(services) != len(set(services)):
             raise ValidationError("Cannot select the same service multiple times")
 
+    @property
+    def position(self):
+        return geo.position_of(self.latitude, self.longitude, self.district)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember which leaderboards the row was on when loaded
+        instance._loaded_keys = instance.leaderboard_keys()
+        return instance
+
+    def leaderboard_keys(self):
+        return ranking.leaderboard_keys(
+            self.district, (self.service1, self.service2, self.service3), self.is_verified
+        )
+
+    def save(self, *args, **kwargs):
+        position = self.position
+        self.geo_cell = geo.geohash_encode(*position) if position else ''
+        super().save(*args, **kwargs)
+        self._sync_derived()
+
+    def _sync_derived(self, force=False):
+        """Update counters and leaderboards for the (district, service) keys that changed"""
+        new_keys = self.leaderboard_keys()
+        old_keys = getattr(self, '_loaded_keys', set())
+        counters.apply_changes(added=new_keys - old_keys, removed=old_keys - new_keys)
+        # Only leaderboards the provider joined or left need rebuilding,
+        # unless its score changed (force)
+        ranking.refresh_leaderboards((new_keys | old_keys) if force else (new_keys ^ old_keys))
+        self._loaded_keys = new_keys
+
     def get_services(self):
-        services = []
-        if self.service1:
-            services.append(self.get_service1_display())
-        if self.service2:
-            services.append(self.get_service2_display())
-        if self.service3:
-            services.append(self.get_service3_display())
-        return services
+        return [SERVICE_NAMES.get(code, code) for code in (self.service1, self.service2, self.service3) if code]
+
+    def get_district_display(self):
+        # district has no choices (see reference.validate_district), so Django doesn't generate this
+        return district_name(self.district)
+
+    def get_working_hours(self):
+        """(day name, "HH:MM - HH:MM" or None for a day off) for each weekday; [] if not set"""
+        return [
+            (calendar.day_name[day], f"{hours[0]} - {hours[1]}" if hours else None)
+            for day, hours in enumerate(self.working_hours)
+        ]
 
     def update_rating(self):
-        reviews = self.reviews.all()
-        if reviews.exists():
-            total = sum(review.rating for review in reviews)
-            self.rating = round(total / reviews.count(), 2)
-            self.total_reviews = reviews.count()
-            self.save()
+        # One query for everything the rating, count and ranking score need
+        reviews = list(self.reviews.values_list('rating', 'created_at'))
+        total = sum(rating for rating, _ in reviews)
+        self.rating = round(total / len(reviews), 2) if reviews else 0
+        self.total_reviews = len(reviews)
+        self.ranking_score = ranking.bayesian_score(reviews)
+        super().save(update_fields=['rating', 'total_reviews', 'ranking_score', 'updated_at'])
+        self._sync_derived(force=True)
 
     def __str__(self):
         return f"{self.user.name} - Provider"
 
     class Meta:
         ordering = ['-rating', '-created_at']
+        indexes = [
+            # Default ordering, so admin pages are read off the index instead of sorting the table
+            models.Index(fields=['-rating', '-created_at'], name='provider_rating_order_idx'),
+            # Admin filters
+            models.Index(fields=['service1'], name='provider_service1_idx'),
+            models.Index(fields=['service2'], name='provider_service2_idx'),
+            models.Index(fields=['service3'], name='provider_service3_idx'),
+            models.Index(fields=['created_at'], name='provider_created_idx'),
+        ]
+
 
 # Add this new model after ServiceProvider model
 
@@ -197,12 +211,15 @@ class ProviderWorkPhoto(models.Model):
 class Customer(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='customer_profile')
     address = models.TextField(blank=True)
-    district = models.CharField(max_length=50, choices=DISTRICT_CHOICES, default='lucknow')
+    district = models.CharField(max_length=50, validators=[validate_district], default='lucknow')
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.user.name} - Customer"
 
+    def get_district_display(self):
+        return district_name(self.district)
+
 
 class ServiceRequest(models.Model):
     STATUS_CHOICES = [
@@ -215,15 +232,75 @@ class ServiceRequest(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='requests')
     provider = models.ForeignKey(ServiceProvider, on_delete=models.SET_NULL, null=True, blank=True)
     service_type = models.CharField(max_length=20)
+    # District the customer was browsing when booking; offers go to providers there
+    district = models.CharField(max_length=50, validators=[validate_district], blank=True)
+    # When the customer wants the job done; null = as soon as possible
+    preferred_start = models.DateTimeField(null=True, blank=True)
     description = models.TextField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
+    accepted_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.customer.user.name} - {self.service_type}"
 
+    def get_service_display(self):
+        return SERVICE_NAMES.get(self.service_type, self.service_type)
+
+    def get_district_display(self):
+        return district_name(self.district)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='request_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='request_status_created_idx'),
+        ]
+
+
+class ServiceOffer(models.Model):
+    """A pending ServiceRequest offered to one provider; the first to accept wins"""
+    STATUS_CHOICES = [
+        ('offered', 'Offered'),
+        ('accepted', 'Accepted'),
+        ('declined', 'Declined'),
+        ('withdrawn', 'Withdrawn'),  # someone else accepted, or the customer cancelled
+    ]
+
+    request = models.ForeignKey(ServiceRequest, on_delete=models.CASCADE, related_name='offers')
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name='offers')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='offered')
+    created_at = models.DateTimeField(auto_now_add=True)
+    responded_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('request', 'provider')
+        ordering = ['-created_at']
+        indexes = [
+            # Provider's open offers, newest first
+            models.Index(fields=['provider', 'status', '-created_at'], name='offer_provider_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Request #{self.request_id} -> provider #{self.provider_id} ({self.status})"
+
+
+class BookedInterval(models.Model):
+    """Time a provider is booked for an accepted ServiceRequest"""
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name='booked_intervals')
+    request = models.OneToOneField(ServiceRequest, on_delete=models.CASCADE, related_name='booking')
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+
+    class Meta:
+        ordering = ['start']
+        indexes = [
+            # Overlap lookups: provider IN (...) AND end > window start AND start < window end
+            models.Index(fields=['provider', 'end'], name='booking_provider_end_idx'),
+        ]
+
+    def __str__(self):
+        return f"Provider #{self.provider_id} booked {self.start:%Y-%m-%d %H:%M} - {self.end:%H:%M}"
 
 
 class Review(models.Model):
@@ -245,6 +322,35 @@ class Review(models.Model):
         return f"{self.customer.user.name} -> {self.provider.user.name} ({self.rating}/5)"
 
 
+class DistrictServiceCount(models.Model):
+    """Number of verified providers per (district, service), shown on the customer home grid"""
+    district = models.CharField(max_length=50)
+    service = models.CharField(max_length=20)
+    verified_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('district', 'service')
+
+    def __str__(self):
+        return f"{self.district}/{self.service}: {self.verified_count}"
+
+
+class ProviderLeaderboardEntry(models.Model):
+    """Materialized top-N providers per (district, service), read by the default listing sort"""
+    district = models.CharField(max_length=50)
+    service = models.CharField(max_length=20)
+    position = models.PositiveIntegerField()
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('district', 'service', 'position')
+        ordering = ['district', 'service', 'position']
+
+    def __str__(self):
+        return f"{self.district}/{self.service} #{self.position}"
+
+
 class OTPVerification(models.Model):
     phone_number = models.CharField(max_length=10)
     otp = models.CharField(max_length=6)
@@ -263,4 +369,45 @@ class OTPVerification(models.Model):
         return f"{self.phone_number} - {self.otp}"
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            # Latest OTP for a phone (password reset, admin search)
+            models.Index(fields=['phone_number', '-created_at'], name='otp_phone_created_idx'),
+        ]
+
+class BackgroundJob(models.Model):
+    """A long-running admin task executed off the request thread (see services/jobs.py)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    processed = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def percent(self):
+        if self.status == 'done':
+            return 100
+        return int(self.processed * 100 / self.total) if self.total else 0
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
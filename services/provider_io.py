@@ -0,0 +1,198 @@
+# provider_io.py - Streaming bulk import/export of providers (CSV or JSON Lines)
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from . import counters, geo, ranking
+from .forms import ProviderImportForm
+from .models import User, ServiceProvider
+
+IMPORT_FIELDS = [
+    'phone_number', 'name', 'password', 'address', 'district', 'aadhar_number', 'date_of_birth',
+    'service1', 'service2', 'service3', 'latitude', 'longitude',
+]
+EXPORT_FIELDS = [
+    'phone_number', 'name', 'address', 'district', 'aadhar_number', 'date_of_birth',
+    'service1', 'service2', 'service3', 'latitude', 'longitude',
+    'is_verified', 'rating', 'total_reviews', 'created_at',
+]
+
+
+def detect_format(path):
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(fh, fmt):
+    """Yield (line number, row dict) one at a time; bad JSON lines yield (line, None)"""
+    if fmt == 'csv':
+        reader = csv.DictReader(fh)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_num, line in enumerate(fh, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        if not isinstance(row, dict):
+            row = None
+        yield line_num, row
+
+
+def _init_worker():
+    # Spawned (non-fork) workers start without Django configured
+    django.setup()
+
+
+def _validate(batch, report):
+    """Cleaned data of the rows that pass the form and aren't already registered"""
+    valid = []
+    for line_num, row in batch:
+        if row is None:
+            report(line_num, 'not a JSON object')
+            continue
+        data = {key: '' if value is None else str(value) for key, value in row.items()}
+        form = ProviderImportForm(data=data)
+        if not form.is_valid():
+            report(line_num, '; '.join(f"{field}: {' '.join(errors)}" for field, errors in form.errors.items()))
+            continue
+        valid.append((line_num, form.cleaned_data))
+
+    # Two queries per batch instead of two per row
+    taken_phones = set(User.objects.filter(
+        phone_number__in=[data['phone_number'] for _, data in valid]
+    ).values_list('phone_number', flat=True))
+    taken_aadhars = set(ServiceProvider.objects.filter(
+        aadhar_number__in=[data['aadhar_number'] for _, data in valid]
+    ).values_list('aadhar_number', flat=True))
+
+    accepted = []
+    for line_num, data in valid:
+        if data['phone_number'] in taken_phones:
+            report(line_num, 'phone_number: This phone number is already registered')
+        elif data['aadhar_number'] in taken_aadhars:
+            report(line_num, 'aadhar_number: This Aadhar number is already registered')
+        else:
+            # Later rows of the same batch count as taken too
+            taken_phones.add(data['phone_number'])
+            taken_aadhars.add(data['aadhar_number'])
+            accepted.append((line_num, data))
+    return accepted
+
+
+def _build(data, password_hash, verified):
+    user = User(phone_number=data['phone_number'], name=data['name'], user_type='provider', password=password_hash)
+    provider = ServiceProvider(
+        user=user,
+        address=data['address'],
+        district=data['district'],
+        aadhar_number=data['aadhar_number'],
+        date_of_birth=data['date_of_birth'],
+        service1=data['service1'],
+        service2=data['service2'] or None,
+        service3=data['service3'] or None,
+        latitude=data['latitude'],
+        longitude=data['longitude'],
+        is_verified=verified,
+    )
+    # bulk_create skips ServiceProvider.save(), which normally sets this
+    position = provider.position
+    provider.geo_cell = geo.geohash_encode(*position) if position else ''
+    return user, provider
+
+
+def import_providers(rows, batch_size=1000, workers=None, verified=False, dry_run=False,
+                     report=None, progress=None):
+    """
+    Validate and insert provider rows from read_rows(). Each batch is one
+    transaction: passwords are hashed in a process pool, then users and
+    profiles go in with bulk_create. Bad rows are passed to
+    report(line, message) and skipped. Returns {'valid', 'imported', 'skipped'};
+    with dry_run nothing is written.
+    """
+    report = report or (lambda line_num, message: None)
+    stats = {'valid': 0, 'imported': 0, 'skipped': 0}
+    touched = set()
+
+    def skip(line_num, message):
+        stats['skipped'] += 1
+        report(line_num, message)
+
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 and not dry_run else None
+    try:
+        rows = iter(rows)
+        while batch := list(islice(rows, batch_size)):
+            accepted = _validate(batch, skip)
+            stats['valid'] += len(accepted)
+            if dry_run or not accepted:
+                if progress:
+                    progress(stats)
+                continue
+
+            passwords = [data['password'] for _, data in accepted]
+            # PBKDF2 is deliberately slow; spread it over every core
+            hashes = (pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4)))
+                      if pool else map(make_password, passwords))
+            built = [_build(data, password_hash, verified) for (_, data), password_hash in zip(accepted, hashes)]
+            keys = [key for _, provider in built for key in provider.leaderboard_keys()]
+            try:
+                with transaction.atomic():
+                    User.objects.bulk_create([user for user, _ in built], batch_size=batch_size)
+                    ServiceProvider.objects.bulk_create([provider for _, provider in built], batch_size=batch_size)
+                    counters.apply_changes(added=keys)
+            except IntegrityError as e:
+                # Someone registered one of these between the check and the insert
+                for line_num, _ in accepted:
+                    skip(line_num, f'batch rolled back: {e}')
+                continue
+            touched.update(keys)
+            stats['imported'] += len(built)
+            if progress:
+                progress(stats)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    ranking.refresh_leaderboards(touched)
+    return stats
+
+
+def export_rows(district=None, verified_only=False, chunk_size=2000):
+    """Provider rows as dicts, streamed from the database chunk_size at a time"""
+    queryset = ServiceProvider.objects.order_by('pk')
+    if district:
+        queryset = queryset.filter(district=district)
+    if verified_only:
+        queryset = queryset.filter(is_verified=True)
+    # values() skips model instances (and ServiceProvider.from_db bookkeeping)
+    return queryset.values(
+        *[field for field in EXPORT_FIELDS if field not in ('phone_number', 'name')],
+        phone_number=F('user_id'), name=F('user__name'),
+    ).iterator(chunk_size=chunk_size)
+
+
+def write_rows(rows, fh, fmt):
+    """Write export_rows() as CSV or JSON Lines; returns the row count"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(fh, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+    for row in rows:
+        fh.write(json.dumps({field: row[field] for field in EXPORT_FIELDS}, cls=DjangoJSONEncoder) + '\n')
+        count += 1
+    return count
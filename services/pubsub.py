@@ -0,0 +1,140 @@
+# pubsub.py - In-process notifications with a database-polling fallback
+#
+# Waiters subscribe to a channel and sleep until something is published on
+# it; messages carry no data, a woken waiter reads what is new from the
+# database with its own cursor. publish() only reaches this process, so each
+# Hub may also have a poll function that a single thread per process runs
+# every PUBSUB_POLL_INTERVAL seconds while anyone is waiting. One indexed
+# query per interval per process covers changes other workers made, however
+# many waiters there are; with nobody waiting nothing runs at all.
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = getattr(settings, 'PUBSUB_POLL_INTERVAL', 2)
+
+
+class Subscription:
+    """
+    One waiter on one channel. Use as a context manager so it is always
+    unsubscribed. A publish that happens before wait() is not lost: subscribe
+    first, then read the database, then wait.
+    """
+
+    def __init__(self, hub, channel, loop=None):
+        self.hub = hub
+        self.channel = channel
+        # Async waiters are woken on their own event loop
+        self.loop = loop
+        self._event = asyncio.Event() if loop else threading.Event()
+
+    def notify(self):
+        if self.loop is None:
+            self._event.set()
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # The loop has closed: the waiter is gone
+            pass
+
+    def wait(self, timeout):
+        """Block up to timeout seconds; True if the channel was published to"""
+        fired = self._event.wait(timeout)
+        self._event.clear()
+        return fired
+
+    async def wait_async(self, timeout):
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+    def close(self):
+        self.hub._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Hub:
+    """
+    `poll(cursor)` returns `(new_cursor, channels)`: the channels with
+    changes since cursor. Cursor None means the poller is (re)starting
+    after an idle spell: report a margin of recent changes too, since a
+    waiter may have read the database just before they happened.
+    """
+
+    def __init__(self, name, poll=None):
+        self.name = name
+        self.poll = poll
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._poller_pid = None
+
+    def subscribe(self, channel, loop=None):
+        subscription = Subscription(self, channel, loop)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        if self.poll is not None and not settings.BACKGROUND_JOBS_INLINE:
+            self._ensure_poller()
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            waiting = self._subscribers.get(subscription.channel)
+            if waiting is not None:
+                waiting.discard(subscription)
+                if not waiting:
+                    del self._subscribers[subscription.channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(waiting) for waiting in self._subscribers.values())
+
+    def publish(self, channels):
+        with self._lock:
+            woken = [subscription for channel in set(channels)
+                     for subscription in self._subscribers.get(channel, ())]
+        for subscription in woken:
+            subscription.notify()
+        return len(woken)
+
+    def _ensure_poller(self):
+        if self._poller_pid == os.getpid():
+            return
+        with self._lock:
+            if self._poller_pid == os.getpid():
+                return
+            # Threads don't survive fork: every gunicorn worker starts its own
+            self._poller_pid = os.getpid()
+            threading.Thread(target=self._run_poller, name=f'{self.name}-poller', daemon=True).start()
+
+    def _run_poller(self):
+        cursor = None
+        while True:
+            time.sleep(POLL_INTERVAL)
+            if not self.subscriber_count():
+                # Nobody to tell; new waiters read the backlog themselves
+                cursor = None
+                continue
+            try:
+                close_old_connections()
+                cursor, channels = self.poll(cursor)
+                if channels:
+                    self.publish(channels)
+            except Exception:
+                logger.exception('Polling for notifications failed', extra={'hub': self.name})
@@ -0,0 +1,167 @@
+# querywatch.py - Slow-query log and N+1 detector for development, staging and tests
+import logging
+import re
+import sys
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+_PROJECT_ROOT = str(Path(settings.BASE_DIR).resolve())
+_THIS_FILE = str(Path(__file__).resolve())
+
+
+class NPlusOneError(Exception):
+    """Raised in strict mode when a request repeats the same query shape too often"""
+
+
+def fingerprint(sql):
+    """Query shape with literals and IN-list lengths removed"""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def find_origin():
+    """
+    Where the current query came from: the innermost template tag/variable
+    being rendered (template name and line) and the innermost project frame.
+    """
+    template = None
+    code = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if template is None and frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template = f'{origin.template_name}:{token.lineno}'
+        if (code is None and filename.startswith(_PROJECT_ROOT) and filename != _THIS_FILE
+                and 'site-packages' not in filename):
+            code = f'{Path(filename).relative_to(_PROJECT_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        if template and code:
+            break
+        frame = frame.f_back
+    return ', '.join(part for part in (template and f'template {template}', code) if part) or 'unknown'
+
+
+def explain(sql, params):
+    """Query plan for a slow SELECT, or None if it can't be explained"""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f'(EXPLAIN failed: {e})'
+
+
+class RequestQueryLog:
+    """connection.execute_wrapper hook collecting query shapes for one request"""
+
+    def __init__(self, slow_ms, threshold):
+        self.slow_ms = slow_ms
+        self.threshold = threshold
+        self.counts = {}
+        self.origins = {}
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            shape = fingerprint(sql)
+            count = self.counts.get(shape, 0) + 1
+            self.counts[shape] = count
+            # Stack walking is only paid once a shape reaches the threshold
+            if count == self.threshold:
+                self.origins[shape] = find_origin()
+            if elapsed_ms >= self.slow_ms and not many:
+                self.explaining = True
+                try:
+                    plan = explain(sql, params)
+                finally:
+                    self.explaining = False
+                logger.warning('Slow query (%.1f ms) from %s: %s\nPlan:\n%s',
+                               elapsed_ms, find_origin(), sql, plan or '(not available)')
+
+    def repeated(self):
+        return [(shape, count, self.origins.get(shape, 'unknown'))
+                for shape, count in self.counts.items() if count >= self.threshold]
+
+
+def _install(log):
+    connection.execute_wrappers.append(log)
+
+
+def _uninstall(log):
+    connection.execute_wrappers.remove(log)
+
+
+class QueryWatchMiddleware:
+    """
+    Logs slow queries with their EXPLAIN plan and flags query shapes repeated
+    QUERYWATCH_NPLUSONE_THRESHOLD+ times in one request (likely N+1s).
+    With QUERYWATCH_STRICT (on under `manage.py test`) an N+1 raises NPlusOneError.
+    Async-capable, so it doesn't push ASGI requests beneath it onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERYWATCH_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'QUERYWATCH_SLOW_MS', 100)
+        self.threshold = getattr(settings, 'QUERYWATCH_NPLUSONE_THRESHOLD', 5)
+        self.strict = getattr(settings, 'QUERYWATCH_STRICT', False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        log = RequestQueryLog(self.slow_ms, self.threshold)
+        with connection.execute_wrapper(log):
+            response = self.get_response(request)
+        return self._report(request, log, response)
+
+    async def __acall__(self, request):
+        log = RequestQueryLog(self.slow_ms, self.threshold)
+        # Connections are per thread: queries (async ORM calls and sync views
+        # alike) run on the request's sync thread, so the hook goes there
+        await sync_to_async(_install)(log)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_uninstall)(log)
+        return self._report(request, log, response)
+
+    def _report(self, request, log, response):
+        repeated = log.repeated()
+        for shape, count, origin in repeated:
+            logger.warning('Possible N+1 on %s %s: %d x %s (first repeat at %s)',
+                           request.method, request.path, count, shape, origin)
+        if repeated and self.strict:
+            shape, count, origin = repeated[0]
+            raise NPlusOneError(f'{request.path}: query repeated {count} times at {origin}: {shape}')
+        return response
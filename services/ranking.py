@@ -0,0 +1,174 @@
+# ranking.py - Bayesian ranking score and materialized per-(district, service) leaderboards
+import heapq
+from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+# Score of a provider with no reviews; new providers start at the prior
+PRIOR_MEAN = getattr(settings, 'RANKING_PRIOR_MEAN', 3.5)
+# How many "virtual" reviews at PRIOR_MEAN every provider starts with
+PRIOR_WEIGHT = getattr(settings, 'RANKING_PRIOR_WEIGHT', 5)
+# A review this old counts half as much as a fresh one
+HALF_LIFE_DAYS = getattr(settings, 'RANKING_HALF_LIFE_DAYS', 365)
+# Providers stored per (district, service) leaderboard
+LEADERBOARD_SIZE = getattr(settings, 'LEADERBOARD_SIZE', 50)
+
+
+def bayesian_score(reviews, now=None):
+    """
+    Bayesian-smoothed rating with recency decay.
+    `reviews` is an iterable of (rating, created_at) pairs.
+    """
+    now = now or timezone.now()
+    weighted_sum = PRIOR_MEAN * PRIOR_WEIGHT
+    total_weight = PRIOR_WEIGHT
+    for rating, created_at in reviews:
+        age_days = max((now - created_at).total_seconds(), 0) / 86400
+        weight = 0.5 ** (age_days / HALF_LIFE_DAYS)
+        weighted_sum += rating * weight
+        total_weight += weight
+    return round(weighted_sum / total_weight, 4)
+
+
+def leaderboard_keys(district, services, is_verified):
+    """(district, service) leaderboards a provider belongs on"""
+    if not is_verified:
+        return set()
+    return {(district, service) for service in services if service}
+
+
+def refresh_leaderboard(district, service):
+    """Rebuild the top-N entries for one (district, service) pair"""
+    from .models import ServiceProvider, ProviderLeaderboardEntry
+
+    top = ServiceProvider.objects.filter(
+        Q(service1=service) | Q(service2=service) | Q(service3=service),
+        district=district,
+        is_verified=True,
+    ).order_by('-ranking_score', '-total_reviews', 'pk').values_list('pk', 'ranking_score')[:LEADERBOARD_SIZE]
+
+    with transaction.atomic():
+        ProviderLeaderboardEntry.objects.filter(district=district, service=service).delete()
+        ProviderLeaderboardEntry.objects.bulk_create([
+            ProviderLeaderboardEntry(
+                district=district,
+                service=service,
+                position=position,
+                provider_id=provider_id,
+                score=score,
+            )
+            for position, (provider_id, score) in enumerate(top, start=1)
+        ])
+
+
+def refresh_leaderboards(keys):
+    for district, service in keys:
+        refresh_leaderboard(district, service)
+
+
+def refresh_district_leaderboards(districts):
+    """
+    Rebuild every leaderboard of the given districts in a fixed number of
+    queries, streaming their verified providers once (for bulk changes that
+    touch many (district, service) pairs).
+    """
+    from .models import ServiceProvider, ProviderLeaderboardEntry
+
+    districts = set(districts)
+    if not districts:
+        return
+    # Bounded min-heaps of (score, total_reviews, -pk): the same order as refresh_leaderboard
+    tops = defaultdict(list)
+    rows = ServiceProvider.objects.filter(district__in=districts, is_verified=True).values_list(
+        'pk', 'district', 'service1', 'service2', 'service3', 'ranking_score', 'total_reviews',
+    ).iterator(chunk_size=2000)
+    for pk, district, service1, service2, service3, score, total_reviews in rows:
+        item = (score, total_reviews, -pk)
+        for service in {service1, service2, service3} - {None, ''}:
+            heap = tops[(district, service)]
+            if len(heap) < LEADERBOARD_SIZE:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    with transaction.atomic():
+        ProviderLeaderboardEntry.objects.filter(district__in=districts).delete()
+        ProviderLeaderboardEntry.objects.bulk_create([
+            ProviderLeaderboardEntry(
+                district=district,
+                service=service,
+                position=position,
+                provider_id=-negative_pk,
+                score=score,
+            )
+            for (district, service), heap in tops.items()
+            for position, (score, _, negative_pk) in enumerate(sorted(heap, reverse=True), start=1)
+        ], batch_size=500)
+
+
+def read_leaderboard(district, service, offset=0, limit=LEADERBOARD_SIZE):
+    """
+    One page of the stored leaderboard, best first, or None when the page
+    runs past the top-N of a full leaderboard (caller should fall back to
+    ordering by ranking_score). A leaderboard with fewer than N entries
+    holds every provider, so any page of it can be served.
+    """
+    from .models import ServiceProvider
+
+    if offset >= LEADERBOARD_SIZE:
+        return None
+    end = offset + limit
+    providers = list(
+        ServiceProvider.objects.filter(
+            leaderboard_entries__district=district,
+            leaderboard_entries__service=service,
+        ).select_related('user').order_by('leaderboard_entries__position')[offset:min(end, LEADERBOARD_SIZE)]
+    )
+    # Entries reaching position N mean the leaderboard may be truncated there
+    if end > LEADERBOARD_SIZE and offset + len(providers) >= LEADERBOARD_SIZE:
+        return None
+    return providers
+
+
+def rebuild_rankings(stdout=None):
+    """Recompute every ranking score (applying decay) and every leaderboard"""
+    from .models import ServiceProvider, Review, ProviderLeaderboardEntry
+
+    now = timezone.now()
+    current = dict(ServiceProvider.objects.values_list('pk', 'ranking_score'))
+    no_reviews_score = bayesian_score((), now)
+    scores = dict.fromkeys(current, no_reviews_score)
+
+    # Stream reviews grouped by provider so memory stays flat
+    rows = Review.objects.order_by('provider_id').values_list('provider_id', 'rating', 'created_at').iterator()
+    for provider_id, group in groupby(rows, key=itemgetter(0)):
+        scores[provider_id] = bayesian_score(((rating, created_at) for _, rating, created_at in group), now)
+
+    updated = [
+        ServiceProvider(pk=pk, ranking_score=score)
+        for pk, score in scores.items()
+        if score != current.get(pk)
+    ]
+    ServiceProvider.objects.bulk_update(updated, ['ranking_score'], batch_size=500)
+
+    keys = set(
+        ServiceProvider.objects.filter(is_verified=True).values_list('district', 'service1').distinct()
+    )
+    for field in ('service2', 'service3'):
+        keys.update(
+            ServiceProvider.objects.filter(is_verified=True).exclude(**{f'{field}__isnull': True})
+            .exclude(**{field: ''}).values_list('district', field).distinct()
+        )
+    with transaction.atomic():
+        # Drop leaderboards that no longer have any verified provider
+        ProviderLeaderboardEntry.objects.all().delete()
+        refresh_leaderboards(keys)
+
+    if stdout:
+        stdout.write(f"Updated {len(updated)} scores, refreshed {len(keys)} leaderboards")
+    return len(updated), len(keys)
@@ -0,0 +1,100 @@
+# reference.py - Districts and services: fixed lookup tables
+#
+# Everything here is a tuple or a read-only mapping, shared by every request
+# and never copied: choices for forms and model fields, O(1) code -> label
+# and code -> district maps, districts grouped by state, and the icon and
+# gradient each service is drawn with. Every district of India lives in
+# data/districts.json ({state: [[code, name, lat, lon], ...]}), which is
+# parsed the first time a district is looked up rather than at import.
+# Nothing here imports models, so models.py can build its fields from it.
+import json
+from functools import cache, lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import NamedTuple
+
+from django.core.exceptions import ValidationError
+
+DISTRICTS_FILE = Path(__file__).resolve().parent / 'data' / 'districts.json'
+
+
+class Service(NamedTuple):
+    code: str
+    name: str
+    icon: str  # Font Awesome name, without the fa- prefix
+    gradient: str  # Tailwind gradient stops for the service's badge
+
+
+class District(NamedTuple):
+    code: str
+    name: str
+    state: str
+    latitude: float  # of the district headquarters
+    longitude: float
+
+
+SERVICES = tuple(Service(*service) for service in (
+    ('mason', 'Mason', 'hard-hat', 'from-red-500 to-pink-500'),
+    ('painter', 'Painter', 'paint-roller', 'from-cyan-500 to-blue-500'),
+    ('plumber', 'Plumber', 'wrench', 'from-blue-500 to-indigo-500'),
+    ('carpenter', 'Carpenter', 'hammer', 'from-amber-500 to-orange-500'),
+    ('electrician', 'Electrician', 'bolt', 'from-yellow-400 to-yellow-600'),
+    ('tile_marble', 'Tile/Marble Worker', 'th', 'from-slate-400 to-slate-600'),
+    ('steel_fabricator', 'Steel Fabricator', 'industry', 'from-gray-500 to-gray-700'),
+    ('glass_worker', 'Glass Worker', 'wine-glass', 'from-purple-500 to-indigo-500'),
+    ('gardener', 'Gardener', 'leaf', 'from-green-400 to-emerald-600'),
+    ('driver', 'Driver', 'car', 'from-pink-500 to-rose-500'),
+))
+
+SERVICE_CHOICES = tuple((service.code, service.name) for service in SERVICES)
+SERVICE_NAMES = MappingProxyType(dict(SERVICE_CHOICES))
+
+
+@cache
+def _districts():
+    """(districts, {code: District}, grouped choices), read from DISTRICTS_FILE on first use"""
+    with open(DISTRICTS_FILE, encoding='utf-8') as fh:
+        states = json.load(fh)
+    districts = tuple(
+        District(code, name, state, latitude, longitude)
+        for state, rows in states.items() for code, name, latitude, longitude in rows
+    )
+    groups = tuple((state, tuple((code, name) for code, name, _, _ in rows)) for state, rows in states.items())
+    return districts, MappingProxyType({district.code: district for district in districts}), groups
+
+
+def districts():
+    return _districts()[0]
+
+
+def get_district(code):
+    return _districts()[1].get(code)
+
+
+def is_district(code):
+    return code in _districts()[1]
+
+
+def district_name(code):
+    district = get_district(code)
+    return district.name if district else code
+
+
+def district_centroid(code):
+    """(lat, lon) of a district's headquarters, or None if unknown"""
+    district = get_district(code)
+    return (district.latitude, district.longitude) if district else None
+
+
+@lru_cache(maxsize=8)
+def district_choice_groups(blank_label=None):
+    """Choices with an <optgroup> per state, optionally after a blank option"""
+    groups = _districts()[2]
+    return ((('', blank_label),) + groups) if blank_label else groups
+
+
+def validate_district(value):
+    # Model field validator; replaces `choices`, which put every district in migrations
+    if not is_district(value):
+        raise ValidationError('%(value)s is not a known district.', code='invalid_district',
+                              params={'value': value})
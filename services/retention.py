@@ -0,0 +1,138 @@
+# retention.py - Delete or archive old rows in small chunks
+#
+# Each Policy names a model, the date column that ages its rows and how
+# many days to keep them. Expired rows are removed a chunk at a time, each
+# chunk in its own short transaction with a pause after it, so SQLite's
+# write lock is never held for long and requests keep getting through.
+# Archiving policies first append the rows to a gzipped JSON Lines file
+# under RETENTION_ARCHIVE_DIR; a crash between the two can at worst leave a
+# row archived twice, never lost. Reviews aren't covered: they are the
+# input of every provider's rating and ranking.
+import gzip
+import json
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from . import jobs
+from .models import BackgroundJob, BookedInterval, OTPVerification, ServiceOffer, ServiceRequest
+
+ARCHIVE_DIR = Path(getattr(settings, 'RETENTION_ARCHIVE_DIR', settings.BASE_DIR / 'archive'))
+CHUNK_SIZE = getattr(settings, 'RETENTION_CHUNK_SIZE', 500)
+# Seconds to sleep between chunks, letting queued writers take the lock
+PAUSE = getattr(settings, 'RETENTION_PAUSE', 0.05)
+
+
+class Policy:
+    def __init__(self, name, model, date_field, days, archive=False, **filters):
+        self.name = name
+        self.model = model
+        self.date_field = date_field
+        # Overridable per policy, e.g. RETENTION_DAYS = {'requests': 730}
+        self.days = getattr(settings, 'RETENTION_DAYS', {}).get(name, days)
+        self.archive = archive
+        self.filters = filters
+
+    def expired(self, now=None):
+        cutoff = (now or timezone.now()) - timedelta(days=self.days)
+        return self.model.objects.filter(**{f'{self.date_field}__lt': cutoff}, **self.filters)
+
+    def __str__(self):
+        action = 'archive' if self.archive else 'delete'
+        conditions = ''.join(f', {field}={value}' for field, value in self.filters.items())
+        return f"{self.name}: {action} {self.model.__name__} {self.days} days after {self.date_field}{conditions}"
+
+
+POLICIES = [
+    Policy('sessions', Session, 'expire_date', 0),
+    # An OTP is only good for 10 minutes; a day is kept for support questions
+    Policy('otps', OTPVerification, 'created_at', 1),
+    Policy('jobs', BackgroundJob, 'finished_at', 30),
+    # Availability only ever looks ahead
+    Policy('bookings', BookedInterval, 'end', 90),
+    Policy('offers', ServiceOffer, 'created_at', 90, status__in=['declined', 'withdrawn']),
+    # Deleting a request also deletes its remaining offers and booking
+    Policy('requests', ServiceRequest, 'created_at', 365, archive=True, status__in=['completed', 'cancelled']),
+]
+
+
+def get_policies(names=None):
+    if not names:
+        return list(POLICIES)
+    known = {policy.name: policy for policy in POLICIES}
+    unknown = set(names) - set(known)
+    if unknown:
+        raise KeyError(f"Unknown retention policies: {', '.join(sorted(unknown))}")
+    return [known[name] for name in names]
+
+
+def _archive(policy, pks, now):
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    path = ARCHIVE_DIR / f'{policy.name}-{now:%Y%m}.jsonl.gz'
+    rows = policy.model.objects.filter(pk__in=pks).order_by('pk').values()
+    # Every append is a separate gzip member; gzip.open reads them as one stream
+    with gzip.open(path, 'at', encoding='utf-8') as fh:
+        for row in rows:
+            fh.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+        fh.flush()
+        os.fsync(fh.fileno())
+
+
+def apply_policy(policy, dry_run=False, chunk_size=CHUNK_SIZE, pause=PAUSE, progress=None):
+    """
+    Remove (or archive, then remove) a policy's expired rows chunk by chunk.
+    progress(policy, done, total) is called after every chunk. Returns the
+    number of rows removed, or that would be with dry_run.
+    """
+    now = timezone.now()
+    expired = policy.expired(now)
+    total = expired.count()
+    if dry_run or not total:
+        return total
+
+    done = 0
+    while True:
+        # The cutoff is fixed for the run, so this walks down a shrinking set
+        pks = list(expired.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            break
+        if policy.archive:
+            _archive(policy, pks, now)
+        with transaction.atomic():
+            policy.model.objects.filter(pk__in=pks).delete()
+        done += len(pks)
+        if progress:
+            progress(policy, done, total)
+        if len(pks) < chunk_size:
+            break
+        time.sleep(pause)
+    return done
+
+
+def apply_retention(names=None, dry_run=False, chunk_size=CHUNK_SIZE, pause=PAUSE, progress=None):
+    """{policy name: rows removed} for the named policies (default: all)"""
+    return {policy.name: apply_policy(policy, dry_run, chunk_size, pause, progress)
+            for policy in get_policies(names)}
+
+
+@jobs.register('retention')
+def run_retention(job, policies=None, dry_run=False):
+    """Background-job entry point: jobs.enqueue('retention', policies=['otps'])"""
+    expired = apply_retention(policies, dry_run=True)
+    jobs.set_progress(job, 0, sum(expired.values()))
+    if dry_run:
+        return expired
+    done_by_policy = {}
+
+    def progress(policy, done, total):
+        done_by_policy[policy.name] = done
+        jobs.set_progress(job, sum(done_by_policy.values()))
+
+    return apply_retention(policies, progress=progress)
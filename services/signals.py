@@ -0,0 +1,27 @@
+# signals.py - Keep derived tables in sync when rows are deleted
+# Cascade deletes (e.g. removing a User) never call Model.delete(), so
+# delete-side bookkeeping lives here instead of in model methods.
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from . import counters, ranking
+from .models import ServiceProvider, Review
+
+
+@receiver(post_delete, sender=ServiceProvider)
+def provider_deleted(sender, instance, **kwargs):
+    # Keys as last saved, in case the instance was edited before deletion
+    keys = getattr(instance, '_loaded_keys', None)
+    if keys is None:
+        keys = instance.leaderboard_keys()
+    counters.apply_changes(removed=keys)
+    # Let the next-best providers move up into the freed leaderboard slots
+    ranking.refresh_leaderboards(keys)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    # The provider may itself be going away as part of the same cascade
+    provider = ServiceProvider.objects.filter(pk=instance.provider_id).first()
+    if provider:
+        provider.update_rating()
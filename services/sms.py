@@ -0,0 +1,101 @@
+# sms.py - Pluggable SMS backends for OTP delivery
+# Pick one with the SMS_BACKEND setting (dotted path). Every backend has a
+# blocking send() and an awaitable asend() for the async views.
+import asyncio
+import logging
+import time
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+OTP_MESSAGE = 'Your ServiceHub password reset OTP is {otp}. Valid for 10 minutes. Do not share.'
+
+
+class BaseBackend:
+    def send(self, phone_number, message):
+        """Deliver one message; returns True if the gateway accepted it"""
+        raise NotImplementedError
+
+    async def asend(self, phone_number, message):
+        # Blocking gateways run in a worker thread so the event loop stays free
+        return await sync_to_async(self.send, thread_sensitive=False)(phone_number, message)
+
+
+class ConsoleBackend(BaseBackend):
+    """Development backend: writes the message to the log (text only when DEBUG)"""
+
+    def send(self, phone_number, message):
+        if settings.DEBUG:
+            logger.info('SMS to %s: %s', phone_number, message)
+        else:
+            logger.info('SMS sent via console backend', extra={'phone_suffix': phone_number[-4:]})
+        return True
+
+    async def asend(self, phone_number, message):
+        return self.send(phone_number, message)
+
+
+class SlowStubBackend(ConsoleBackend):
+    """
+    Console backend that takes SMS_STUB_DELAY seconds per message, standing in
+    for a slow gateway in load tests (see `manage.py benchmark_concurrency`).
+    """
+
+    def __init__(self):
+        self.delay = float(getattr(settings, 'SMS_STUB_DELAY', 1.0))
+
+    def send(self, phone_number, message):
+        time.sleep(self.delay)
+        return super().send(phone_number, message)
+
+    async def asend(self, phone_number, message):
+        await asyncio.sleep(self.delay)
+        return super().send(phone_number, message)
+
+
+class Fast2SMSBackend(BaseBackend):
+    """Fast2SMS bulk API (https://www.fast2sms.com); needs FAST2SMS_API_KEY"""
+
+    URL = 'https://www.fast2sms.com/dev/bulkV2'
+
+    def send(self, phone_number, message):
+        import requests
+
+        try:
+            response = requests.post(
+                self.URL,
+                data={
+                    'route': 'v3',
+                    'sender_id': 'TXTIND',
+                    'message': message,
+                    'language': 'english',
+                    'flash': 0,
+                    'numbers': phone_number,
+                },
+                headers={'authorization': settings.FAST2SMS_API_KEY},
+                timeout=getattr(settings, 'SMS_TIMEOUT', 10),
+            )
+        except requests.RequestException:
+            logger.exception('Fast2SMS request failed')
+            return False
+        if response.status_code != 200:
+            logger.error('Fast2SMS rejected message', extra={'status': response.status_code})
+            return False
+        return True
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.SMS_BACKEND)()
+
+
+def send_otp(phone_number, otp):
+    return get_backend().send(phone_number, OTP_MESSAGE.format(otp=otp))
+
+
+async def asend_otp(phone_number, otp):
+    return await get_backend().asend(phone_number, OTP_MESSAGE.format(otp=otp))
@@ -0,0 +1,71 @@
+# templating.py - Template backend instrumentation and startup warm-up
+import logging
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.template import TemplateDoesNotExist, engines
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHED_LOADER = 'django.template.loaders.cached.Loader'
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = metrics.current_request.get()
+        if stats is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates whose top-level renders are timed (includes/extends count towards their parent)"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return InstrumentedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def uses_cached_loader(engine):
+    """True if a DjangoTemplates engine keeps compiled templates between requests"""
+    return any(
+        (loader[0] if isinstance(loader, (list, tuple)) else loader) == CACHED_LOADER
+        for loader in engine.engine.loaders
+    )
+
+
+def warm_templates():
+    """
+    Compile every template of the services app into the cached loader, so a
+    worker's first requests don't pay for reading and parsing them (and with
+    gunicorn's preload_app the compiled templates are shared between workers).
+    Returns the number of templates compiled; does nothing without caching.
+    """
+    root = Path(apps.get_app_config('services').path) / 'templates'
+    names = sorted(path.relative_to(root).as_posix() for path in root.glob('services/**/*.html'))
+    compiled = 0
+    start = time.perf_counter()
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates) or not uses_cached_loader(engine):
+            continue
+        for name in names:
+            engine.get_template(name)
+            compiled += 1
+    if compiled:
+        logger.info('templates compiled', extra={
+            'templates': compiled, 'duration_ms': round((time.perf_counter() - start) * 1000, 2),
+        })
+    return compiled
@@ -0,0 +1,41 @@
+# base.py - Shared fixtures for the services tests
+from datetime import date
+from itertools import count
+
+from django.test import TestCase
+
+from services.models import Customer, ServiceProvider, User
+
+_phones = count(1)
+
+
+def make_user(user_type, name='Test User'):
+    prefix = '6' if user_type == 'customer' else '7'
+    user = User.objects.create(phone_number=f'{prefix}{next(_phones):09d}', name=name, user_type=user_type)
+    user.set_password('pass12345')
+    user.save(update_fields=['password'])
+    return user
+
+
+def make_customer(district='lucknow', name='Test Customer'):
+    return Customer.objects.create(user=make_user('customer', name), district=district, address='1 Test Street')
+
+
+def make_provider(district='lucknow', service='plumber', verified=True, name='Test Provider', **fields):
+    fields.setdefault('aadhar_number', f'{next(_phones):012d}')
+    return ServiceProvider.objects.create(
+        user=make_user('provider', name), district=district, address='2 Test Street',
+        date_of_birth=date(1990, 1, 1), service1=service, is_verified=verified, **fields,
+    )
+
+
+class CustomerClientTestCase(TestCase):
+    """A logged-in customer browsing `district`"""
+    district = 'lucknow'
+
+    def setUp(self):
+        self.customer = make_customer(self.district)
+        self.client.force_login(self.customer.user)
+        session = self.client.session
+        session['selected_district'] = self.district
+        session.save()
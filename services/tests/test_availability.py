@@ -0,0 +1,214 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from services import availability, booking
+from services.availability import MINUTES_PER_DAY, MINUTES_PER_WEEK
+from services.models import BookedInterval, ServiceOffer, ServiceRequest
+
+from .base import CustomerClientTestCase, make_customer, make_provider
+
+IST = ZoneInfo('Asia/Kolkata')
+ALWAYS_OPEN = [['00:00', '23:59']] * 7
+NEVER_OPEN = [None] * 7
+
+
+def at(day, hour, minute=0):
+    """A time in the week of Monday 19 October 2026, India time; day 0 is Monday"""
+    return datetime(2026, 10, 19, hour, minute, tzinfo=IST) + timedelta(days=day)
+
+
+def hours(**days):
+    """Weekly working hours from mon=('09:00', '17:00')-style arguments"""
+    names = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+    return [list(days[name]) if name in days else None for name in names]
+
+
+class WeekIndexTests(SimpleTestCase):
+    def test_day_shift(self):
+        self.assertEqual(availability.week_index(hours(mon=('09:00', '17:00'))), ((540,), (1020,)))
+
+    def test_no_hours(self):
+        self.assertIsNone(availability.week_index([]))
+        self.assertEqual(availability.week_index(NEVER_OPEN), ((), ()))
+
+    def test_shift_past_midnight(self):
+        starts, ends = availability.week_index(hours(tue=('22:00', '02:00')))
+        self.assertEqual((starts, ends), ((MINUTES_PER_DAY + 1320,), (2 * MINUTES_PER_DAY + 120,)))
+
+    def test_sunday_night_wraps_into_monday(self):
+        starts, ends = availability.week_index(hours(sun=('22:00', '06:00')))
+        self.assertEqual((starts, ends), ((0, 6 * MINUTES_PER_DAY + 1320), (360, MINUTES_PER_WEEK)))
+
+    def test_overlapping_shifts_merge(self):
+        starts, ends = availability.week_index(hours(mon=('22:00', '02:00'), tue=('01:00', '05:00')))
+        self.assertEqual((starts, ends), ((1320,), (MINUTES_PER_DAY + 300,)))
+
+    def test_touching_shifts_merge(self):
+        starts, ends = availability.week_index(hours(mon=('12:00', '00:00'), tue=('00:00', '08:00')))
+        self.assertEqual((starts, ends), ((720,), (MINUTES_PER_DAY + 480,)))
+
+
+class WorkingPeriodsTests(SimpleTestCase):
+    def test_without_hours_everything_is_working_time(self):
+        self.assertEqual(availability.working_periods([], at(0, 3), at(0, 4)), [(at(0, 3), at(0, 4))])
+
+    def test_clipped_to_the_window(self):
+        periods = availability.working_periods(hours(mon=('09:00', '17:00')), at(0, 12), at(0, 20))
+        self.assertEqual(periods, [(at(0, 12), at(0, 17))])
+
+    def test_starts_after_the_day_ended(self):
+        # bisect skips Monday's shift, which ended before the window starts
+        periods = availability.working_periods(hours(mon=('09:00', '17:00'), tue=('09:00', '17:00')),
+                                               at(0, 18), at(1, 12))
+        self.assertEqual(periods, [(at(1, 9), at(1, 12))])
+
+    def test_starts_exactly_at_shift_end(self):
+        periods = availability.working_periods(hours(mon=('09:00', '17:00')), at(0, 17), at(0, 20))
+        self.assertEqual(periods, [])
+
+    def test_shift_past_midnight(self):
+        periods = availability.working_periods(hours(tue=('22:00', '02:00')), at(1, 20), at(2, 12))
+        self.assertEqual(periods, [(at(1, 22), at(2, 2))])
+
+    def test_joined_across_the_week_boundary(self):
+        # Sunday 22:00 to Monday 06:00 is two intervals of the week index
+        periods = availability.working_periods(hours(sun=('22:00', '06:00')), at(6, 20), at(7, 12))
+        self.assertEqual(periods, [(at(6, 22), at(7, 6))])
+
+    def test_window_inside_the_wrapped_part(self):
+        periods = availability.working_periods(hours(sun=('22:00', '06:00')), at(7, 1), at(7, 3))
+        self.assertEqual(periods, [(at(7, 1), at(7, 3))])
+
+    def test_window_longer_than_a_week(self):
+        periods = availability.working_periods(hours(wed=('10:00', '11:00')), at(0, 0), at(14, 0))
+        self.assertEqual(periods, [(at(2, 10), at(2, 11)), (at(9, 10), at(9, 11))])
+
+    def test_window_given_in_utc(self):
+        # 03:30 UTC is 09:00 in India
+        start = datetime(2026, 10, 19, 3, 30, tzinfo=ZoneInfo('UTC'))
+        periods = availability.working_periods(hours(mon=('09:00', '10:00')), start, at(0, 12))
+        self.assertEqual(periods, [(at(0, 9), at(0, 10))])
+
+
+class FreePeriodsTests(SimpleTestCase):
+    day = [(at(0, 9), at(0, 17))]
+
+    def test_no_bookings(self):
+        self.assertEqual(availability.free_periods(self.day, []), self.day)
+
+    def test_booking_in_the_middle(self):
+        free = availability.free_periods(self.day, [(at(0, 11), at(0, 13))])
+        self.assertEqual(free, [(at(0, 9), at(0, 11)), (at(0, 13), at(0, 17))])
+
+    def test_bookings_over_the_edges(self):
+        busy = [(at(0, 7), at(0, 10)), (at(0, 16), at(0, 19))]
+        self.assertEqual(availability.free_periods(self.day, busy), [(at(0, 10), at(0, 16))])
+
+    def test_back_to_back_and_overlapping_bookings(self):
+        busy = [(at(0, 10), at(0, 12)), (at(0, 11), at(0, 13)), (at(0, 13), at(0, 14))]
+        free = availability.free_periods(self.day, busy)
+        self.assertEqual(free, [(at(0, 9), at(0, 10)), (at(0, 14), at(0, 17))])
+
+    def test_booking_outside_the_period(self):
+        busy = [(at(0, 6), at(0, 8)), (at(0, 18), at(0, 19))]
+        self.assertEqual(availability.free_periods(self.day, busy), self.day)
+
+    def test_booked_all_day(self):
+        self.assertEqual(availability.free_periods(self.day, [(at(0, 8), at(0, 18))]), [])
+
+    def test_booking_spanning_two_periods(self):
+        periods = [(at(0, 9), at(0, 12)), (at(0, 14), at(0, 17))]
+        free = availability.free_periods(periods, [(at(0, 11), at(0, 15))])
+        self.assertEqual(free, [(at(0, 9), at(0, 11)), (at(0, 15), at(0, 17))])
+
+
+class EarliestSlotTests(SimpleTestCase):
+    working = hours(mon=('09:00', '17:00'))
+    hour = timedelta(hours=1)
+
+    def test_free_now(self):
+        self.assertEqual(availability.earliest_slot(self.working, [], at(0, 10), at(0, 12), self.hour), at(0, 10))
+
+    def test_waits_for_the_shift(self):
+        self.assertEqual(availability.earliest_slot(self.working, [], at(0, 8), at(0, 10), self.hour), at(0, 9))
+
+    def test_shift_starts_too_late(self):
+        self.assertIsNone(availability.earliest_slot(self.working, [], at(0, 6), at(0, 8), self.hour))
+
+    def test_skips_a_gap_too_short(self):
+        busy = [(at(0, 9, 30), at(0, 10)), (at(0, 10, 30), at(0, 12))]
+        self.assertEqual(availability.earliest_slot(self.working, busy, at(0, 9), at(0, 13), self.hour), at(0, 12))
+
+    def test_slot_may_run_past_latest_start(self):
+        self.assertEqual(availability.earliest_slot(self.working, [], at(0, 15), at(0, 15), self.hour), at(0, 15))
+
+    def test_shift_ends_before_the_slot_fits(self):
+        self.assertIsNone(availability.earliest_slot(self.working, [], at(0, 16, 30), at(0, 17), self.hour))
+
+
+class CanTakeTests(SimpleTestCase):
+    working = hours(mon=('09:00', '17:00'))
+
+    def test_preferred_time(self):
+        now = at(0, 8)
+        self.assertTrue(availability.can_take(self.working, [], at(0, 10), now))
+        self.assertFalse(availability.can_take(self.working, [], at(0, 16), now))  # runs past 17:00
+        self.assertFalse(availability.can_take(self.working, [(at(0, 11), at(0, 12))], at(0, 10), now))
+
+    def test_as_soon_as_possible(self):
+        self.assertTrue(availability.can_take(self.working, [], None, at(0, 8)))
+        self.assertFalse(availability.can_take(self.working, [], None, at(0, 6)))
+        # A preferred time already past counts as "as soon as possible"
+        self.assertTrue(availability.can_take(self.working, [], at(0, 7), at(0, 10)))
+
+
+class AvailableFilterTests(CustomerClientTestCase):
+    def setUp(self):
+        super().setUp()
+        self.free = make_provider(working_hours=[])
+        self.off_duty = make_provider(working_hours=NEVER_OPEN)
+        self.booked = make_provider(working_hours=[])
+        now = timezone.now()
+        job = ServiceRequest.objects.create(customer=self.customer, provider=self.booked, service_type='plumber',
+                                            district='lucknow', description='Leaking tap', status='accepted')
+        BookedInterval.objects.create(provider=self.booked, request=job, start=now - timedelta(hours=1),
+                                      end=now + timedelta(hours=6))
+
+    def test_html_listing(self):
+        response = self.client.get('/service/plumber/providers/?available=1')
+        self.assertEqual([p.pk for p in response.context['providers']], [self.free.pk])
+        response = self.client.get('/service/plumber/providers/')
+        self.assertEqual(len(response.context['providers']), 3)
+
+    def test_json_listing(self):
+        providers = self.client.get('/api/service/plumber/providers/?available=1').json()['providers']
+        self.assertEqual([p['phone_number'] for p in providers], [self.free.user.phone_number])
+        self.assertIn('free_from', providers[0])
+
+
+class DispatchAvailabilityTests(TestCase):
+    def setUp(self):
+        self.customer = make_customer()
+        self.free = make_provider(working_hours=ALWAYS_OPEN)
+        self.off_duty = make_provider(working_hours=NEVER_OPEN)
+        self.booked = make_provider(working_hours=ALWAYS_OPEN)
+        self.start = timezone.localtime().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        job = ServiceRequest.objects.create(customer=self.customer, provider=self.booked, service_type='plumber',
+                                            district='lucknow', description='Leaking tap', status='accepted')
+        BookedInterval.objects.create(provider=self.booked, request=job, start=self.start + timedelta(hours=1),
+                                      end=self.start + timedelta(hours=3))
+
+    def offered(self, preferred_start):
+        with self.captureOnCommitCallbacks(execute=True):
+            service_request = booking.create_request(self.customer, 'plumber', 'lucknow', 'Blocked drain',
+                                                     preferred_start=preferred_start)
+        return set(ServiceOffer.objects.filter(request=service_request).values_list('provider_id', flat=True))
+
+    def test_clashing_booking_gets_no_offer(self):
+        self.assertEqual(self.offered(self.start), {self.free.pk})
+
+    def test_later_slot_goes_to_both(self):
+        self.assertEqual(self.offered(self.start + timedelta(hours=3)), {self.free.pk, self.booked.pk})
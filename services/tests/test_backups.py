@@ -0,0 +1,93 @@
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from services import backups
+
+
+class BackupRoundTripTests(SimpleTestCase):
+    """Snapshots of a scratch SQLite file and media directory, restored over later changes"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.root = self.tmp / 'backups'
+        self.media = self.tmp / 'media'
+        self.db_path = self.tmp / 'site.sqlite3'
+
+        with self.connect() as conn:
+            conn.execute('CREATE TABLE reviews (id INTEGER PRIMARY KEY, comment TEXT)')
+            conn.executemany('INSERT INTO reviews (comment) VALUES (?)', [('good',), ('great',)])
+        self.write_media('work_photos/a.jpg', b'first photo')
+        self.write_media('provider_photos/b.jpg', b'second photo')
+
+        database = mock.patch.object(backups, '_database', return_value=('sqlite', {'NAME': str(self.db_path)}))
+        database.start()
+        self.addCleanup(database.stop)
+        media_root = override_settings(MEDIA_ROOT=str(self.media))
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        # Snapshot names have one-second resolution
+        self.clock = (datetime(2026, 1, 1, tzinfo=dt_timezone.utc) + timedelta(minutes=n) for n in range(100))
+        clock = mock.patch.object(backups.timezone, 'now', side_effect=lambda: next(self.clock))
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path)
+        self.addCleanup(conn.close)
+        return conn
+
+    def write_media(self, name, content):
+        path = self.media / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+
+    def comments(self):
+        return [row[0] for row in self.connect().execute('SELECT comment FROM reviews ORDER BY id')]
+
+    def media_files(self):
+        return {path.relative_to(self.media).as_posix(): path.read_bytes()
+                for path in self.media.rglob('*') if path.is_file()}
+
+    def test_restore_brings_back_database_and_media(self):
+        manifest = backups.create_backup(self.root)
+        original_media = self.media_files()
+
+        with self.connect() as conn:
+            conn.execute("DELETE FROM reviews WHERE comment = 'good'")
+            conn.execute("INSERT INTO reviews (comment) VALUES ('spam')")
+        self.write_media('work_photos/a.jpg', b'overwritten')
+        (self.media / 'provider_photos/b.jpg').unlink()
+        self.write_media('work_photos/new.jpg', b'added later')
+
+        result = backups.restore_snapshot(manifest['name'], self.root, prune_media=True)
+        self.assertEqual(self.comments(), ['good', 'great'])
+        self.assertEqual(self.media_files(), original_media)
+        self.assertEqual((result['media_restored'], result['media_pruned']), (2, 1))
+
+    def test_snapshots_only_copy_new_media(self):
+        first = backups.create_backup(self.root)
+        self.assertEqual(first['media_stats']['copied'], 2)
+        second = backups.create_backup(self.root)
+        self.assertEqual(second['media_stats']['copied'], 0)
+        self.write_media('work_photos/c.jpg', b'third photo')
+        third = backups.create_backup(self.root)
+        self.assertEqual((third['media_stats']['files'], third['media_stats']['copied']), (3, 1))
+        self.assertEqual(backups.list_snapshots(self.root), [first['name'], second['name'], third['name']])
+
+    def test_corrupt_snapshot_is_not_restored(self):
+        manifest = backups.create_backup(self.root)
+        digest = manifest['media']['work_photos/a.jpg']['sha256']
+        backups._object_path(self.root, digest).write_bytes(b'bit rot')
+        with self.connect() as conn:
+            conn.execute("INSERT INTO reviews (comment) VALUES ('kept')")
+
+        with self.assertRaises(backups.BackupError):
+            backups.restore_snapshot('latest', self.root)
+        self.assertEqual(self.comments(), ['good', 'great', 'kept'])
@@ -0,0 +1,94 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from services import booking
+from services.models import BookedInterval, ServiceOffer, ServiceProvider, ServiceRequest
+
+from .base import make_customer, make_provider
+
+
+class AcceptOfferTests(TestCase):
+    def setUp(self):
+        self.first, self.second = make_provider(), make_provider()
+        self.customer = make_customer()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.request = booking.create_request(self.customer, 'plumber', 'lucknow', 'Leaking tap')
+        self.offers = {offer.provider_id: offer for offer in self.request.offers.all()}
+
+    def status(self, provider):
+        return ServiceOffer.objects.get(pk=self.offers[provider.pk].pk).status
+
+    def test_request_is_offered_to_ranked_providers(self):
+        self.assertEqual(set(self.offers), {self.first.pk, self.second.pk})
+
+    def test_first_accept_wins(self):
+        booking.accept_offer(self.offers[self.first.pk].pk, self.first)
+        self.request.refresh_from_db()
+        self.assertEqual((self.request.status, self.request.provider_id), ('accepted', self.first.pk))
+        self.assertEqual(self.status(self.first), 'accepted')
+        self.assertEqual(self.status(self.second), 'withdrawn')
+        self.assertTrue(BookedInterval.objects.filter(request=self.request, provider=self.first).exists())
+        with self.assertRaises(booking.BookingError):
+            booking.accept_offer(self.offers[self.second.pk].pk, self.second)
+
+    def test_lost_race_withdraws_the_offer(self):
+        # Another worker won between reading the offer and the conditional UPDATE
+        ServiceRequest.objects.filter(pk=self.request.pk).update(status='accepted', provider=self.first)
+        with self.assertRaisesMessage(booking.BookingError, 'already accepted'):
+            booking.accept_offer(self.offers[self.second.pk].pk, self.second)
+        self.assertEqual(self.status(self.second), 'withdrawn')
+        self.assertFalse(BookedInterval.objects.exists())
+
+    def test_cancelled_request_cannot_be_accepted(self):
+        booking.cancel_request(self.request.pk, self.customer)
+        with self.assertRaises(booking.BookingError):
+            booking.accept_offer(self.offers[self.first.pk].pk, self.first)
+        self.assertEqual(self.status(self.first), 'withdrawn')
+
+    def test_only_the_offered_provider_can_accept(self):
+        with self.assertRaises(booking.BookingError):
+            booking.accept_offer(self.offers[self.first.pk].pk, self.second)
+        self.assertEqual(ServiceRequest.objects.get(pk=self.request.pk).status, 'pending')
+
+
+class OverlappingAcceptTests(TestCase):
+    def setUp(self):
+        self.provider = make_provider()
+        customer = make_customer()
+        start = timezone.now() + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            # Two jobs an hour apart; each is booked for two hours
+            self.requests = [
+                booking.create_request(customer, 'plumber', 'lucknow', 'Leaking tap', preferred_start=start),
+                booking.create_request(customer, 'plumber', 'lucknow', 'Blocked drain',
+                                       preferred_start=start + timedelta(hours=1)),
+            ]
+        self.offers = [ServiceOffer.objects.get(request=r, provider=self.provider) for r in self.requests]
+
+    def test_second_overlapping_accept_is_refused(self):
+        with mock.patch.object(ServiceProvider.objects, 'select_for_update',
+                               wraps=ServiceProvider.objects.select_for_update) as lock:
+            booking.accept_offer(self.offers[0].pk, self.provider)
+            with self.assertRaisesMessage(booking.BookingError, 'already booked'):
+                booking.accept_offer(self.offers[1].pk, self.provider)
+        # Each accept locked the provider's row before checking for clashes
+        self.assertEqual(lock.call_count, 2)
+        self.assertEqual(list(BookedInterval.objects.values_list('request_id', flat=True)), [self.requests[0].pk])
+        self.assertEqual(ServiceRequest.objects.get(pk=self.requests[1].pk).status, 'pending')
+        self.assertEqual(ServiceOffer.objects.get(pk=self.offers[1].pk).status, 'offered')
+
+
+class StrandedRequestTests(TestCase):
+    def test_requests_without_offers_are_requeued(self):
+        make_provider()
+        customer = make_customer()
+        # Not committed in a TestCase, so never dispatched: stranded
+        stranded = booking.create_request(customer, 'plumber', 'lucknow', 'Leaking tap')
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.create_request(customer, 'plumber', 'lucknow', 'Blocked drain')
+        dispatcher = booking.Dispatcher()
+        dispatcher._requeue_stranded()
+        self.assertEqual(list(dispatcher.queue.queue), [stranded.pk])
@@ -0,0 +1,21 @@
+from django.test import SimpleTestCase, override_settings
+
+from services.checks import check_sms_backend
+
+
+class SMSBackendCheckTests(SimpleTestCase):
+    @override_settings(DEBUG=False, SMS_BACKEND='services.sms.ConsoleBackend')
+    def test_console_backend_fails_in_production(self):
+        self.assertEqual([error.id for error in check_sms_backend(None)], ['services.E004'])
+
+    @override_settings(DEBUG=False, SMS_BACKEND='services.sms.SlowStubBackend')
+    def test_stub_backend_fails_in_production(self):
+        self.assertEqual([error.id for error in check_sms_backend(None)], ['services.E004'])
+
+    @override_settings(DEBUG=False, SMS_BACKEND='services.sms.Fast2SMSBackend')
+    def test_gateway_passes(self):
+        self.assertEqual(check_sms_backend(None), [])
+
+    @override_settings(DEBUG=True, SMS_BACKEND='services.sms.ConsoleBackend')
+    def test_console_backend_allowed_in_development(self):
+        self.assertEqual(check_sms_backend(None), [])
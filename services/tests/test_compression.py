@@ -0,0 +1,159 @@
+import gzip
+import secrets
+from unittest import mock
+
+import brotli
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from services import middleware
+from services.middleware import CompressionMiddleware, accepted_encodings
+
+PAGE = b'<li class="provider">Test Provider, Plumber, Lucknow</li>\n' * 100
+
+
+def gzip_filename(body):
+    """The FNAME field of a gzip member"""
+    flags = body[3]
+    assert flags & gzip.FNAME, 'no file name'
+    return body[10:body.index(b'\0', 10)]
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024)
+class CompressionTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def respond(self, response, accept_encoding='gzip, deflate, br', fetch_site='same-origin'):
+        headers = {'HTTP_ACCEPT_ENCODING': accept_encoding}
+        if fetch_site is not None:
+            headers['HTTP_SEC_FETCH_SITE'] = fetch_site
+        return CompressionMiddleware(lambda request: response)(self.factory.get('/', **headers))
+
+    def page(self, content=PAGE, content_type='text/html; charset=utf-8'):
+        return self.respond(HttpResponse(content, content_type=content_type))
+
+    def assertEncoded(self, response, encoding):
+        self.assertEqual(response.get('Content-Encoding'), encoding)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        decompress = {'br': brotli.decompress, 'gzip': gzip.decompress, None: bytes}[encoding]
+        self.assertEqual(decompress(response.content), PAGE)
+        if encoding:
+            self.assertEqual(response['Content-Length'], str(len(response.content)))
+
+    def test_encoding_per_fetch_site(self):
+        cases = [
+            ('same-origin', 'br'),
+            ('none', 'br'),          # typed into the address bar, a bookmark
+            ('same-site', 'gzip'),
+            (None, 'gzip'),          # browsers without Fetch Metadata
+            ('cross-site', None),
+        ]
+        for fetch_site, encoding in cases:
+            with self.subTest(fetch_site=fetch_site):
+                response = self.respond(HttpResponse(PAGE), fetch_site=fetch_site)
+                self.assertEncoded(response, encoding)
+
+    def test_accept_encoding(self):
+        cases = [
+            ('br', 'br'),
+            ('br;q=0, gzip', 'gzip'),
+            ('gzip;q=0.5, br;q=0.8', 'br'),
+            ('*', 'br'),
+            ('br;q=0, *', 'gzip'),
+            ('gzip;q=0, *;q=0', None),
+            ('deflate', None),
+            ('identity', None),
+            ('', None),
+        ]
+        for accept_encoding, encoding in cases:
+            with self.subTest(accept_encoding=accept_encoding):
+                self.assertEncoded(self.respond(HttpResponse(PAGE), accept_encoding), encoding)
+
+    def test_gzip_only_without_brotli(self):
+        with mock.patch.object(middleware, 'brotli', None):
+            self.assertEncoded(self.respond(HttpResponse(PAGE), 'br, gzip'), 'gzip')
+            self.assertEncoded(self.respond(HttpResponse(PAGE), 'br'), None)
+
+    def test_gzip_file_name_has_random_length(self):
+        lengths = set()
+        for _ in range(20):
+            name = gzip_filename(self.respond(HttpResponse(PAGE), 'gzip').content)
+            self.assertTrue(1 <= len(name) <= CompressionMiddleware.max_random_bytes)
+            lengths.add(len(name))
+        self.assertGreater(len(lengths), 1)
+
+    def test_small_body_is_left_alone(self):
+        response = self.page(PAGE[:1023])
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+
+    def test_incompressible_body_is_left_alone(self):
+        body = secrets.token_bytes(2048)
+        response = self.respond(HttpResponse(body, content_type='text/plain'), 'gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, body)
+
+    def test_content_types(self):
+        cases = [
+            ('application/json', 'br'),
+            ('image/svg+xml', 'br'),
+            ('image/png', None),
+            ('text/event-stream', None),
+        ]
+        for content_type, encoding in cases:
+            with self.subTest(content_type=content_type):
+                response = self.page(content_type=content_type)
+                self.assertEqual(response.get('Content-Encoding'), encoding)
+
+    def test_already_encoded_response(self):
+        response = HttpResponse(PAGE)
+        response['Content-Encoding'] = 'identity'
+        self.assertEqual(self.respond(response).content, PAGE)
+
+    def test_strong_etag_becomes_weak(self):
+        response = HttpResponse(PAGE)
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.respond(response)['ETag'], 'W/"abc"')
+
+    def test_streaming_response(self):
+        chunks = [PAGE[:10], PAGE[10:2000], PAGE[2000:]]
+        for accept_encoding, decompress in (('br', brotli.decompress), ('gzip', gzip.decompress)):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.respond(StreamingHttpResponse(iter(chunks)), accept_encoding)
+                self.assertEqual(response['Content-Encoding'], accept_encoding)
+                self.assertFalse(response.has_header('Content-Length'))
+                body = list(response.streaming_content)
+                # Every chunk is flushed as it is produced
+                self.assertGreaterEqual(len(body), len(chunks))
+                self.assertEqual(decompress(b''.join(body)), PAGE)
+
+    async def test_async_streaming_response(self):
+        async def chunks():
+            yield PAGE[:1000]
+            yield PAGE[1000:]
+
+        response = self.respond(StreamingHttpResponse(chunks()), 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        body = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(gzip.decompress(b''.join(body)), PAGE)
+
+    def test_event_stream_is_not_compressed(self):
+        response = self.respond(StreamingHttpResponse(iter([b'data: 1\n\n']), content_type='text/event-stream'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), b'data: 1\n\n')
+
+
+class AcceptedEncodingsTests(SimpleTestCase):
+    def test_q_values(self):
+        self.assertEqual(
+            accepted_encodings('gzip;q=0.5, BR ; q=0, deflate, *;q=0.1'),
+            {'gzip': 0.5, 'br': 0.0, 'deflate': 1.0, '*': 0.1},
+        )
+
+    def test_malformed_q_value_refuses_the_coding(self):
+        self.assertEqual(accepted_encodings('gzip;q=1.0.0'), {'gzip': 0.0})
+
+    def test_empty_parts(self):
+        self.assertEqual(accepted_encodings(' , gzip,,'), {'gzip': 1.0})
+        self.assertEqual(accepted_encodings(''), {})
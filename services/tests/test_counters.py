@@ -0,0 +1,48 @@
+from django.test import TestCase
+
+from services import counters
+from services.models import DistrictServiceCount
+
+from .base import make_provider
+
+
+def counts(district='lucknow'):
+    return {service: count for service, count in counters.counts_for_district(district).items() if count}
+
+
+class ProviderCountTests(TestCase):
+    def test_verified_providers_are_counted_per_service(self):
+        make_provider(service='plumber')
+        make_provider(service='plumber', service2='electrician')
+        make_provider(service='plumber', verified=False)
+        self.assertEqual(counts(), {'plumber': 2, 'electrician': 1})
+
+    def test_verify_and_unverify(self):
+        provider = make_provider(verified=False)
+        provider.is_verified = True
+        provider.save()
+        self.assertEqual(counts(), {'plumber': 1})
+        provider.is_verified = False
+        provider.save()
+        self.assertEqual(counts(), {})
+
+    def test_moving_district_and_service(self):
+        provider = make_provider()
+        provider.district = 'kanpur_nagar'
+        provider.service1 = 'carpenter'
+        provider.save()
+        self.assertEqual(counts(), {})
+        self.assertEqual(counts('kanpur_nagar'), {'carpenter': 1})
+
+    def test_deleted_provider_is_uncounted(self):
+        provider = make_provider(service2='electrician')
+        make_provider()
+        # Cascades from the user row, so only the post_delete signal sees it
+        provider.user.delete()
+        self.assertEqual(counts(), {'plumber': 1})
+
+    def test_rebuild_repairs_drift(self):
+        make_provider()
+        DistrictServiceCount.objects.update(verified_count=7)
+        counters.rebuild_counts()
+        self.assertEqual(counts(), {'plumber': 1})
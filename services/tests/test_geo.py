@@ -0,0 +1,49 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from services import geo
+from services.models import ServiceProvider
+
+from .base import CustomerClientTestCase, make_provider
+
+
+class NearestProvidersTests(TestCase):
+    def setUp(self):
+        # A sparse spread: one provider at each of a few districts' centres
+        self.lat, self.lon = geo.district_centroid('lucknow')
+        self.near = make_provider('lucknow')
+        self.far = [make_provider(code) for code in ('barabanki', 'unnao', 'sitapur', 'kanpur_nagar')]
+        self.out_of_range = make_provider('chennai')
+
+    def test_sparse_search_takes_two_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            distances = geo.nearest_providers(ServiceProvider.objects.all(), self.lat, self.lon, limit=20)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(set(distances), {self.near.pk, *(p.pk for p in self.far)})
+        self.assertEqual(distances[self.near.pk], 0)
+
+    def test_dense_search_takes_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            distances = geo.nearest_providers(ServiceProvider.objects.all(), self.lat, self.lon, limit=1)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(list(distances), [self.near.pk])
+
+    def test_sorted_by_distance(self):
+        distances = geo.nearest_providers(ServiceProvider.objects.all(), self.lat, self.lon, limit=3)
+        self.assertEqual(list(distances.values()), sorted(distances.values()))
+        self.assertEqual(len(distances), 3)
+
+    def test_within_radius(self):
+        distances = geo.providers_within(ServiceProvider.objects.all(), self.lat, self.lon, 10)
+        self.assertEqual(set(distances), {self.near.pk})
+
+
+class NearestListingTests(CustomerClientTestCase):
+    def test_sparse_nearest_listing_has_no_repeated_queries(self):
+        for code in ('lucknow', 'barabanki', 'unnao', 'sitapur', 'hardoi', 'raebareli', 'kanpur_nagar'):
+            make_provider(code)
+        # Strict query watching is on under `manage.py test`: an N+1 raises
+        response = self.client.get('/service/plumber/providers/?within=nearest&sort=distance')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['providers']), 7)
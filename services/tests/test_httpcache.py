@@ -0,0 +1,108 @@
+from django.test import TestCase
+
+from services.models import ProviderWorkPhoto, Review
+
+from .base import CustomerClientTestCase, make_customer, make_provider
+
+LISTING = '/service/plumber/providers/'
+
+
+class ConditionalGetMixin:
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+        return response['ETag']
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+
+class ListingConditionalGetTests(ConditionalGetMixin, CustomerClientTestCase):
+    def setUp(self):
+        super().setUp()
+        self.provider = make_provider()
+
+    def test_unchanged_listing_is_not_modified(self):
+        etag = self.etag(LISTING)
+        response = self.revalidate(LISTING, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_review_changes_the_etag(self):
+        etag = self.etag(LISTING)
+        Review.objects.create(customer=make_customer(), provider=self.provider, rating=5)
+        self.assertEqual(self.revalidate(LISTING, etag).status_code, 200)
+
+    def test_work_photo_changes_the_etag(self):
+        etag = self.etag(LISTING)
+        ProviderWorkPhoto.objects.create(provider=self.provider, photo='work_photos/job.jpg')
+        self.assertEqual(self.revalidate(LISTING, etag).status_code, 200)
+
+    def test_verified_provider_changes_the_etag(self):
+        etag = self.etag(LISTING)
+        make_provider(verified=False)
+        self.assertEqual(self.revalidate(LISTING, etag).status_code, 304)
+        make_provider()
+        self.assertEqual(self.revalidate(LISTING, etag).status_code, 200)
+
+    def test_other_district_changes_the_etag(self):
+        etag = self.etag(LISTING)
+        session = self.client.session
+        session['selected_district'] = 'kanpur_nagar'
+        session.save()
+        self.assertEqual(self.revalidate(LISTING, etag).status_code, 200)
+
+    def test_other_viewer_gets_another_etag(self):
+        etag = self.etag(LISTING)
+        self.client.force_login(make_customer().user)
+        session = self.client.session
+        session['selected_district'] = self.district
+        session.save()
+        self.assertNotEqual(self.etag(LISTING), etag)
+
+    def test_availability_filter_is_never_cached(self):
+        response = self.client.get(LISTING + '?available=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_pending_messages_are_rendered(self):
+        etag = self.etag(LISTING)
+        # Flashes "Request sent!" without touching anything the listing shows
+        self.client.post('/service/plumber/request/', {'description': 'Fix the sink'})
+        self.assertContains(self.revalidate(LISTING, etag), 'Request sent!')
+        self.assertEqual(self.revalidate(LISTING, etag).status_code, 304)
+
+
+class ProviderPagesConditionalGetTests(ConditionalGetMixin, TestCase):
+    def setUp(self):
+        self.provider = make_provider()
+
+    def test_provider_home(self):
+        self.client.force_login(self.provider.user)
+        etag = self.etag('/provider/home/')
+        self.assertEqual(self.revalidate('/provider/home/', etag).status_code, 304)
+        Review.objects.create(customer=make_customer(), provider=self.provider, rating=4)
+        self.assertEqual(self.revalidate('/provider/home/', etag).status_code, 200)
+
+    def test_work_gallery(self):
+        self.client.force_login(make_customer().user)
+        url = f'/provider/work-gallery/{self.provider.user.phone_number}/'
+        etag = self.etag(url)
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+        ProviderWorkPhoto.objects.create(provider=self.provider, photo='work_photos/job.jpg')
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+
+class PublicPageTests(TestCase):
+    def test_anonymous_visitors_share_the_page(self):
+        response = self.client.get('/')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age', response['Cache-Control'])
+
+    def test_logged_in_users_get_a_private_copy(self):
+        self.client.force_login(make_customer().user)
+        response = self.client.get('/login-choice/')
+        self.assertIn('private', response['Cache-Control'])
@@ -0,0 +1,191 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from services import booking, pubsub, views
+from services.models import ServiceOffer
+
+from .base import make_customer, make_provider
+
+
+class SubscriptionTests(SimpleTestCase):
+    def setUp(self):
+        self.hub = pubsub.Hub('test')
+
+    def test_publish_wakes_only_its_channel(self):
+        with self.hub.subscribe(1) as first, self.hub.subscribe(2) as second:
+            self.assertEqual(self.hub.publish([1, 1]), 1)
+            self.assertTrue(first.wait(0))
+            self.assertFalse(second.wait(0))
+            # wait() resets the subscription
+            self.assertFalse(first.wait(0))
+
+    def test_publish_before_wait_is_kept(self):
+        with self.hub.subscribe(1) as subscription:
+            self.hub.publish([1])
+            self.assertTrue(subscription.wait(5))
+
+    def test_wakes_a_waiting_thread(self):
+        with self.hub.subscribe(1) as subscription:
+            threading.Timer(0.05, self.hub.publish, [[1]]).start()
+            self.assertTrue(subscription.wait(5))
+
+    def test_closing_unsubscribes(self):
+        with self.hub.subscribe(1), self.hub.subscribe(1):
+            self.assertEqual(self.hub.subscriber_count(), 2)
+        self.assertEqual(self.hub.subscriber_count(), 0)
+        self.assertEqual(self.hub.publish([1]), 0)
+
+    async def test_async_waiter_woken_from_another_thread(self):
+        with self.hub.subscribe(1, loop=asyncio.get_running_loop()) as subscription:
+            threading.Timer(0.05, self.hub.publish, [[1]]).start()
+            self.assertTrue(await subscription.wait_async(5))
+            self.assertFalse(await subscription.wait_async(0.01))
+
+    def test_closed_loop_is_ignored(self):
+        loop = asyncio.new_event_loop()
+        subscription = self.hub.subscribe(1, loop=loop)
+        loop.close()
+        self.hub.publish([1])
+        subscription.close()
+
+
+@override_settings(BACKGROUND_JOBS_INLINE=False)
+class PollerTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(pubsub, 'POLL_INTERVAL', 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cursors = []
+
+    def poll(self, cursor):
+        self.cursors.append(cursor)
+        return (cursor or 0) + 1, ['other-worker']
+
+    def test_poller_wakes_waiters(self):
+        hub = pubsub.Hub('test-poller', poll=self.poll)
+        with hub.subscribe('other-worker') as subscription:
+            self.assertTrue(subscription.wait(5))
+            self.assertTrue(subscription.wait(5))
+        # Restarted from None, then continued from its own cursor
+        self.assertEqual(self.cursors[:2], [None, 1])
+
+    def test_poller_restarts_after_idle(self):
+        hub = pubsub.Hub('test-idle', poll=self.poll)
+        with hub.subscribe('other-worker') as subscription:
+            self.assertTrue(subscription.wait(5))
+        time.sleep(0.05)
+        polled = len(self.cursors)
+        with hub.subscribe('other-worker') as subscription:
+            self.assertTrue(subscription.wait(5))
+        self.assertIsNone(self.cursors[polled])
+
+
+class PollNewOffersTests(TestCase):
+    def test_new_offers_by_provider(self):
+        first, second = make_provider(), make_provider()
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.create_request(make_customer(), 'plumber', 'lucknow', 'Leaking tap')
+        # Starting up: the last minute is reported again
+        cursor, channels = booking._poll_new_offers(None)
+        self.assertEqual(sorted(channels), sorted([first.pk, second.pk]))
+        self.assertEqual(booking._poll_new_offers(cursor), (cursor, []))
+
+
+class InboxWsgiTests(TestCase):
+    """Under WSGI the inbox answers at once and the client polls"""
+
+    def setUp(self):
+        self.provider = make_provider()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.request = booking.create_request(make_customer(), 'plumber', 'lucknow', 'Leaking tap')
+        self.offer = ServiceOffer.objects.get(provider=self.provider)
+        self.client.force_login(self.provider.user)
+
+    def test_long_poll_answers_at_once(self):
+        body = self.client.get('/provider/inbox/').json()
+        self.assertEqual([offer['id'] for offer in body['offers']], [self.offer.pk])
+        self.assertEqual((body['cursor'], body['retry_ms']), (self.offer.pk, views.INBOX_WSGI_RETRY_MS))
+        body = self.client.get(f'/provider/inbox/?cursor={self.offer.pk}').json()
+        self.assertEqual((body['offers'], body['cursor']), ([], self.offer.pk))
+
+    def test_stream_sends_one_batch(self):
+        response = self.client.get('/provider/inbox/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        text = response.content.decode()
+        self.assertTrue(text.startswith(f'retry: {views.INBOX_WSGI_RETRY_MS}\n\n'))
+        self.assertIn(f'id: {self.offer.pk}\nevent: offer\ndata: {{"id": {self.offer.pk}, ', text)
+        self.assertTrue(text.endswith('}\n\n'))
+        # EventSource resumes from the last id it saw
+        response = self.client.get('/provider/inbox/stream/', HTTP_LAST_EVENT_ID=str(self.offer.pk))
+        self.assertEqual(response.content.decode(), f'retry: {views.INBOX_WSGI_RETRY_MS}\n\n')
+
+    def test_customers_are_refused(self):
+        self.client.force_login(make_customer().user)
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.client.get('/provider/inbox/').status_code, 403)
+
+
+class InboxAsgiTests(TransactionTestCase):
+    """Held-open requests; committed rows, since each read closes its connection"""
+
+    def setUp(self):
+        self.provider = make_provider()
+        self.customer = make_customer()
+        booking.create_request(self.customer, 'plumber', 'lucknow', 'Leaking tap')
+        self.offer = ServiceOffer.objects.get(provider=self.provider)
+
+    async def login(self):
+        await self.async_client.aforce_login(await sync_to_async(lambda: self.provider.user)())
+
+    async def test_stale_cursor_returns_at_once(self):
+        await self.login()
+        start = time.monotonic()
+        body = (await self.async_client.get('/provider/inbox/?cursor=0')).json()
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual([offer['id'] for offer in body['offers']], [self.offer.pk])
+        self.assertEqual((body['cursor'], body['retry_ms']), (self.offer.pk, views.INBOX_RETRY_MS))
+
+    async def test_waiting_long_poll_gets_the_new_offer(self):
+        await self.login()
+        poll = asyncio.create_task(self.async_client.get(f'/provider/inbox/?cursor={self.offer.pk}'))
+        while not booking.inbox_hub.subscriber_count():
+            await asyncio.sleep(0.01)
+        # Dispatched inline once the request commits, which publishes to the provider
+        service_request = await sync_to_async(booking.create_request)(
+            self.customer, 'plumber', 'lucknow', 'Blocked drain')
+        body = (await asyncio.wait_for(poll, 5)).json()
+        self.assertEqual([offer['request_id'] for offer in body['offers']], [service_request.pk])
+        self.assertGreater(body['cursor'], self.offer.pk)
+        self.assertEqual(booking.inbox_hub.subscriber_count(), 0)
+
+    async def test_long_poll_times_out_empty(self):
+        await self.login()
+        with mock.patch.object(views, 'INBOX_LONGPOLL_SECONDS', 0.05):
+            body = (await self.async_client.get(f'/provider/inbox/?cursor={self.offer.pk}')).json()
+        self.assertEqual((body['offers'], body['cursor']), ([], self.offer.pk))
+
+    async def test_event_stream(self):
+        await self.login()
+        # A stream past its deadline sends what is there and ends
+        with mock.patch.object(views, 'INBOX_STREAM_SECONDS', 0):
+            response = await self.async_client.get('/provider/inbox/stream/')
+            self.assertTrue(response.streaming)
+            events = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(events[0], f'retry: {views.INBOX_RETRY_MS}\n\n'.encode())
+        self.assertEqual(len(events), 2)
+        self.assertTrue(events[1].startswith(f'id: {self.offer.pk}\nevent: offer\ndata: '.encode()))
+
+    async def test_event_stream_keepalive(self):
+        await self.login()
+        with mock.patch.object(views, 'INBOX_STREAM_SECONDS', 0.1), \
+                mock.patch.object(views, 'INBOX_KEEPALIVE_SECONDS', 0.02):
+            response = await self.async_client.get(f'/provider/inbox/stream/?cursor={self.offer.pk}')
+            events = [chunk async for chunk in response.streaming_content]
+        self.assertIn(b': keepalive\n\n', events)
+        self.assertFalse(any(event.startswith(b'id: ') for event in events))
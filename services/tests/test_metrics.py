@@ -0,0 +1,119 @@
+import re
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from services import metrics
+from services.middleware import MetricsMiddleware
+from services.models import ServiceProvider
+
+from .base import make_customer, make_user
+
+TOKEN = 'scrape-token'
+
+
+def run_queries(count):
+    for pk in range(count):
+        ServiceProvider.objects.filter(pk=pk).exists()
+
+
+def sample(text, name, **labels):
+    """Value of one sample line of the exposition text"""
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf'^{re.escape(name)}{{{re.escape(label_text)}}} (\S+)$', text, re.MULTILINE)
+    assert match, f'{name}{{{label_text}}} not in output'
+    return float(match.group(1))
+
+
+class RegistryMixin:
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN=TOKEN)
+class MetricsViewTests(RegistryMixin, TestCase):
+    def assertRefused(self, status, **headers):
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.client.get('/metrics', **headers).status_code, status)
+
+    def test_token(self):
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION=f'Bearer {TOKEN}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+
+    def test_wrong_token(self):
+        self.assertRefused(403, HTTP_AUTHORIZATION='Bearer guess')
+
+    @override_settings(METRICS_TOKEN='')
+    def test_empty_token_never_matches(self):
+        self.assertRefused(403, HTTP_AUTHORIZATION='Bearer ')
+
+    def test_staff(self):
+        staff = make_user('customer', 'Staff')
+        staff.is_staff = True
+        staff.save()
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_anonymous_and_other_users(self):
+        self.assertRefused(403)
+        self.client.force_login(make_customer().user)
+        self.assertRefused(403)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        self.assertRefused(404, HTTP_AUTHORIZATION=f'Bearer {TOKEN}')
+
+    def test_histogram_output(self):
+        for _ in range(2):
+            self.client.get('/')
+        text = self.client.get('/metrics', HTTP_AUTHORIZATION=f'Bearer {TOKEN}').content.decode()
+        self.assertEqual(sample(text, 'servicehub_requests_total', view='home', method='GET', status='200'), 2)
+        self.assertIn('# TYPE servicehub_request_duration_seconds histogram', text)
+        buckets = [sample(text, 'servicehub_request_duration_seconds_bucket', view='home', le=bound)
+                   for bound in metrics.LATENCY_BUCKETS + ('+Inf',)]
+        # Cumulative, ending at the request count
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], 2)
+        self.assertEqual(sample(text, 'servicehub_request_duration_seconds_count', view='home'), 2)
+        self.assertGreater(sample(text, 'servicehub_response_size_bytes_sum', view='home'), 0)
+
+
+@override_settings(METRICS_ENABLED=True)
+class MetricsMiddlewareTests(RegistryMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.request = RequestFactory().get('/')
+
+    def recorded(self, name):
+        return metrics.registry._histograms[(name, (('view', 'unmatched'),))]
+
+    def test_sync(self):
+        def view(request):
+            run_queries(3)
+            return HttpResponse('hello')
+        middleware = MetricsMiddleware(view)
+        self.assertFalse(iscoroutinefunction(middleware))
+        middleware(self.request)
+        self.assertEqual(self.recorded('servicehub_db_queries').total, 3)
+        self.assertEqual(self.recorded('servicehub_response_size_bytes').total, 5)
+
+    async def test_async(self):
+        async def view(request):
+            await sync_to_async(run_queries)(3)
+            return HttpResponse('hello')
+        middleware = MetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        await middleware(self.request)
+        self.assertEqual(self.recorded('servicehub_db_queries').total, 3)
+        self.assertEqual(self.recorded('servicehub_request_duration_seconds').count, 1)
+        # The hook is gone once the request is done
+        self.assertEqual(await sync_to_async(lambda: list(connection.execute_wrappers))(), [])
+
+    async def test_async_client(self):
+        await self.async_client.get('/health/')
+        self.assertEqual(metrics.registry._requests, {('services.views.health', 'GET', '200'): 1})
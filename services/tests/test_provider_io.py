@@ -0,0 +1,34 @@
+from django.test import TestCase
+
+from services import provider_io
+from services.models import ServiceProvider
+
+
+def row(phone, aadhar, **fields):
+    return {
+        'phone_number': phone, 'name': 'Imported Provider', 'password': 'pass12345', 'address': '3 Import Street',
+        'district': 'lucknow', 'aadhar_number': aadhar, 'date_of_birth': '1990-01-01', 'service1': 'plumber',
+        **fields,
+    }
+
+
+class ImportLocationTests(TestCase):
+    def import_rows(self, *rows):
+        problems = []
+        stats = provider_io.import_providers(
+            enumerate(rows, start=2), workers=1, report=lambda line_num, message: problems.append((line_num, message)),
+        )
+        return stats, problems
+
+    def test_location_needs_both_coordinates(self):
+        stats, problems = self.import_rows(
+            row('7000000001', '100000000001', latitude='26.85'),
+            row('7000000002', '100000000002', longitude='80.95'),
+            row('7000000003', '100000000003', latitude='26.85', longitude='80.95'),
+            row('7000000004', '100000000004'),
+        )
+        self.assertEqual(stats['imported'], 2)
+        self.assertEqual([line_num for line_num, _ in problems], [2, 3])
+        self.assertIn('Enter both latitude and longitude', problems[0][1])
+        exact = ServiceProvider.objects.get(user__phone_number='7000000003')
+        self.assertEqual((exact.latitude, exact.longitude), (26.85, 80.95))
@@ -0,0 +1,110 @@
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from services import booking
+from services.models import ProviderWorkPhoto, Review, ServiceOffer, ServiceProvider, ServiceRequest
+from services.querywatch import NPlusOneError, QueryWatchMiddleware
+
+from .base import CustomerClientTestCase, make_customer, make_provider
+
+ALWAYS_OPEN = [['00:00', '23:59']] * 7
+
+
+def run_queries(count):
+    for pk in range(count):
+        ServiceProvider.objects.filter(pk=pk).exists()
+
+
+class QueryWatchMiddlewareTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+
+    def test_sync_repeats_raise(self):
+        def view(request):
+            run_queries(5)
+            return HttpResponse()
+        middleware = QueryWatchMiddleware(view)
+        self.assertFalse(iscoroutinefunction(middleware))
+        with self.assertRaises(NPlusOneError), self.assertLogs('services.querywatch', 'WARNING'):
+            middleware(self.request)
+
+    async def test_async_repeats_raise(self):
+        async def view(request):
+            await sync_to_async(run_queries)(5)
+            return HttpResponse()
+        middleware = QueryWatchMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with self.assertRaises(NPlusOneError), self.assertLogs('services.querywatch', 'WARNING'):
+            await middleware(self.request)
+
+    async def test_async_below_threshold_passes(self):
+        async def view(request):
+            await sync_to_async(run_queries)(4)
+            return HttpResponse()
+        response = await QueryWatchMiddleware(view)(self.request)
+        self.assertEqual(response.status_code, 200)
+
+
+class StrictListingTests(CustomerClientTestCase):
+    """Every listing variant over a few populated cards; strict mode turns an N+1 into a failure"""
+
+    @classmethod
+    def setUpTestData(cls):
+        customers = [make_customer() for _ in range(3)]
+        for code in ('lucknow', 'lucknow', 'lucknow', 'barabanki', 'unnao', 'sitapur', 'kanpur_nagar'):
+            provider = make_provider(code, service2='electrician', working_hours=ALWAYS_OPEN)
+            for customer in customers:
+                Review.objects.create(customer=customer, provider=provider, rating=4, comment='Good work')
+            for title in ('Before', 'After'):
+                ProviderWorkPhoto.objects.create(provider=provider, photo='work_photos/job.jpg', title=title)
+
+    def test_html_listing(self):
+        for sort in ('rating', 'reviews', 'name', 'newest', 'distance'):
+            for within in ('', '10', '50', 'nearest'):
+                for extra in ('', '&available=1', '&search=Test&rating=3', '&page=2'):
+                    url = f'/service/plumber/providers/?sort={sort}&within={within}{extra}'
+                    with self.subTest(url=url):
+                        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_json_listing(self):
+        for sort in ('rating', 'reviews', 'name', 'newest'):
+            for extra in ('', '&available=1', '&search=Test&rating=3', '&offset=2&limit=3'):
+                url = f'/api/service/plumber/providers/?sort={sort}{extra}'
+                with self.subTest(url=url):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class StrictBookingTests(CustomerClientTestCase):
+    """Booking pages with several requests, offers and jobs on them"""
+
+    def setUp(self):
+        super().setUp()
+        self.providers = [make_provider(working_hours=ALWAYS_OPEN) for _ in range(3)]
+        # Offers go out once the request commits
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(4):
+                booking.create_request(self.customer, 'plumber', 'lucknow', 'Leaking tap')
+        self.provider = self.providers[0]
+        self.offers = list(ServiceOffer.objects.filter(provider=self.provider).order_by('pk'))
+        booking.accept_offer(self.offers[0].pk, self.provider)
+        booking.accept_offer(self.offers[1].pk, self.provider)
+
+    def test_customer_pages(self):
+        self.assertEqual(self.client.get('/service/plumber/request/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/service/plumber/request/', {'description': 'Fix the sink'})
+        self.assertRedirects(response, '/requests/')
+        self.assertEqual(self.client.get('/requests/').status_code, 200)
+
+    def test_provider_pages(self):
+        self.client.force_login(self.provider.user)
+        self.assertEqual(self.client.get('/provider/offers/').status_code, 200)
+        response = self.client.get('/provider/inbox/')
+        self.assertEqual(len(response.json()['offers']), 2)
+        self.assertEqual(self.client.get('/provider/inbox/stream/').status_code, 200)
+        response = self.client.post(f'/provider/offers/{self.offers[2].pk}/accept/')
+        self.assertRedirects(response, '/provider/offers/', fetch_redirect_response=False)
+        job = ServiceRequest.objects.filter(provider=self.provider, status='accepted').first()
+        response = self.client.post(f'/provider/jobs/{job.pk}/complete/')
+        self.assertRedirects(response, '/provider/offers/', fetch_redirect_response=False)
@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from services import ranking
+from services.models import ProviderLeaderboardEntry, Review
+from services.views import PROVIDERS_PAGE_SIZE, REVIEWS_PER_PROVIDER
+
+from .base import CustomerClientTestCase, make_customer, make_provider
+
+
+def leaderboard(district='lucknow', service='plumber'):
+    return list(
+        ProviderLeaderboardEntry.objects.filter(district=district, service=service)
+        .order_by('position').values_list('provider_id', flat=True)
+    )
+
+
+@mock.patch('services.ranking.LEADERBOARD_SIZE', 5)
+class ReadLeaderboardTests(TestCase):
+    def setUp(self):
+        # Seven providers, best last; the leaderboard keeps the top five
+        self.providers = [make_provider(ranking_score=float(score)) for score in range(7)]
+        self.best_first = [p.pk for p in reversed(self.providers)]
+
+    def test_page_within_full_leaderboard(self):
+        page = ranking.read_leaderboard('lucknow', 'plumber', 2, 3)
+        self.assertEqual([p.pk for p in page], self.best_first[2:5])
+
+    def test_page_past_full_leaderboard_falls_back(self):
+        self.assertIsNone(ranking.read_leaderboard('lucknow', 'plumber', 3, 3))
+        self.assertIsNone(ranking.read_leaderboard('lucknow', 'plumber', 5, 3))
+
+    def test_short_leaderboard_serves_any_page(self):
+        short = [make_provider('kanpur_nagar', ranking_score=float(score)) for score in range(3)]
+        page = ranking.read_leaderboard('kanpur_nagar', 'plumber', 2, 10)
+        self.assertEqual([p.pk for p in page], [short[0].pk])
+
+
+class LeaderboardUpkeepTests(TestCase):
+    def setUp(self):
+        self.first, self.second = make_provider(), make_provider()
+        self.customer = make_customer()
+
+    def test_review_moves_provider_up_and_back_on_delete(self):
+        review = Review.objects.create(customer=self.customer, provider=self.second, rating=5)
+        self.assertEqual(leaderboard(), [self.second.pk, self.first.pk])
+        review.delete()
+        self.assertEqual(leaderboard(), [self.first.pk, self.second.pk])
+        entry = ProviderLeaderboardEntry.objects.get(provider=self.second)
+        self.assertEqual(entry.score, ranking.PRIOR_MEAN)
+
+    @mock.patch('services.ranking.LEADERBOARD_SIZE', 2)
+    def test_deleted_provider_frees_its_slot(self):
+        third = make_provider()
+        ranking.refresh_leaderboard('lucknow', 'plumber')
+        self.assertEqual(leaderboard(), [self.first.pk, self.second.pk])
+        # Cascades from the user row, so only the post_delete signal sees it
+        self.first.user.delete()
+        self.assertEqual(leaderboard(), [self.second.pk, third.pk])
+
+
+class ListingPaginationTests(CustomerClientTestCase):
+    def setUp(self):
+        super().setUp()
+        self.providers = [make_provider(ranking_score=float(score)) for score in range(PROVIDERS_PAGE_SIZE + 2)]
+        self.best_first = [p.pk for p in reversed(self.providers)]
+
+    def get_page(self, page):
+        response = self.client.get(f'/service/plumber/providers/?page={page}')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_pages_follow_the_leaderboard(self):
+        first = self.get_page(1)
+        self.assertEqual([p.pk for p in first.context['providers']], self.best_first[:PROVIDERS_PAGE_SIZE])
+        self.assertTrue(first.context['has_next'])
+        second = self.get_page(2)
+        self.assertEqual([p.pk for p in second.context['providers']], self.best_first[PROVIDERS_PAGE_SIZE:])
+        self.assertFalse(second.context['has_next'])
+
+    def test_page_past_full_leaderboard_reads_ranking_scores(self):
+        with mock.patch('services.ranking.LEADERBOARD_SIZE', 5):
+            ranking.refresh_leaderboard('lucknow', 'plumber')
+            response = self.get_page(1)
+        self.assertEqual([p.pk for p in response.context['providers']], self.best_first[:PROVIDERS_PAGE_SIZE])
+
+    def test_cards_carry_only_the_latest_reviews(self):
+        provider = self.providers[-1]
+        for _ in range(REVIEWS_PER_PROVIDER + 2):
+            Review.objects.create(customer=make_customer(), provider=provider, rating=4)
+        card = next(p for p in self.get_page(1).context['providers'] if p.pk == provider.pk)
+        self.assertEqual(len(card.latest_reviews), REVIEWS_PER_PROVIDER)
+        self.assertContains(self.get_page(1), f'View All ({REVIEWS_PER_PROVIDER + 2})')
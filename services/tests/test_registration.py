@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from services.forms import CustomerRegistrationForm, ProviderRegistrationForm
+from services.models import Customer, ServiceProvider, User
+
+from .base import make_provider
+
+
+def customer_data(**fields):
+    return {'phone_number': '9100000001', 'name': 'New Customer', 'district': 'lucknow',
+            'password': 'pass12345', 'confirm_password': 'pass12345', 'address': '4 New Street', **fields}
+
+
+def provider_data(**fields):
+    return {'phone_number': '8100000001', 'name': 'New Provider', 'district': 'kanpur_nagar',
+            'password': 'pass12345', 'confirm_password': 'pass12345', 'address': '5 New Street',
+            'aadhar_number': '123456789012', 'date_of_birth': '1990-01-01',
+            'service1': 'plumber', 'service2': 'electrician', 'service3': '', **fields}
+
+
+def register(form_class, data):
+    form = form_class(data=data)
+    assert form.is_valid(), form.errors
+    return form, form.register()
+
+
+class RegisterTests(TestCase):
+    def test_customer(self):
+        form, user = register(CustomerRegistrationForm, customer_data())
+        self.assertEqual(user.user_type, 'customer')
+        self.assertTrue(user.check_password('pass12345'))
+        customer = Customer.objects.get(user=user)
+        self.assertEqual((customer.district, customer.address), ('lucknow', '4 New Street'))
+
+    def test_provider(self):
+        form, user = register(ProviderRegistrationForm, provider_data())
+        provider = ServiceProvider.objects.get(user=user)
+        self.assertEqual((provider.district, provider.aadhar_number), ('kanpur_nagar', '123456789012'))
+        self.assertEqual(provider.get_services(), ['Plumber', 'Electrician'])
+        self.assertFalse(provider.is_verified)
+
+
+class RegisterConflictTests(TestCase):
+    def setUp(self):
+        self.existing = make_provider()
+        self.users = User.objects.count()
+
+    def test_taken_phone_number(self):
+        form, user = register(CustomerRegistrationForm, customer_data(phone_number=self.existing.user.phone_number))
+        self.assertIsNone(user)
+        self.assertEqual(form.errors['phone_number'], ['This phone number is already registered'])
+        # The existing user wasn't overwritten
+        self.assertEqual(User.objects.get(pk=self.existing.user.pk).name, 'Test Provider')
+
+    def test_taken_aadhar_rolls_back_the_user(self):
+        form, user = register(ProviderRegistrationForm, provider_data(aadhar_number=self.existing.aadhar_number))
+        self.assertIsNone(user)
+        self.assertEqual(form.errors['aadhar_number'], ['This Aadhar number is already registered'])
+        self.assertEqual(User.objects.count(), self.users)
+
+    def test_both_taken(self):
+        form, user = register(ProviderRegistrationForm, provider_data(
+            phone_number=self.existing.user.phone_number, aadhar_number=self.existing.aadhar_number,
+        ))
+        self.assertIsNone(user)
+        self.assertEqual(set(form.errors), {'phone_number', 'aadhar_number'})
+
+    def test_conflict_gone_again(self):
+        form = ProviderRegistrationForm(data=provider_data(aadhar_number=self.existing.aadhar_number))
+        self.assertTrue(form.is_valid())
+        # The clashing row was deleted between the INSERT and the lookup
+        with mock.patch.object(ProviderRegistrationForm, 'conflicts', return_value=[]):
+            self.assertIsNone(form.register())
+        self.assertEqual(form.non_field_errors(), ['Registration failed, please try again.'])
+        self.assertEqual(User.objects.count(), self.users)
+
+
+class RegisterViewTests(TestCase):
+    def test_taken_phone_number_shows_the_form_again(self):
+        existing = make_provider()
+        response = self.client.post('/register/customer/', customer_data(phone_number=existing.user.phone_number))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'This phone number is already registered')
+        self.assertFalse(Customer.objects.exists())
@@ -0,0 +1,82 @@
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from services import retention
+from services.models import OTPVerification, ServiceRequest
+
+from .base import make_customer
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(retention, 'ARCHIVE_DIR', Path(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.customer = make_customer()
+
+    def make_request(self, status, age_days, description='Leaking tap'):
+        service_request = ServiceRequest.objects.create(
+            customer=self.customer, service_type='plumber', district='lucknow', description=description, status=status,
+        )
+        # created_at is auto_now_add, so age the row afterwards
+        ServiceRequest.objects.filter(pk=service_request.pk).update(
+            created_at=timezone.now() - timedelta(days=age_days),
+        )
+        return service_request
+
+    def archived(self):
+        rows = []
+        for path in sorted(retention.ARCHIVE_DIR.glob('requests-*.jsonl.gz')):
+            with gzip.open(path, 'rt', encoding='utf-8') as fh:
+                rows.extend(json.loads(line) for line in fh)
+        return rows
+
+    def test_old_requests_are_archived_then_deleted(self):
+        old = [self.make_request('completed', 400, f'Job {n}') for n in range(5)]
+        kept = [
+            self.make_request('completed', 30),   # too recent
+            self.make_request('pending', 400),    # still open
+        ]
+        chunks = []
+        removed = retention.apply_retention(
+            ['requests'], chunk_size=2, pause=0, progress=lambda policy, done, total: chunks.append((done, total)),
+        )
+        self.assertEqual(removed, {'requests': 5})
+        self.assertEqual(chunks, [(2, 5), (4, 5), (5, 5)])
+        self.assertEqual(set(ServiceRequest.objects.values_list('pk', flat=True)), {r.pk for r in kept})
+        archived = self.archived()
+        self.assertEqual([row['id'] for row in archived], [r.pk for r in old])
+        self.assertEqual([row['description'] for row in archived], [f'Job {n}' for n in range(5)])
+
+    def test_later_runs_append_to_the_archive(self):
+        first = self.make_request('cancelled', 400)
+        retention.apply_retention(['requests'], pause=0)
+        second = self.make_request('completed', 400)
+        retention.apply_retention(['requests'], pause=0)
+        self.assertEqual([row['id'] for row in self.archived()], [first.pk, second.pk])
+
+    def test_dry_run_only_counts(self):
+        self.make_request('completed', 400)
+        self.assertEqual(retention.apply_retention(['requests'], dry_run=True), {'requests': 1})
+        self.assertEqual(ServiceRequest.objects.count(), 1)
+        self.assertEqual(self.archived(), [])
+
+    def test_expired_otps_are_deleted(self):
+        old = OTPVerification.objects.create(phone_number='9000000001', otp='123456')
+        OTPVerification.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=2))
+        fresh = OTPVerification.objects.create(phone_number='9000000002', otp='654321')
+        self.assertEqual(retention.apply_retention(['otps'], pause=0), {'otps': 1})
+        self.assertEqual(list(OTPVerification.objects.values_list('pk', flat=True)), [fresh.pk])
+
+    def test_unknown_policy(self):
+        with self.assertRaises(KeyError):
+            retention.get_policies(['reviews'])
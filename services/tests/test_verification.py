@@ -0,0 +1,130 @@
+from unittest import mock
+
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.test import TestCase
+
+from services import counters, geo, verification
+from services.models import BackgroundJob, ServiceProvider
+
+from .base import make_provider, make_user
+
+CHANGELIST = '/admin/services/serviceprovider/'
+
+
+def valid_aadhar(prefix):
+    """prefix (11 digits) plus its Verhoeff check digit"""
+    return next(prefix + digit for digit in '0123456789' if not verification.aadhar_problems(prefix + digit))
+
+
+def wrong_check_digit(aadhar):
+    return aadhar[:-1] + str((int(aadhar[-1]) + 1) % 10)
+
+
+def counts(district='lucknow'):
+    return {service: count for service, count in counters.counts_for_district(district).items() if count}
+
+
+class AdminTestCase(TestCase):
+    def setUp(self):
+        admin = make_user('customer', 'Admin')
+        admin.is_staff = admin.is_superuser = True
+        admin.save()
+        self.client.force_login(admin)
+
+    def run_action(self, action, providers, query='', select_across=False, **data):
+        # With "select all" the browser still sends the ticked rows of the page shown
+        return self.client.post(CHANGELIST + query, {
+            'action': action, 'index': 0, 'select_across': int(select_across),
+            ACTION_CHECKBOX_NAME: [provider.pk for provider in providers], **data,
+        }, follow=True)
+
+    def verified(self, provider):
+        return ServiceProvider.objects.get(pk=provider.pk).is_verified
+
+
+class BulkActionTests(AdminTestCase):
+    def test_verify_and_unverify(self):
+        first, second = make_provider(verified=False), make_provider(verified=False)
+        self.run_action('verify_selected', [first, second])
+        self.assertTrue(self.verified(first) and self.verified(second))
+        self.assertEqual(counts(), {'plumber': 2})
+        self.run_action('unverify_selected', [first])
+        self.assertEqual((self.verified(first), self.verified(second)), (False, True))
+        self.assertEqual(counts(), {'plumber': 1})
+
+    def test_verify_all_matching_a_filter(self):
+        plumber = make_provider(verified=False)
+        carpenter = make_provider(service='carpenter', verified=False)
+        self.run_action('verify_selected', [plumber], query='?service1__exact=plumber', select_across=True)
+        self.assertEqual((self.verified(plumber), self.verified(carpenter)), (True, False))
+
+    def test_reassign_district(self):
+        located = make_provider(latitude=26.85, longitude=80.95)
+        unlocated = make_provider()
+        self.run_action('reassign_district', [located, unlocated], district='kanpur_nagar')
+        rows = dict(ServiceProvider.objects.values_list('pk', 'geo_cell'))
+        self.assertEqual(rows[located.pk], located.geo_cell)
+        self.assertEqual(rows[unlocated.pk], geo.geohash_encode(*geo.district_centroid('kanpur_nagar')))
+        self.assertEqual(counts(), {})
+        self.assertEqual(counts('kanpur_nagar'), {'plumber': 2})
+
+    def test_reassign_needs_a_district(self):
+        provider = make_provider()
+        response = self.run_action('reassign_district', [provider], district='')
+        self.assertContains(response, 'Choose a district next to the action first.')
+        self.assertEqual(ServiceProvider.objects.get(pk=provider.pk).district, 'lucknow')
+
+
+class VerificationCheckTests(AdminTestCase):
+    def setUp(self):
+        super().setUp()
+        self.good = make_provider(verified=False, name='Test Good', aadhar_number=valid_aadhar('23456789012'))
+        self.bad_checksum = make_provider(verified=False, name='Test Bad',
+                                          aadhar_number=wrong_check_digit(valid_aadhar('34567890123')))
+        self.same_person = [
+            make_provider(verified=False, name='Ram Kumar', aadhar_number=valid_aadhar(prefix))
+            for prefix in ('45678901234', '56789012345')
+        ]
+        self.carpenter = make_provider(service='carpenter', verified=False, aadhar_number='012345678901')
+
+    def test_aadhar_problems(self):
+        self.assertEqual(verification.aadhar_problems(self.good.aadhar_number), [])
+        self.assertEqual(verification.aadhar_problems(self.bad_checksum.aadhar_number),
+                         ['Aadhar checksum digit is wrong'])
+        self.assertIn('Aadhar numbers never start with 0 or 1', verification.aadhar_problems('123456789012'))
+        self.assertTrue(verification.aadhar_problems('12345'))
+
+    @staticmethod
+    def flagged(result):
+        return {row['provider_id'] for row in result['flagged']}
+
+    def test_selected_providers(self):
+        self.run_action('check_and_verify_selected', [self.good, *self.same_person])
+        job = BackgroundJob.objects.get()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual((job.processed, job.total), (3, 3))
+        self.assertEqual(self.flagged(job.result), {p.pk for p in self.same_person})
+        self.assertEqual((job.result['checked'], job.result['passed'], job.result['verified']), (3, 1, 1))
+        self.assertTrue(self.verified(self.good))
+        self.assertFalse(self.verified(self.same_person[0]))
+
+    def test_select_all_keeps_the_filter_not_the_ids(self):
+        response = self.run_action('check_selected', [self.good], query='?service1__exact=plumber&q=Test',
+                                   select_across=True)
+        job = BackgroundJob.objects.get()
+        self.assertRedirects(response, f'/admin/services/backgroundjob/{job.pk}/progress/')
+        self.assertEqual(job.params, {'changelist_filters': 'service1__exact=plumber&q=Test', 'verify_passing': False})
+        # Ram Kumar doesn't match the search; the carpenter isn't a plumber
+        self.assertEqual(job.result['checked'], 2)
+        self.assertEqual(self.flagged(job.result), {self.bad_checksum.pk})
+        self.assertFalse(self.verified(self.good))
+
+    @mock.patch.object(verification, 'CHECK_CHUNK_SIZE', 2)
+    def test_checked_in_chunks(self):
+        job = BackgroundJob.objects.create(name='verification_checks', params={})
+        plumbers = [self.good, self.bad_checksum, *self.same_person]
+        # Count and progress, then rows, possible duplicates and progress per chunk, then the empty read
+        with self.assertNumQueries(2 + 3 * 2 + 1):
+            result = verification.run_verification_checks(job, provider_ids=[p.pk for p in plumbers])
+        self.assertEqual(result['checked'], 4)
+        self.assertEqual(self.flagged(result), {self.bad_checksum.pk, *(p.pk for p in self.same_person)})
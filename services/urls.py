@@ -1,12 +1,13 @@
 # services/urls.py
 from django.urls import path
 from django.contrib import admin
-from .views import health
+from .views import health, metrics_view
 from . import views
 
 urlpatterns = [
     # Home and login/register choices
     path("health/", health),
+    path("metrics", metrics_view),
     path('', views.home, name='home'),
     path('login-choice/', views.login_choice, name='login_choice'),
     path('register-choice/', views.register_choice, name='register_choice'),
@@ -33,10 +34,23 @@ urlpatterns = [
     
     # Service providers list
     path('service/<str:service_code>/providers/', views.service_providers_list, name='service_providers_list'),
+    path('api/service/<str:service_code>/providers/', views.service_providers_json, name='service_providers_json'),
     
     # Reviews
     path('review/add/<str:provider_phone>/', views.add_review, name='add_review'),
     
+    # Bookings
+    path('service/<str:service_code>/request/', views.request_service, name='request_service'),
+    path('requests/', views.my_requests, name='my_requests'),
+    path('requests/<int:request_id>/cancel/', views.cancel_request, name='cancel_request'),
+    path('provider/offers/', views.provider_offers, name='provider_offers'),
+    path('provider/hours/', views.edit_working_hours, name='edit_working_hours'),
+    path('provider/inbox/', views.provider_inbox, name='provider_inbox'),
+    path('provider/inbox/stream/', views.provider_inbox_stream, name='provider_inbox_stream'),
+    path('provider/offers/<int:offer_id>/accept/', views.accept_offer, name='accept_offer'),
+    path('provider/offers/<int:offer_id>/decline/', views.decline_offer, name='decline_offer'),
+    path('provider/jobs/<int:request_id>/complete/', views.complete_request, name='complete_request'),
+
     # Profile management
     path('profile/', views.profile_view, name='profile_view'),
     path('profile/edit/', views.edit_profile, name='edit_profile'),
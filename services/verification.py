@@ -0,0 +1,150 @@
+# verification.py - Bulk provider verification and pre-verification checks
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from . import counters, geo, jobs, ranking
+from .forms import validate_aadhar_number
+from .models import ServiceProvider
+
+CHECK_CHUNK_SIZE = 500
+# Flagged providers kept in a job result; the count is always exact
+MAX_REPORTED = 1000
+
+def _bulk_update(queryset, **changes):
+    """
+    One UPDATE for the selected providers, then the home-page counters and
+    leaderboards of every district they were or now are in, recomputed in
+    a fixed number of queries. queryset.update() skips save() and auto_now,
+    so updated_at (part of page ETags) is set here.
+    """
+    with transaction.atomic():
+        # Districts the selection was on, before the update
+        districts = set(queryset.values_list('district', flat=True).distinct())
+        if 'district' in changes:
+            districts.add(changes['district'])
+        updated = queryset.update(updated_at=timezone.now(), **changes)
+        if updated:
+            counters.rebuild_counts(districts=districts)
+    if updated:
+        ranking.refresh_district_leaderboards(districts)
+    return updated
+
+
+def set_verified(queryset, verified):
+    return _bulk_update(queryset.exclude(is_verified=verified), is_verified=verified)
+
+
+def reassign_district(queryset, district):
+    centroid = geo.district_centroid(district)
+    cell = geo.geohash_encode(*centroid) if centroid else ''
+    return _bulk_update(
+        queryset.exclude(district=district),
+        district=district,
+        # Providers with an exact location keep their cell; the rest follow the district centroid
+        geo_cell=Case(
+            When(latitude__isnull=False, longitude__isnull=False, then=F('geo_cell')),
+            default=Value(cell),
+        ),
+    )
+
+
+_VERHOEFF_D = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 2, 3, 4, 0, 6, 7, 8, 9, 5], [2, 3, 4, 0, 1, 7, 8, 9, 5, 6],
+    [3, 4, 0, 1, 2, 8, 9, 5, 6, 7], [4, 0, 1, 2, 3, 9, 5, 6, 7, 8], [5, 9, 8, 7, 6, 0, 4, 3, 2, 1],
+    [6, 5, 9, 8, 7, 1, 0, 4, 3, 2], [7, 6, 5, 9, 8, 2, 1, 0, 4, 3], [8, 7, 6, 5, 9, 3, 2, 1, 0, 4],
+    [9, 8, 7, 6, 5, 4, 3, 2, 1, 0],
+]
+_VERHOEFF_P = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 5, 7, 6, 2, 8, 3, 0, 9, 4], [5, 8, 0, 3, 7, 9, 6, 1, 4, 2],
+    [8, 9, 1, 6, 0, 4, 3, 5, 2, 7], [9, 4, 5, 3, 1, 2, 6, 8, 7, 0], [4, 2, 8, 6, 5, 7, 3, 9, 0, 1],
+    [2, 7, 9, 3, 8, 0, 6, 4, 1, 5], [7, 0, 4, 6, 9, 1, 3, 2, 5, 8],
+]
+
+
+def aadhar_problems(aadhar):
+    """Reasons an Aadhar number cannot be genuine (empty list if it looks fine)"""
+    try:
+        validate_aadhar_number(aadhar)
+    except ValidationError as e:
+        return e.messages
+    problems = []
+    if aadhar[0] in '01':
+        problems.append('Aadhar numbers never start with 0 or 1')
+    check = 0
+    for i, digit in enumerate(reversed(aadhar)):
+        check = _VERHOEFF_D[check][_VERHOEFF_P[i % 8][int(digit)]]
+    if check:
+        problems.append('Aadhar checksum digit is wrong')
+    return problems
+
+
+@jobs.register('verification_checks')
+def run_verification_checks(job, provider_ids=None, changelist_filters=None, verify_passing=False):
+    """
+    Aadhar format/checksum and duplicate-identity checks for the given
+    providers, or for every provider the admin changelist shows with
+    changelist_filters, chunk by chunk with progress. The unique constraint
+    already rules out two providers sharing one Aadhar number, so
+    "duplicate" means another provider with the same name and date of
+    birth. With verify_passing, providers without problems are verified at
+    the end.
+    """
+    if provider_ids is not None:
+        queryset = ServiceProvider.objects.filter(pk__in=provider_ids)
+    else:
+        # Imported here: the admin module imports this one
+        from .admin import changelist_queryset
+        queryset = changelist_queryset(ServiceProvider, job.created_by, changelist_filters)
+    queryset = queryset.order_by('pk')
+    total = queryset.count()
+    jobs.set_progress(job, 0, total)
+    checked = 0
+    flagged_count = 0
+    flagged = []
+    passing = []
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk).values_list(
+            'pk', 'user_id', 'user__name', 'date_of_birth', 'aadhar_number',
+        )[:CHECK_CHUNK_SIZE])
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        # One query per chunk for possible duplicates of anyone in it
+        identities = defaultdict(list)
+        for pk, phone, name, dob in ServiceProvider.objects.filter(
+            user__name__in={row[2] for row in rows},
+            date_of_birth__in={row[3] for row in rows},
+        ).values_list('pk', 'user_id', 'user__name', 'date_of_birth'):
+            identities[(name, dob)].append((pk, phone))
+
+        for pk, phone, name, dob, aadhar in rows:
+            problems = aadhar_problems(aadhar)
+            others = [other_phone for other_pk, other_phone in identities[(name, dob)] if other_pk != pk]
+            if others:
+                problems.append(f"Same name and date of birth as {', '.join(others)}")
+            if problems:
+                flagged_count += 1
+                if len(flagged) < MAX_REPORTED:
+                    flagged.append({'provider_id': pk, 'phone_number': phone, 'name': name, 'problems': problems})
+            else:
+                passing.append(pk)
+        checked += len(rows)
+        # Rows added to the selection meanwhile may push this past the first count
+        jobs.set_progress(job, min(checked, total))
+
+    verified = 0
+    if verify_passing:
+        for start in range(0, len(passing), CHECK_CHUNK_SIZE):
+            verified += set_verified(ServiceProvider.objects.filter(pk__in=passing[start:start + CHECK_CHUNK_SIZE]), True)
+    return {
+        'checked': checked,
+        'passed': len(passing),
+        'flagged_count': flagged_count,
+        'flagged': flagged,
+        'verified': verified,
+    }
@@ -1,70 +1,66 @@
 # views.py - COMPLETE FILE WITH ALL FIXES
-from django.shortcuts import render, redirect, get_object_or_404
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth import login, logout, authenticate, update_session_auth_hash
 from django.contrib.auth.decorators import login_required
-import requests
+import hmac
+import logging
 from django.conf import settings
 from django.contrib import messages
-from django.db.models import Q
-from django.http import JsonResponse
+from django.db import connection
+from django.db.models import Q, Count, Max, Sum, Prefetch, prefetch_related_objects
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, Http404, StreamingHttpResponse
 from django.core.exceptions import ObjectDoesNotExist
-from .models import User, ServiceProvider, Customer, Review, DISTRICT_CHOICES, OTPVerification, ProviderWorkPhoto
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+from .models import (User, ServiceProvider, Customer, Review, OTPVerification, ProviderWorkPhoto,
+                     ServiceOffer, ServiceRequest)
+from . import availability, booking, counters, geo, metrics, ranking, sms
+from .reference import SERVICE_NAMES, SERVICES, district_name
+from .httpcache import conditional_page, public_page
+from .log import span
 from .forms import (ProviderRegistrationForm, CustomerRegistrationForm, LoginForm,
                    ProfileEditForm, ProviderProfileEditForm, CustomerProfileEditForm,
                    CustomPasswordChangeForm, ReviewForm, DistrictSelectionForm,
-                   ForgotPasswordStep1Form, ForgotPasswordStep2Form, ForgotPasswordStep3Form, WorkPhotoForm)
+                   ForgotPasswordStep1Form, ForgotPasswordStep2Form, ForgotPasswordStep3Form, WorkPhotoForm,
+                   ServiceRequestForm, WorkingHoursForm)
 
+# How many providers the "nearest" search returns
+NEAREST_PROVIDERS_LIMIT = 20
 
-# Simulated SMS sending (replace with actual SMS gateway in production)
-def send_otp_sms(phone_number, otp):
-    """
-    Send OTP via SMS
-    In production, integrate with SMS gateway
-    """
-    try:
-        # For development: Print to console
-        print(f"\n{'='*60}")
-        print(f"📱 SMS SENT TO: {phone_number}")
-        print(f"🔐 YOUR OTP IS: {otp}")
-        print(f"⏰ Valid for 10 minutes")
-        print(f"{'='*60}\n")
-        
-        # PRODUCTION: Uncomment this for real SMS via Fast2SMS
-        """
-        import requests
-        api_key = "YOUR_FAST2SMS_API_KEY"
-        url = "https://www.fast2sms.com/dev/bulkV2"
-        
-        payload = {
-            "route": "v3",
-            "sender_id": "TXTIND",
-            "message": f"Your ServiceHub password reset OTP is {otp}. Valid for 10 minutes. Do not share.",
-            "language": "english",
-            "flash": 0,
-            "numbers": phone_number,
-        }
-        
-        headers = {
-            "authorization": api_key,
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
-        
-        response = requests.post(url, data=payload, headers=headers)
-        return response.status_code == 200
-        """
-        
-        return True
-        
-    except Exception as e:
-        print(f"SMS Error: {e}")
-        return False
+# Page size of the HTML provider list, and the latest reviews each card carries
+PROVIDERS_PAGE_SIZE = 12
+REVIEWS_PER_PROVIDER = 10
 
+# Page size of the JSON provider list
+JSON_PAGE_SIZE = 20
+JSON_MAX_PAGE_SIZE = 100
 
+# Provider inbox: how long a long-poll / event stream is held open (ASGI
+# only), the keep-alive interval, and how long clients wait before asking
+# again after a stream ends
+INBOX_LONGPOLL_SECONDS = 25
+INBOX_STREAM_SECONDS = 300
+INBOX_KEEPALIVE_SECONDS = 15
+INBOX_RETRY_MS = 3000
+INBOX_WSGI_RETRY_MS = 15000
+
+logger = logging.getLogger(__name__)
+
+# Async views render through this: context processors may hit the DB (request.user)
+render_async = sync_to_async(render)
+
+
+@public_page
 def home(request):
     """Common home page before login"""
     return render(request, 'services/home.html')
 
 
+@public_page
 def login_choice(request):
     """Page to choose login type"""
     return render(request, 'services/login_choice.html')
@@ -105,7 +101,7 @@ def login_view(request, user_type):
                     messages.error(request, 'Invalid phone number or password. Please try again.')
             except Exception as e:
                 messages.error(request, 'An error occurred during login. Please try again.')
-                print(f"Login error: {e}")
+                logger.exception('Login failed')
         else:
             messages.error(request, 'Invalid phone number or password.')
     else:
@@ -117,8 +113,9 @@ def login_view(request, user_type):
     })
 
 
-def forgot_password_step1(request, user_type):
-    """Step 1: Enter phone (and DOB for provider), then send OTP"""
+async def forgot_password_step1(request, user_type):
+    """Step 1: Enter phone (and DOB for provider), then send OTP
+    Async so a slow SMS gateway doesn't tie up a worker under ASGI"""
     if request.method == 'POST':
         phone_number = request.POST.get('phone_number', '').strip()
         date_of_birth = request.POST.get('date_of_birth', '').strip() if user_type == 'provider' else None
@@ -126,79 +123,76 @@ def forgot_password_step1(request, user_type):
         # Basic validation
         if not phone_number:
             messages.error(request, 'Please enter your phone number')
-            return render(request, 'services/forgot_password_step1.html', {'user_type': user_type})
+            return await render_async(request, 'services/forgot_password_step1.html', {'user_type': user_type})
         
         if len(phone_number) != 10 or not phone_number.isdigit():
             messages.error(request, 'Please enter a valid 10-digit phone number')
-            return render(request, 'services/forgot_password_step1.html', {'user_type': user_type})
+            return await render_async(request, 'services/forgot_password_step1.html', {'user_type': user_type})
         
         if phone_number[0] not in '6789':
             messages.error(request, 'Phone number must start with 6, 7, 8, or 9')
-            return render(request, 'services/forgot_password_step1.html', {'user_type': user_type})
+            return await render_async(request, 'services/forgot_password_step1.html', {'user_type': user_type})
         
         try:
             # Check if user exists
-            user = User.objects.get(phone_number=phone_number, user_type=user_type)
+            user = await User.objects.aget(phone_number=phone_number, user_type=user_type)
             
             # For provider, verify DOB
             if user_type == 'provider':
                 if not date_of_birth:
                     messages.error(request, 'Please enter your date of birth')
-                    return render(request, 'services/forgot_password_step1.html', {'user_type': user_type})
+                    return await render_async(request, 'services/forgot_password_step1.html', {'user_type': user_type})
                 
                 try:
                     from datetime import datetime
                     dob = datetime.strptime(date_of_birth, '%Y-%m-%d').date()
-                    provider = user.provider_profile
+                    provider = await ServiceProvider.objects.aget(user=user)
                     
                     if provider.date_of_birth != dob:
                         messages.error(request, 'Phone number and date of birth do not match')
-                        return render(request, 'services/forgot_password_step1.html', {'user_type': user_type})
+                        return await render_async(request, 'services/forgot_password_step1.html', {'user_type': user_type})
                 except ValueError:
                     messages.error(request, 'Invalid date format')
-                    return render(request, 'services/forgot_password_step1.html', {'user_type': user_type})
+                    return await render_async(request, 'services/forgot_password_step1.html', {'user_type': user_type})
                 except ObjectDoesNotExist:
                     messages.error(request, 'Provider profile not found')
-                    return render(request, 'services/forgot_password_step1.html', {'user_type': user_type})
+                    return await render_async(request, 'services/forgot_password_step1.html', {'user_type': user_type})
             
             # Delete old OTPs
-            OTPVerification.objects.filter(
+            await OTPVerification.objects.filter(
                 phone_number=phone_number,
                 is_verified=False
-            ).delete()
+            ).adelete()
             
             # Generate OTP
             otp = OTPVerification.generate_otp()
-            otp_record = OTPVerification.objects.create(
+            await OTPVerification.objects.acreate(
                 phone_number=phone_number,
                 otp=otp
             )
             
-            # Print OTP to console
-            print(f"\n{'='*60}")
-            print(f"📱 OTP FOR: {phone_number}")
-            print(f"🔐 OTP CODE: {otp}")
-            print(f"⏰ Valid for 10 minutes")
-            print(f"{'='*60}\n")
+            if not await sms.asend_otp(phone_number, otp):
+                messages.error(request, 'Could not send the OTP right now. Please try again in a minute.')
+                return await render_async(request, 'services/forgot_password_step1.html', {'user_type': user_type})
             
             # Store in session
-            request.session['reset_phone'] = phone_number
-            request.session['reset_user_type'] = user_type
+            await request.session.aset('reset_phone', phone_number)
+            await request.session.aset('reset_user_type', user_type)
             
             # Success message and redirect
-            messages.success(request, f'OTP sent successfully! Check your console/terminal.')
+            messages.success(request, 'An OTP has been sent to your phone')
             return redirect('forgot_password_step2')
             
         except User.DoesNotExist:
             messages.error(request, f'No {user_type} account found with phone number {phone_number}')
-            return render(request, 'services/forgot_password_step1.html', {'user_type': user_type})
+            return await render_async(request, 'services/forgot_password_step1.html', {'user_type': user_type})
         except Exception as e:
             messages.error(request, f'An error occurred: {str(e)}')
-            print(f"Error: {e}")
-            return render(request, 'services/forgot_password_step1.html', {'user_type': user_type})
+            logger.exception('Password reset OTP request failed')
+            return await render_async(request, 'services/forgot_password_step1.html', {'user_type': user_type})
     
     # GET request
-    return render(request, 'services/forgot_password_step1.html', {'user_type': user_type})
+    return await render_async(request, 'services/forgot_password_step1.html', {'user_type': user_type})
 
 def forgot_password_step2(request):
     """Step 2: Verify OTP"""
@@ -230,7 +224,7 @@ def forgot_password_step2(request):
                 messages.error(request, 'No OTP found. Please request a new one.')
                 return redirect('forgot_password_step1', user_type=user_type)
             
-            print(f"Stored OTP: {otp_record.otp}, Entered OTP: {entered_otp}")
+            logger.debug('Checking password reset OTP', extra={'otp_id': otp_record.pk})
             
             if not otp_record.is_valid():
                 messages.error(request, 'OTP expired (10 min limit). Please request a new one.')
@@ -252,7 +246,7 @@ def forgot_password_step2(request):
                 
         except Exception as e:
             messages.error(request, f'Verification failed: {str(e)}')
-            print(f"OTP verification error: {e}")
+            logger.exception('OTP verification failed')
             return render(request, 'services/forgot_password_step2.html', {
                 'phone_number': phone_number,
                 'user_type': user_type
@@ -315,13 +309,14 @@ def forgot_password_step3(request):
             return redirect('login_choice')
         except Exception as e:
             messages.error(request, f'An error occurred: {str(e)}')
-            print(f"Password reset error: {e}")
+            logger.exception('Password reset failed')
             return render(request, 'services/forgot_password_step3.html')
     
     # GET request
     return render(request, 'services/forgot_password_step3.html')
 
 
+@public_page
 def register_choice(request):
     """Page to choose registration type"""
     return render(request, 'services/register_choice.html')
@@ -331,44 +326,16 @@ def register_provider(request):
     """Service provider registration with error handling"""
     if request.method == 'POST':
         form = ProviderRegistrationForm(request.POST, request.FILES)
-        phone_number = request.POST.get('phone_number')
-        name = request.POST.get('name')
-        password = request.POST.get('password')
-        address = request.POST.get('address')
-        district = request.POST.get('district')
-        aadhar_number = request.POST.get('aadhar_number')
-        date_of_birth = request.POST.get('date_of_birth')
-        
-        if form.is_valid():
-            try:
-                # Create user
-                user = User.objects.create_user(
-                    phone_number=phone_number,
-                    password=password,
-                    name=name,
-                    user_type='provider'
-                )
-                
-                # Create provider profile
-                provider = form.save(commit=False)
-                provider.user = user
-                provider.address = address
-                provider.district = district
-                provider.aadhar_number = aadhar_number
-                provider.date_of_birth = date_of_birth
-                if request.FILES.get('photo'):
-                    provider.photo = request.FILES['photo']
-                provider.save()
-                
+        try:
+            if form.is_valid() and form.register():
                 messages.success(request, 'Registration successful! Please login.')
                 return redirect('login', user_type='provider')
-            except Exception as e:
-                messages.error(request, f'Registration failed: {str(e)}')
-                print(f"Registration error: {e}")
-        else:
-            for field, errors in form.errors.items():
-                for error in errors:
-                    messages.error(request, f'{error}')
+        except Exception as e:
+            messages.error(request, f'Registration failed: {str(e)}')
+            logger.exception('Registration failed')
+        for field, errors in form.errors.items():
+            for error in errors:
+                messages.error(request, f'{error}')
     else:
         form = ProviderRegistrationForm()
     
@@ -379,39 +346,36 @@ def register_customer(request):
     """Customer registration with error handling"""
     if request.method == 'POST':
         form = CustomerRegistrationForm(request.POST)
-        if form.is_valid():
-            try:
-                # Create user
-                user = User.objects.create_user(
-                    phone_number=form.cleaned_data['phone_number'],
-                    password=form.cleaned_data['password'],
-                    name=form.cleaned_data['name'],
-                    user_type='customer'
-                )
-                
-                # Create customer profile
-                Customer.objects.create(
-                    user=user,
-                    address=form.cleaned_data.get('address', ''),
-                    district=form.cleaned_data['district']
-                )
-                
+        try:
+            if form.is_valid() and form.register():
                 messages.success(request, 'Registration successful! Please login.')
                 return redirect('login', user_type='customer')
-            except Exception as e:
-                messages.error(request, f'Registration failed: {str(e)}')
-                print(f"Registration error: {e}")
-        else:
-            for field, errors in form.errors.items():
-                for error in errors:
-                    messages.error(request, f'{error}')
+        except Exception as e:
+            messages.error(request, f'Registration failed: {str(e)}')
+            logger.exception('Registration failed')
+        for field, errors in form.errors.items():
+            for error in errors:
+                messages.error(request, f'{error}')
     else:
         form = CustomerRegistrationForm()
     
     return render(request, 'services/register_customer.html', {'form': form})
 
 
+def _provider_home_stamp(request):
+    """Profile fields plus the reviews shown on the provider's home page"""
+    if request.user.user_type != 'provider':
+        return None
+    row = ServiceProvider.objects.filter(user=request.user).values('updated_at').annotate(
+        review_count=Count('reviews'), last_review=Max('reviews__created_at'),
+    ).order_by('updated_at').first()
+    if row is None:
+        return None
+    return (row['updated_at'], row['review_count'], row['last_review']), row['updated_at']
+
+
 @login_required
+@conditional_page(_provider_home_stamp)
 def provider_home(request):
     """Home page for service providers"""
     try:
@@ -421,7 +385,7 @@ def provider_home(request):
             return redirect('login_choice')
         
         provider = request.user.provider_profile
-        reviews = provider.reviews.all()[:5]
+        reviews = provider.reviews.select_related('customer__user')[:5]
         return render(request, 'services/provider_home.html', {
             'provider': provider,
             'reviews': reviews
@@ -432,14 +396,14 @@ def provider_home(request):
         return redirect('home')
     except Exception as e:
         messages.error(request, 'An error occurred. Please login again.')
-        print(f"Provider home error: {e}")
+        logger.exception('Provider home failed')
         logout(request)
         return redirect('home')
 
 
 @login_required
 def select_district(request):
-    """District selection page for customers - REMOVED FROM UI"""
+    """District picker for customers: a select grouped by state with a filter box"""
     try:
         if request.user.user_type != 'customer':
             messages.error(request, 'Access denied')
@@ -465,7 +429,7 @@ def select_district(request):
         return render(request, 'services/select_district.html', {'form': form})
     except Exception as e:
         messages.error(request, 'An error occurred. Please try again.')
-        print(f"Select district error: {e}")
+        logger.exception('District selection failed')
         return redirect('customer_home')
 
 
@@ -485,20 +449,11 @@ def customer_home(request):
             request.session['selected_district'] = selected_district
         
         # Get district name for display
-        selected_district_name = dict(DISTRICT_CHOICES).get(selected_district, selected_district)
-        
-        services = [
-            {'code': 'mason', 'name': 'Mason', 'icon': 'hard-hat', 'gradient': 'from-red-500 to-pink-500'},
-            {'code': 'painter', 'name': 'Painter', 'icon': 'paint-roller', 'gradient': 'from-cyan-500 to-blue-500'},
-            {'code': 'plumber', 'name': 'Plumber', 'icon': 'wrench', 'gradient': 'from-blue-500 to-indigo-500'},
-            {'code': 'carpenter', 'name': 'Carpenter', 'icon': 'hammer', 'gradient': 'from-amber-500 to-orange-500'},
-            {'code': 'electrician', 'name': 'Electrician', 'icon': 'bolt', 'gradient': 'from-yellow-400 to-yellow-600'},
-            {'code': 'tile_marble', 'name': 'Tile/Marble Worker', 'icon': 'th', 'gradient': 'from-slate-400 to-slate-600'},
-            {'code': 'steel_fabricator', 'name': 'Steel Fabricator', 'icon': 'industry', 'gradient': 'from-gray-500 to-gray-700'},
-            {'code': 'glass_worker', 'name': 'Glass Worker', 'icon': 'wine-glass', 'gradient': 'from-purple-500 to-indigo-500'},
-            {'code': 'gardener', 'name': 'Gardener', 'icon': 'leaf', 'gradient': 'from-green-400 to-emerald-600'},
-            {'code': 'driver', 'name': 'Driver', 'icon': 'car', 'gradient': 'from-pink-500 to-rose-500'},
-        ]
+        selected_district_name = district_name(selected_district)
+        
+        # Verified provider counts for the whole grid in a single read
+        provider_counts = counters.counts_for_district(selected_district)
+        services = [(service, provider_counts.get(service.code, 0)) for service in SERVICES]
         
         return render(request, 'services/customer_home.html', {
             'services': services,
@@ -510,12 +465,66 @@ def customer_home(request):
         return redirect('home')
     except Exception as e:
         messages.error(request, 'An error occurred. Please login again.')
-        print(f"Customer home error: {e}")
+        logger.exception('Customer home failed')
         logout(request)
         return redirect('home')
 
 
+def _filter_and_sort_providers(providers, search_name, rating_filter, sort_by):
+    """Listing filters shared by the HTML and JSON provider lists"""
+    # Apply name search filter
+    if search_name:
+        providers = providers.filter(user__name__icontains=search_name)
+    
+    # Apply rating filter
+    if rating_filter:
+        try:
+            min_rating = float(rating_filter)
+            providers = providers.filter(rating__gte=min_rating)
+        except ValueError:
+            pass  # Invalid rating value, ignore filter
+    
+    # Apply sorting
+    if sort_by == 'name':
+        return providers.order_by('user__name')
+    elif sort_by == 'reviews':
+        return providers.order_by('-total_reviews', '-rating')
+    elif sort_by == 'newest':
+        return providers.order_by('-created_at')
+    return providers.order_by('-ranking_score', '-total_reviews')
+
+
+def _providers_list_stamp(request, service_code):
+    """
+    Version of everything the listing can show: the matching providers
+    (count, latest change, ranking scores) and their work photos. Reviews
+    bump the provider's updated_at through update_rating().
+    """
+    if request.user.user_type != 'customer':
+        return None
+    # Availability changes with the clock, not with any row
+    if request.GET.get('available'):
+        return None
+    selected_district = request.session.get('selected_district')
+    if not selected_district:
+        return None
+    providers = ServiceProvider.objects.filter(
+        Q(service1=service_code) | Q(service2=service_code) | Q(service3=service_code),
+        is_verified=True,
+    )
+    # Radius searches can reach into other districts
+    if not request.GET.get('within'):
+        providers = providers.filter(district=selected_district)
+    listing = providers.aggregate(count=Count('pk'), changed=Max('updated_at'), scores=Sum('ranking_score'))
+    photos = ProviderWorkPhoto.objects.filter(provider__in=providers).aggregate(
+        count=Count('pk'), last=Max('uploaded_at'),
+    )
+    last_modified = max(filter(None, (listing['changed'], photos['last'])), default=None)
+    return (selected_district, listing, photos), last_modified
+
+
 @login_required
+@conditional_page(_providers_list_stamp)
 def service_providers_list(request, service_code):
     """List all providers for a specific service in selected district with filtering"""
     try:
@@ -528,67 +537,186 @@ def service_providers_list(request, service_code):
             selected_district = request.user.customer_profile.district
             request.session['selected_district'] = selected_district
         
-        service_names = dict(ServiceProvider.SERVICE_CHOICES)
-        service_name = service_names.get(service_code, 'Unknown Service')
+        service_name = SERVICE_NAMES.get(service_code, 'Unknown Service')
         
-        # Base query - Find all verified providers offering this service in the selected district
+        # Base query - Find all verified providers offering this service
         providers = ServiceProvider.objects.filter(
             Q(service1=service_code) | Q(service2=service_code) | Q(service3=service_code)
-        ).filter(is_verified=True, district=selected_district)
+        ).filter(is_verified=True)
         
         # Get filter parameters from request
         search_name = request.GET.get('search', '').strip()
         rating_filter = request.GET.get('rating', '').strip()
         sort_by = request.GET.get('sort', 'rating')  # Default sort by rating
+        within = request.GET.get('within', '').strip()  # '', radius in km, or 'nearest'
+        available = request.GET.get('available', '') == '1'  # free slot in the next couple of hours
+        try:
+            page = max(1, int(request.GET.get('page', 1)))
+        except ValueError:
+            page = 1
         
-        # Apply name search filter
-        if search_name:
-            providers = providers.filter(user__name__icontains=search_name)
-        
-        # Apply rating filter
-        if rating_filter:
-            try:
-                min_rating = float(rating_filter)
-                providers = providers.filter(rating__gte=min_rating)
-            except ValueError:
-                pass  # Invalid rating value, ignore filter
-        
-        # Apply sorting
-        if sort_by == 'rating':
-            providers = providers.order_by('-rating', '-total_reviews')
-        elif sort_by == 'name':
-            providers = providers.order_by('user__name')
-        elif sort_by == 'reviews':
-            providers = providers.order_by('-total_reviews', '-rating')
-        elif sort_by == 'newest':
-            providers = providers.order_by('-created_at')
+        # Restrict to the selected district, or search around its centroid
+        distances = None
+        centroid = geo.district_centroid(selected_district)
+        if within and centroid:
+            with span('providers_list.geo_search', within=within):
+                if within == 'nearest':
+                    distances = geo.nearest_providers(providers, *centroid, limit=NEAREST_PROVIDERS_LIMIT)
+                else:
+                    try:
+                        radius_km = min(float(within), geo.SEARCH_RADII_KM[-1])
+                        distances = geo.providers_within(providers, *centroid, radius_km)
+                    except ValueError:
+                        within = ''
+        if distances is not None:
+            providers = providers.filter(pk__in=distances.keys())
         else:
-            providers = providers.order_by('-rating', '-total_reviews')
+            providers = providers.filter(district=selected_district)
+        
+        free_from = None
+        if available:
+            with span('providers_list.availability'):
+                free_from = availability.available_providers(providers)
+            providers = providers.filter(pk__in=free_from.keys())
+        
+        providers = _filter_and_sort_providers(providers, search_name, rating_filter, sort_by)
+        
+        # One row past the page tells whether there is a next one
+        offset = (page - 1) * PROVIDERS_PAGE_SIZE
+        window = PROVIDERS_PAGE_SIZE + 1
+        
+        # Unfiltered default view reads the materialized leaderboard directly
+        page_providers = None
+        if sort_by == 'rating' and distances is None and not search_name and not rating_filter and not available:
+            page_providers = ranking.read_leaderboard(selected_district, service_code, offset, window)
         
-        # Check if customer has reviewed each provider
+        with span('providers_list.load', service=service_code, sort=sort_by, page=page):
+            if page_providers is None and distances is not None and sort_by == 'distance':
+                # Distances are only known in Python: order the ids, then load the page
+                ids = sorted(providers.values_list('pk', flat=True), key=distances.get)[offset:offset + window]
+                by_id = providers.select_related('user').in_bulk(ids)
+                page_providers = [by_id[pk] for pk in ids]
+            elif page_providers is None:
+                page_providers = list(providers.select_related('user')[offset:offset + window])
+            has_next = len(page_providers) > PROVIDERS_PAGE_SIZE
+            providers = page_providers[:PROVIDERS_PAGE_SIZE]
+            
+            # Load photos and the latest reviews for every card in two queries instead of per card
+            prefetch_related_objects(
+                providers,
+                'work_photos',
+                Prefetch(
+                    'reviews',
+                    queryset=Review.objects.select_related('customer__user')[:REVIEWS_PER_PROVIDER],
+                    to_attr='latest_reviews',
+                ),
+            )
+        
+        if distances is not None:
+            for provider in providers:
+                provider.distance_km = distances.get(provider.pk)
+        
+        if free_from is not None:
+            now = timezone.now()
+            for provider in providers:
+                # None when free right away
+                provider.free_from = free_from[provider.pk] if free_from[provider.pk] > now else None
+        
+        # Check which providers the customer has already reviewed, in one query
         customer = request.user.customer_profile
+        reviewed_ids = set(
+            Review.objects.filter(customer=customer, provider__in=providers).values_list('provider_id', flat=True)
+        )
         for provider in providers:
-            provider.user_has_reviewed = Review.objects.filter(
-                customer=customer, provider=provider
-            ).exists()
+            provider.user_has_reviewed = provider.pk in reviewed_ids
         
-        selected_district_name = dict(DISTRICT_CHOICES).get(selected_district, selected_district)
+        selected_district_name = district_name(selected_district)
         
-        return render(request, 'services/providers_list.html', {
-            'service_code': service_code,
-            'service_name': service_name,
-            'providers': providers,
-            'selected_district': selected_district_name,
-            'search_name': search_name,
-            'rating_filter': rating_filter,
-            'sort_by': sort_by,
-        })
+        with span('providers_list.render', count=len(providers)):
+            return render(request, 'services/providers_list.html', {
+                'service_code': service_code,
+                'service_name': service_name,
+                'providers': providers,
+                'selected_district': selected_district_name,
+                'search_name': search_name,
+                'rating_filter': rating_filter,
+                'sort_by': sort_by,
+                'within': within,
+                'available': available,
+                'available_hours': int(availability.AVAILABLE_WINDOW.total_seconds() // 3600),
+                'page': page,
+                'has_previous': page > 1,
+                'has_next': has_next,
+            })
     except Exception as e:
         messages.error(request, 'An error occurred. Please try again.')
-        print(f"Providers list error: {e}")
+        logger.exception('Providers list failed')
         return redirect('customer_home')
 
 
+@login_required
+async def service_providers_json(request, service_code):
+    """JSON provider list for the selected district; same filters and sorts as the HTML list"""
+    user = await request.auser()
+    if user.user_type != 'customer':
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    if service_code not in SERVICE_NAMES:
+        return JsonResponse({'error': 'Unknown service'}, status=404)
+    
+    selected_district = await request.session.aget('selected_district')
+    if not selected_district:
+        customer = await Customer.objects.aget(user=user)
+        selected_district = customer.district
+    
+    search_name = request.GET.get('search', '').strip()
+    rating_filter = request.GET.get('rating', '').strip()
+    sort_by = request.GET.get('sort', 'rating')
+    available = request.GET.get('available', '') == '1'
+    try:
+        limit = max(1, min(int(request.GET.get('limit', JSON_PAGE_SIZE)), JSON_MAX_PAGE_SIZE))
+        offset = max(0, int(request.GET.get('offset', 0)))
+    except ValueError:
+        return JsonResponse({'error': 'limit and offset must be integers'}, status=400)
+    
+    providers = None
+    free_from = None
+    if sort_by == 'rating' and not search_name and not rating_filter and not available:
+        providers = await sync_to_async(ranking.read_leaderboard)(selected_district, service_code, offset, limit)
+    if providers is None:
+        queryset = ServiceProvider.objects.filter(
+            Q(service1=service_code) | Q(service2=service_code) | Q(service3=service_code),
+            is_verified=True,
+            district=selected_district,
+        ).select_related('user')
+        if available:
+            free_from = await sync_to_async(availability.available_providers)(queryset)
+            queryset = queryset.filter(pk__in=free_from.keys())
+        queryset = _filter_and_sort_providers(queryset, search_name, rating_filter, sort_by)
+        providers = [provider async for provider in queryset[offset:offset + limit]]
+    
+    return JsonResponse({
+        'service': service_code,
+        'district': selected_district,
+        'offset': offset,
+        'limit': limit,
+        'providers': [
+            {
+                'name': provider.user.name,
+                'phone_number': provider.user.phone_number,
+                'district': provider.district,
+                'services': provider.get_services(),
+                'rating': float(provider.rating),
+                'total_reviews': provider.total_reviews,
+                'ranking_score': round(provider.ranking_score, 3),
+                'is_verified': provider.is_verified,
+                'member_since': provider.created_at.date().isoformat(),
+                **({'free_from': free_from[provider.pk].isoformat()} if free_from is not None else {}),
+            }
+            for provider in providers
+        ],
+    })
+
+
 @login_required
 def add_review(request, provider_phone):
     """Add or update review for a provider"""
@@ -622,10 +750,260 @@ def add_review(request, provider_phone):
         })
     except Exception as e:
         messages.error(request, 'An error occurred. Please try again.')
-        print(f"Add review error: {e}")
+        logger.exception('Adding review failed')
         return redirect('customer_home')
 
 
+@login_required
+def request_service(request, service_code):
+    """Customer books a service; offers go out to top-ranked providers in their district"""
+    if service_code not in SERVICE_NAMES:
+        raise Http404('Unknown service')
+    try:
+        if request.user.user_type != 'customer':
+            messages.error(request, 'Only customers can request a service')
+            return redirect('home')
+
+        customer = request.user.customer_profile
+        district = request.session.get('selected_district') or customer.district
+        if request.method == 'POST':
+            form = ServiceRequestForm(request.POST)
+            if form.is_valid():
+                try:
+                    booking.create_request(customer, service_code, district, form.cleaned_data['description'],
+                                           preferred_start=form.cleaned_data['preferred_start'])
+                except booking.BookingError as e:
+                    messages.error(request, str(e))
+                else:
+                    messages.success(request, 'Request sent! Top-rated providers in your district will be notified.')
+                    return redirect('my_requests')
+        else:
+            form = ServiceRequestForm()
+
+        return render(request, 'services/request_service.html', {
+            'form': form,
+            'service_code': service_code,
+            'service_name': SERVICE_NAMES[service_code],
+            'selected_district': district_name(district),
+        })
+    except Exception as e:
+        messages.error(request, 'An error occurred. Please try again.')
+        logger.exception('Requesting a service failed')
+        return redirect('customer_home')
+
+
+@login_required
+def my_requests(request):
+    """Customer's service requests, newest first"""
+    if request.user.user_type != 'customer':
+        return redirect('provider_home')
+    service_requests = (
+        ServiceRequest.objects.filter(customer__user=request.user)
+        .select_related('provider__user', 'booking')
+        .annotate(offer_count=Count('offers'))[:50]
+    )
+    return render(request, 'services/my_requests.html', {'service_requests': service_requests})
+
+
+@login_required
+@require_POST
+def cancel_request(request, request_id):
+    if request.user.user_type == 'customer':
+        try:
+            booking.cancel_request(request_id, request.user.customer_profile)
+            messages.success(request, 'Request cancelled.')
+        except booking.BookingError as e:
+            messages.error(request, str(e))
+    return redirect('my_requests')
+
+
+@login_required
+def provider_offers(request):
+    """Open offers and accepted jobs of the logged-in provider"""
+    if request.user.user_type != 'provider':
+        return redirect('customer_home')
+    provider = get_object_or_404(ServiceProvider, user=request.user)
+    offers = (
+        ServiceOffer.objects.filter(provider=provider, status='offered', request__status='pending')
+        .select_related('request')[:50]
+    )
+    jobs = (
+        ServiceRequest.objects.filter(provider=provider, status='accepted')
+        .select_related('customer__user', 'booking').order_by('-accepted_at')
+    )
+    offers = list(offers)
+    return render(request, 'services/provider_offers.html', {
+        'offers': offers,
+        'jobs': jobs,
+        # The live banner only announces offers newer than the ones listed
+        'inbox_cursor': max((offer.pk for offer in offers), default=0),
+    })
+
+
+@login_required
+def edit_working_hours(request):
+    """Provider's weekly working hours, used by the "available soon" filter and job dispatch"""
+    if request.user.user_type != 'provider':
+        return redirect('customer_home')
+    provider = get_object_or_404(ServiceProvider, user=request.user)
+    if request.method == 'POST':
+        form = WorkingHoursForm(request.POST, working_hours=provider.working_hours)
+        if form.is_valid():
+            # update() skips auto_now, so updated_at (part of page ETags) is set here
+            ServiceProvider.objects.filter(pk=provider.pk).update(
+                working_hours=form.working_hours(), updated_at=timezone.now(),
+            )
+            messages.success(request, 'Working hours saved!')
+            return redirect('provider_home')
+    else:
+        form = WorkingHoursForm(working_hours=provider.working_hours)
+    return render(request, 'services/working_hours.html', {'form': form})
+
+
+def _offer_json(offer):
+    return {
+        'id': offer.pk,
+        'request_id': offer.request_id,
+        'service': offer.request.service_type,
+        'service_name': offer.request.get_service_display(),
+        'district': offer.request.district,
+        'description': offer.request.description,
+        'created_at': offer.created_at.isoformat(),
+    }
+
+
+async def _inbox_provider_id(request):
+    user = await request.auser()
+    if user.user_type != 'provider':
+        return None
+    return await ServiceProvider.objects.filter(user=user).values_list('pk', flat=True).afirst()
+
+
+def _inbox_cursor(value):
+    try:
+        return max(0, int(value or 0))
+    except ValueError:
+        return 0
+
+
+def _can_hold(request):
+    # An idle ASGI connection is a parked coroutine; under WSGI it would pin a
+    # worker thread, so there the inbox answers at once and clients poll
+    return isinstance(request, ASGIRequest)
+
+
+@login_required
+async def provider_inbox(request):
+    """
+    Long-poll for new job offers: returns offers newer than ?cursor= at
+    once, or waits up to INBOX_LONGPOLL_SECONDS for one to arrive. Send the
+    returned cursor with the next request.
+    """
+    provider_id = await _inbox_provider_id(request)
+    if provider_id is None:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    cursor = _inbox_cursor(request.GET.get('cursor'))
+
+    with booking.inbox_hub.subscribe(provider_id, loop=asyncio.get_running_loop()) as subscription:
+        offers, cursor = await sync_to_async(_read_inbox)(provider_id, cursor)
+        if not offers and _can_hold(request) and await subscription.wait_async(INBOX_LONGPOLL_SECONDS):
+            offers, cursor = await sync_to_async(_read_inbox)(provider_id, cursor)
+    return JsonResponse({
+        'cursor': cursor,
+        'offers': [_offer_json(offer) for offer in offers],
+        'retry_ms': INBOX_RETRY_MS if _can_hold(request) else INBOX_WSGI_RETRY_MS,
+    })
+
+
+def _read_inbox(provider_id, cursor):
+    """
+    booking.inbox() for held-open requests. Under ASGI each request runs its
+    sync code on a thread of its own with its own database connection;
+    closing it after every read keeps idle inboxes from holding connections.
+    """
+    try:
+        return booking.inbox(provider_id, cursor)
+    finally:
+        connection.close()
+
+
+def _offer_event(offer):
+    return f'id: {offer.pk}\nevent: offer\ndata: {json.dumps(_offer_json(offer))}\n\n'
+
+
+async def _inbox_events(provider_id, cursor):
+    yield f'retry: {INBOX_RETRY_MS}\n\n'
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + INBOX_STREAM_SECONDS
+    with booking.inbox_hub.subscribe(provider_id, loop=loop) as subscription:
+        fired = True
+        while True:
+            if fired:
+                offers, cursor = await sync_to_async(_read_inbox)(provider_id, cursor)
+                for offer in offers:
+                    yield _offer_event(offer)
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                # The browser reconnects with Last-Event-ID after `retry` ms
+                return
+            # Idle providers cost no queries: only a publish triggers a read
+            fired = await subscription.wait_async(min(remaining, INBOX_KEEPALIVE_SECONDS))
+            if not fired:
+                yield ': keepalive\n\n'
+
+
+@login_required
+async def provider_inbox_stream(request):
+    """Server-Sent Events stream of new job offers (EventSource resumes from Last-Event-ID)"""
+    provider_id = await _inbox_provider_id(request)
+    if provider_id is None:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    cursor = _inbox_cursor(request.headers.get('Last-Event-ID') or request.GET.get('cursor'))
+    if _can_hold(request):
+        response = StreamingHttpResponse(_inbox_events(provider_id, cursor), content_type='text/event-stream')
+    else:
+        # One batch, then the browser asks again after INBOX_WSGI_RETRY_MS
+        offers, cursor = await sync_to_async(booking.inbox)(provider_id, cursor)
+        response = HttpResponse(
+            f'retry: {INBOX_WSGI_RETRY_MS}\n\n' + ''.join(_offer_event(offer) for offer in offers),
+            content_type='text/event-stream',
+        )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _provider_booking_action(request, action, object_id, success_message):
+    if request.user.user_type == 'provider':
+        provider = get_object_or_404(ServiceProvider, user=request.user)
+        try:
+            action(object_id, provider)
+            messages.success(request, success_message)
+        except booking.BookingError as e:
+            messages.error(request, str(e))
+    return redirect('provider_offers')
+
+
+@login_required
+@require_POST
+def accept_offer(request, offer_id):
+    return _provider_booking_action(request, booking.accept_offer, offer_id,
+                                    "Job accepted! The customer's contact details are below.")
+
+
+@login_required
+@require_POST
+def decline_offer(request, offer_id):
+    return _provider_booking_action(request, booking.decline_offer, offer_id, 'Offer declined.')
+
+
+@login_required
+@require_POST
+def complete_request(request, request_id):
+    return _provider_booking_action(request, booking.complete_request, request_id, 'Job marked as completed.')
+
+
 @login_required
 def profile_view(request):
     """View profile"""
@@ -637,7 +1015,7 @@ def profile_view(request):
             return render(request, 'services/customer_profile.html', {'customer': customer})
     except Exception as e:
         messages.error(request, 'An error occurred. Please login again.')
-        print(f"Profile view error: {e}")
+        logger.exception('Provider profile view failed')
         logout(request)
         return redirect('home')
 
@@ -692,7 +1070,7 @@ def edit_profile(request):
         })
     except Exception as e:
         messages.error(request, 'An error occurred. Please try again.')
-        print(f"Edit profile error: {e}")
+        logger.exception('Profile edit failed')
         if request.user.user_type == 'provider':
             return redirect('provider_home')
         else:
@@ -734,7 +1112,7 @@ def add_work_photo(request):
                     return redirect('edit_profile')
                 except Exception as e:
                     messages.error(request, f'Error saving photo: {str(e)}')
-                    print(f"Photo save error: {e}")
+                    logger.exception('Work photo save failed')
             else:
                 messages.error(request, 'Please select a photo to upload')
         
@@ -747,9 +1125,7 @@ def add_work_photo(request):
         
     except Exception as e:
         messages.error(request, f'An error occurred: {str(e)}')
-        print(f"Add work photo error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Adding work photo failed')
         return redirect('edit_profile')
 
 @login_required
@@ -767,24 +1143,37 @@ def delete_work_photo(request, photo_id):
         return redirect('edit_profile')
     except Exception as e:
         messages.error(request, 'An error occurred. Please try again.')
-        print(f"Delete work photo error: {e}")
+        logger.exception('Work photo delete failed')
         return redirect('edit_profile')
 
 
+async def _work_gallery_stamp(request, provider_phone):
+    row = await ServiceProvider.objects.filter(user__phone_number=provider_phone).values('updated_at').annotate(
+        photo_count=Count('work_photos'), last_photo=Max('work_photos__uploaded_at'),
+    ).order_by('updated_at').afirst()
+    if row is None:
+        return None
+    last_modified = max(filter(None, (row['updated_at'], row['last_photo'])))
+    return (row['updated_at'], row['photo_count'], row['last_photo']), last_modified
+
+
 @login_required
-def view_work_gallery(request, provider_phone):
+@conditional_page(_work_gallery_stamp)
+async def view_work_gallery(request, provider_phone):
     """View provider's work gallery"""
     try:
-        provider = get_object_or_404(ServiceProvider, user__phone_number=provider_phone)
-        work_photos = provider.work_photos.all()
+        provider = await aget_object_or_404(
+            ServiceProvider.objects.select_related('user'), user__phone_number=provider_phone
+        )
+        work_photos = [photo async for photo in provider.work_photos.all()]
         
-        return render(request, 'services/work_gallery.html', {
+        return await render_async(request, 'services/work_gallery.html', {
             'provider': provider,
             'work_photos': work_photos
         })
     except Exception as e:
         messages.error(request, 'An error occurred. Please try again.')
-        print(f"View gallery error: {e}")
+        logger.exception('Work gallery view failed')
         return redirect('customer_home')
 
 
@@ -812,7 +1201,7 @@ def change_password(request):
         return render(request, 'services/change_password.html', {'form': form})
     except Exception as e:
         messages.error(request, 'An error occurred. Please try again.')
-        print(f"Change password error: {e}")
+        logger.exception('Password change failed')
         if request.user.user_type == 'provider':
             return redirect('provider_home')
         else:
@@ -826,6 +1215,19 @@ def logout_view(request):
     messages.success(request, 'Logged out successfully')
     return redirect('home')
 
-def health(request):
+async def health(request):
     # Simple, fast response with no DB queries
-    return JsonResponse({"status": "ok"}, status=200)
\ No newline at end of file
+    return JsonResponse({"status": "ok"}, status=200)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; needs the METRICS_TOKEN bearer token or a staff login"""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    auth_header = request.headers.get('Authorization', '')
+    token_ok = bool(settings.METRICS_TOKEN) and hmac.compare_digest(
+        auth_header, f'Bearer {settings.METRICS_TOKEN}'
+    )
+    if not token_ok and not request.user.is_staff:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
\ No newline at end of file
@@ -0,0 +1,14 @@
+/** @type {import('tailwindcss').Config} */
+module.exports = {
+  // Classes are kept only if they appear in these files. Python is included
+  // because views build class names (e.g. the service card gradients).
+  content: ['./services/templates/**/*.html', './services/**/*.py'],
+  theme: {
+    extend: {},
+  },
+  plugins: [require('daisyui')],
+  daisyui: {
+    themes: ['dark'],  // the only theme set in base.html (data-theme="dark")
+    logs: false,
+  },
+};